@@ -6,101 +6,320 @@ Created on Thu Oct 14 21:37:48 2021
 """
 
 import numpy as np
-from copy import copy
 
 
-def LevenberquOptimizer(function, marketPrices, initialGuess, bounds, learningRate=0.1, tol=1e-08, maxIterations = 10000):
-    def LevenbergMarquardtStep(function, marketprices, xValue, MSE, learningRateApply):
-        gradient = getGradientFiniteDifference(function, xValue)
-        # tikhonov regularization
-        tikhanovMatrix = gradient.T@gradient + learningRateApply*np.diag(np.diag(gradient.T@gradient))
-        
-        if np.linalg.matrix_rank(tikhanovMatrix)!= tikhanovMatrix.shape[0]:
-            return xValue, MSE
-        
-        inverse = np.linalg.inv(tikhanovMatrix)
+def LevenberquOptimizer(function, marketPrices, initialGuess, bounds, learningRate=0.1, tol=1e-08, maxIterations = 10000,
+                        jacobian = None, finiteDifferenceMethod = 'central', finiteDifferenceStep = 1e-5, vectorized = False,
+                        gradientTol = 1e-14, stepTol = 1e-12, maxDamping = 1e16, returnDiagnostics = False,
+                        boundHandling = 'projection'):
+    '''
+    Levenberg Marquardt calibration of the vols of a volastructure to market prices,
+    minimizing the sum of squared errors (MSE) of function(volastructure) - marketPrices.
+
+    The residual, jacobian and normal matrix J^T J are kept until a step is accepted.
+    The damping (learningRate) is kept over the iterations: it is decreased after an
+    accepted step and increased after a rejected one, a rejected step only needs one
+    new solve of (J^T J + damping diag(J^T J)) dx = J^T r (cholesky, least squares if
+    the matrix is singular).
+
+    The vols stay inside the bounds: vols at a bound whose gradient points outside
+    are kept fixed for the step, the other ones either are projected on the box
+    (boundHandling 'projection') or steps leaving the box are rejected like a step
+    without improvement ('reject'). Steps leaving the box are never priced, and the
+    finite difference bumps stay inside the box as well.
+
+    Parameters
+    ----------
+    function : TYPE callable.
+        DESCRIPTION. Maps a volastructure ([date, vol] rows) to the model prices.
+    marketPrices : TYPE np.array.
+        DESCRIPTION. Prices to be matched.
+    initialGuess : TYPE np.array.
+        DESCRIPTION. Volastructure to start from.
+    bounds : TYPE list.
+        DESCRIPTION. [] or None for non negative vols, (lower, upper) with
+        floats or one value per vol, or one (lower, upper) pair per vol (this
+        reading wins if both fit). None or np.nan stand for no bound. The
+        initial guess is moved into the box.
+    learningRate : TYPE, float.
+        DESCRIPTION. The default is 0.1. Initial damping.
+    tol : TYPE, float.
+        DESCRIPTION. The default is 1e-08. Stop once the MSE is below.
+    maxIterations : TYPE, int.
+        DESCRIPTION. The default is 10000. Maximal number of steps (accepted
+        or rejected).
+    jacobian : TYPE, callable.
+        DESCRIPTION. The default is None. Jacobian (prices x vols) of a
+        volastructure, finite differences if None.
+    finiteDifferenceMethod, finiteDifferenceStep, vectorized :
+        DESCRIPTION. See getGradientFiniteDifference.
+    gradientTol : TYPE, float.
+        DESCRIPTION. The default is 1e-14. Stop once max |J^T r| is below.
+    stepTol : TYPE, float.
+        DESCRIPTION. The default is 1e-12. Stop once an accepted step is
+        smaller than stepTol * (|vols| + stepTol).
+    maxDamping : TYPE, float.
+        DESCRIPTION. The default is 1e16. Stop once the damping exceeds it
+        (no improving step found).
+    returnDiagnostics : TYPE, bool.
+        DESCRIPTION. The default is False. Return a dict of diagnostics as
+        fourth value.
+    boundHandling : TYPE, str.
+        DESCRIPTION. The default is 'projection'. 'projection' or 'reject'.
+
+    Returns
+    -------
+    TYPE tuple.
+        DESCRIPTION. Calibrated volastructure, its MSE and the number of
+        iterations (and the diagnostics: 'converged', 'reason',
+        'functionEvaluations', 'jacobianEvaluations', 'acceptedSteps',
+        'rejectedSteps', 'infeasibleSteps' (rejected without pricing),
+        'damping', 'gradientNorm' (of the free vols) and the MSE 'history').
+
+    '''
+    if boundHandling not in ('projection', 'reject'):
+        raise ValueError("boundHandling must be 'projection' or 'reject', not {}".format(boundHandling))
+    
+    marketPrices = np.asarray(marketPrices, dtype = float).ravel()
+    xValue = np.array(initialGuess, dtype = float)
+    lowerBound, upperBound = getBounds(bounds, xValue.shape[0])
+    xValue[::,1] = np.clip(xValue[::,1], lowerBound, upperBound)
+    residual = marketPrices - np.asarray(function(xValue), dtype = float).ravel()
+    MSE = residual@residual
+    
+    damping = float(learningRate)
+    diagnostics = {'converged' : MSE <= tol, 'reason' : 'tol' if MSE <= tol else 'maxIterations',
+                   'functionEvaluations' : 1, 'jacobianEvaluations' : 0, 'acceptedSteps' : 0,
+                   'rejectedSteps' : 0, 'infeasibleSteps' : 0, 'history' : [MSE]}
+    gradient = None
+    
+    iteration = 0
+    while MSE >tol and iteration <maxIterations:
+        # jacobian, normal matrix and gradient only change with an accepted step
+        if gradient is None:
+            if jacobian is None:
+                jacobianMatrix = getGradientFiniteDifference(function, xValue, finiteDifferenceStep, finiteDifferenceMethod,
+                                                             vectorized, marketPrices - residual, (lowerBound, upperBound))
+                diagnostics['functionEvaluations'] += jacobianMatrix.shape[1]*(2 if finiteDifferenceMethod == 'central' else 1)
+            else:
+                jacobianMatrix = np.asarray(jacobian(xValue), dtype = float)
+            diagnostics['jacobianEvaluations'] += 1
+            normalMatrix = jacobianMatrix.T@jacobianMatrix
+            gradient = jacobianMatrix.T@residual
+            
+            # vols at a bound are fixed if the descent direction points outside
+            isFree = ~(((xValue[::,1] <= lowerBound) & (gradient < 0)) | ((xValue[::,1] >= upperBound) & (gradient > 0)))
+            if np.max(np.abs(gradient[isFree]), initial = 0) <= gradientTol:
+                diagnostics.update(converged = True, reason = 'gradientTol')
+                break
         
-        deltaX = inverse@gradient.T@(marketPrice - function(xValue))
+        deltaX = np.zeros(gradient.shape[0])
+        deltaX[isFree] = LevenbergMarquardtStep(normalMatrix[np.ix_(isFree, isFree)], gradient[isFree], damping)
+        iteration += 1
         
-        xValueCandidate = copy(xValue)
+        xValueCandidate = xValue.copy()
         xValueCandidate[::,1] = xValue[::,1] + deltaX
-        functionValueCandidate = function(xValueCandidate)
-        newMSE = sum([(x-y)**2 for x,y in zip(functionValueCandidate, marketPrice)])
         
-        return xValueCandidate, newMSE
+        isFeasible = np.all(np.isfinite(xValueCandidate[::,1]))
+        if boundHandling == 'projection':
+            xValueCandidate[::,1] = np.clip(xValueCandidate[::,1], lowerBound, upperBound)
+        else:
+            isFeasible &= np.all((xValueCandidate[::,1] >= lowerBound) & (xValueCandidate[::,1] <= upperBound))
         
-    xValue = copy(initialGuess)
-    functionValue = function(xValue)
-    MSE = sum([(x-y)**2 for x,y in zip(functionValue, marketPrices)])
-    
-    iteration = 0
-    while MSE >tol and iteration <maxIterations:
-        learningRateApply = copy(learningRate)
-        xValueCandidate, newMSE = LevenbergMarquardtStep(function, marketPrices, xValue, MSE, learningRateApply)
+        if not isFeasible:
+            # reject without pricing
+            damping *= 2
+            diagnostics['rejectedSteps'] += 1
+            diagnostics['infeasibleSteps'] += 1
+            if damping > maxDamping:
+                diagnostics.update(converged = False, reason = 'maxDamping')
+                break
+            continue
+        
+        residualCandidate = marketPrices - np.asarray(function(xValueCandidate), dtype = float).ravel()
+        diagnostics['functionEvaluations'] += 1
+        newMSE = residualCandidate@residualCandidate
         
         if newMSE < MSE:
-            MSE = newMSE
-            xValue = xValueCandidate
-        else:
-            learningRateApply *= 2
+            # accept, move towards gauss newton
+            stepSize = np.linalg.norm(xValueCandidate[::,1] - xValue[::,1])
+            MSE, xValue, residual = newMSE, xValueCandidate, residualCandidate
+            damping = max(damping/3, 1e-12)
+            gradient = None
+            diagnostics['acceptedSteps'] += 1
+            diagnostics['history'].append(MSE)
             
-        if learningRateApply >20:
-            return 0
-        
-        iteration += 1
+            if MSE <= tol:
+                diagnostics.update(converged = True, reason = 'tol')
+            elif stepSize <= stepTol*(np.linalg.norm(xValue[::,1]) + stepTol):
+                diagnostics.update(converged = True, reason = 'stepTol')
+                break
+        else:
+            # reject, move towards gradient descent
+            damping *= 2
+            diagnostics['rejectedSteps'] += 1
+            if damping > maxDamping:
+                diagnostics.update(converged = False, reason = 'maxDamping')
+                break
+    
+    if returnDiagnostics:
+        diagnostics.update(damping = damping, gradientNorm = np.nan if gradient is None else \
+                           np.max(np.abs(gradient[isFree]), initial = 0))
+        return xValue, MSE, iteration, diagnostics
     
     return xValue, MSE, iteration
             
             
+def LevenbergMarquardtStep(normalMatrix, gradient, damping):
+    # solves (J^T J + damping diag(J^T J)) dx = J^T r, scipy.linalg is only imported
+    # when the optimizer runs (it takes a few hundred ms)
+    from scipy.linalg import cho_factor, cho_solve
+    dampedMatrix = normalMatrix + damping*np.diag(np.diag(normalMatrix))
+    try:
+        return cho_solve(cho_factor(dampedMatrix), gradient)
+    except np.linalg.LinAlgError:
+        # singular (e.g. a vol without influence), minimal norm solution
+        return np.linalg.lstsq(dampedMatrix, gradient, rcond = None)[0]
+            
 
     
-def getGradientFiniteDifference(function, volastructure):    
-    gradientMatrix = np.zeros((volastructure.shape[0],volastructure.shape[0] ))
-    for index, sigma in enumerate(volastructure[::,1]):
-        lowerBound = sigma-1e-5
-        while lowerBound<0:
-            lowerBound /= 10
-            
-        upperBound = sigma+1e-5
-        newvolastructure1 = copy(volastructure)
-        newvolastructure1[index][1] = lowerBound
-        
-        newvolastructure2 = copy(volastructure)
-        newvolastructure2[index][1] = upperBound
+def getGradientFiniteDifference(function, volastructure, finiteDifferenceStep = 1e-5, method = 'central',
+                                vectorized = False, functionValue = None, bounds = None):
+    '''
+    Finite difference jacobian d price_i / d vol_j. All bumped volastructures are
+    stacked to one array (number of bumps, number of vols, 2) and evaluated together.
 
-        gradientMatrix[::,index] = (function(newvolastructure2) - function(newvolastructure1))\
-            /(1e-5+sigma-lowerBound)
-            
-    return gradientMatrix
-            
-            
+    Parameters
+    ----------
+    function : TYPE callable.
+        DESCRIPTION. Maps a volastructure to the model prices. If vectorized, it
+        maps a stack of volastructures to a (number of bumps, number of prices) array.
+    volastructure : TYPE np.array.
+        DESCRIPTION. [date, vol] in rows.
+    finiteDifferenceStep : TYPE, float or np.array.
+        DESCRIPTION. The default is 1e-5. Absolute bump, one per vol or for all.
+    method : TYPE, str.
+        DESCRIPTION. The default is 'central'. 'forward', 'backward' or 'central'.
+        Bumps are shortened to stay inside the bounds, one sided bumps change
+        the direction at a bound.
+    vectorized : TYPE, bool.
+        DESCRIPTION. The default is False. The function accepts stacks of
+        volastructures, otherwise it is called once per bump.
+    functionValue : TYPE, np.array.
+        DESCRIPTION. The default is None. Prices at volastructure, saves one
+        evaluation for the one sided methods.
+    bounds : TYPE, list.
+        DESCRIPTION. The default is None (non negative vols). See
+        LevenberquOptimizer.
 
-def fun(x):    
-    price1 = x[0][1]**2 - x[1][1]**2
-    price2 = x[1][1]**2
-    price3 = x[2][1]**2
-    return np.array([price1, price2, price3])
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. Jacobian (number of prices, number of vols), zero for
+        vols fixed by equal bounds.
 
+    '''
+    if method not in ('forward', 'backward', 'central'):
+        raise ValueError("method must be 'forward', 'backward' or 'central', not {}".format(method))
+    
+    sigma = volastructure[::,1].astype(float)
+    numberOfParameters = sigma.shape[0]
+    step = np.broadcast_to(np.asarray(finiteDifferenceStep, dtype = float), (numberOfParameters,))
+    lowerBound, upperBound = getBounds(bounds, numberOfParameters)
+    upperRoom = np.maximum(upperBound - sigma, 0)
+    lowerRoom = np.maximum(sigma - lowerBound, 0)
+    
+    # stacked bump matrix, one row per evaluation
+    if method == 'central':
+        upperStep = np.minimum(step, upperRoom)
+        lowerStep = np.minimum(step, lowerRoom)
+        bumpedSigmas = np.concatenate((sigma + np.diag(upperStep), sigma - np.diag(lowerStep)))
+        stepLength = upperStep + lowerStep
+    else:
+        # signed bumps in the direction of the method, turned around (or shortened if
+        # there is less room on the other side) at a bound
+        direction = 1. if method == 'forward' else -1.
+        room, otherRoom = (upperRoom, lowerRoom) if method == 'forward' else (lowerRoom, upperRoom)
+        stepLength = np.where(room >= step, direction*step,
+                              np.where(otherRoom > room, -direction*np.minimum(step, otherRoom), direction*room))
+        bumpedSigmas = sigma + np.diag(stepLength)
+        if functionValue is None:
+            bumpedSigmas = np.concatenate((bumpedSigmas, sigma[None, :]))
+    
+    volastructures = np.repeat(np.asarray(volastructure, dtype = float)[None, :, :], bumpedSigmas.shape[0], axis = 0)
+    volastructures[:, :, 1] = bumpedSigmas
+    
+    if vectorized:
+        values = np.asarray(function(volastructures), dtype = float)
+    else:
+        values = np.array([function(bumpedVolastructure) for bumpedVolastructure in volastructures], dtype = float)
+    values = values.reshape(bumpedSigmas.shape[0], -1)
+    
+    if method == 'central':
+        difference = values[:numberOfParameters] - values[numberOfParameters:]
+    else:
+        baseValue = values[-1] if functionValue is None else np.asarray(functionValue, dtype = float).ravel()
+        difference = values[:numberOfParameters] - baseValue
+    
+    # vols without room (equal bounds) have no influence
+    isFixed = stepLength == 0
+    return np.where(isFixed[:, None], 0., difference/np.where(isFixed, 1., stepLength)[:, None]).T
 
-volastructure = np.array([[1.0, 2],
-                          [2.0, 2],
-                          [3.0, 2]])
 
+def getBounds(bounds, numberOfParameters):
+    '''
+    Lower and upper bound per vol from the bounds argument of LevenberquOptimizer.
 
+    '''
+    if bounds is None or len(bounds) == 0:
+        bounds = (0, np.inf)
+    
+    try:
+        pairs = np.array(bounds, dtype = float)
+    except ValueError:
+        pairs = None
+    
+    if pairs is not None and pairs.shape == (numberOfParameters, 2):
+        lowerBound, upperBound = pairs.T
+    elif len(bounds) == 2:
+        try:
+            lowerBound, upperBound = (np.broadcast_to(np.array(bound, dtype = float), (numberOfParameters,))
+                                      for bound in bounds)
+        except ValueError:
+            raise ValueError("the lower and upper bounds must be floats or have one value per vol")
+    else:
+        raise ValueError("bounds must be (lower, upper) or one (lower, upper) pair per vol")
+    lowerBound = np.where(np.isnan(lowerBound), -np.inf, lowerBound)
+    upperBound = np.where(np.isnan(upperBound), np.inf, upperBound)
+    if np.any(lowerBound > upperBound):
+        raise ValueError("lower bounds must not exceed the upper bounds")
+    
+    return lowerBound, upperBound
+            
+            
 
-grad = getGradientFiniteDifference(fun, volastructure)
+if __name__ == '__main__':
+    def fun(x):    
+        price1 = x[0][1]**2 - x[1][1]**2
+        price2 = x[1][1]**2
+        price3 = x[2][1]**2
+        return np.array([price1, price2, price3])
 
 
-marketPrice = np.array([0, 2, 0])
+    volastructure = np.array([[1.0, 2],
+                              [2.0, 2],
+                              [3.0, 2]])
 
-bounds = []
-sol, mse, it = LevenberquOptimizer(fun, marketPrice, volastructure, bounds, learningRate=0.1, tol=0.000001)
 
-print('SOl: {} and function valu {}'.format(sol,mse))
 
-print(fun(sol))
+    grad = getGradientFiniteDifference(fun, volastructure)
 
 
+    marketPrice = np.array([0, 2, 0])
 
+    bounds = []
+    sol, mse, it = LevenberquOptimizer(fun, marketPrice, volastructure, bounds, learningRate=0.1, tol=0.000001)
 
+    print('SOl: {} and function valu {}'.format(sol,mse))
 
+    print(fun(sol))
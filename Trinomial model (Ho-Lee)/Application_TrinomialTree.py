@@ -6,7 +6,7 @@ Created on Mon Oct 11 17:08:56 2021
 """
 
 import numpy as np
-from TrinomialTree import treeConstruction, calculateBondPrice
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
 from tabulate import tabulate
 
 Zerocurve = np.array([[1, 0.03],
@@ -33,13 +33,9 @@ for index in range(5):
 ExDates = np.array([[0., 0.0]])
 
 
-numericPrices = []
-relativeError = []
-for index, cashFlow in enumerate(cashFlows):
-    numericPrice = calculateBondPrice(tree, cashFlow, ExDates)
-    numericPrices.append(numericPrice)
-    
-    relativeError.append((numericPrice-analyticPrices[index])/analyticPrices[index] * 100)
+# all bonds are priced in one backward induction
+numericPrices = calculatePortfolioPrices(tree, cashFlows, [ExDates]*len(cashFlows))
+relativeError = (numericPrices - np.array(analyticPrices))/np.array(analyticPrices) * 100
 
 
 data = np.array([paymentTimes, analyticPrices, numericPrices, relativeError]).T
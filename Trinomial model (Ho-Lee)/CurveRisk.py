@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Bucketed curve risk (key rate ladder) of instruments priced in the
+trinomial tree (bermudan calls or puts on bonds, as in
+calculatePortfolioPrices).
+
+Every scenario is a bump of the zero rates at the dates of the curve, the
+default scenarios bump one date at a time (key rates), the interpolation
+turns them into triangles. The scenarios are split into one chunk per
+worker of a process pool. A worker builds the base tree once and applies
+the bumps of its chunk with TrinomialTree.UpdateZeroCurve, which only
+refits the steps after the first changed zero bond. All instruments are
+priced in one backward induction per scenario.
+@author: Marcel Pommer
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ZeroCurve import ZeroCurve
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+
+
+def keyRateLadder(Zerocurve, lastDate, volatility, cashflows, ExDates, bumps = None, bumpSize = 1e-4,
+                  StepsPerYear = 72, a = 0, isPut = None, maxWorkers = None, executor = None):
+    '''
+    Parameters
+    ----------
+    Zerocurve : TYPE np.array or ZeroCurve.
+        DESCRIPTION. Base curve, [date, zero rate] in rows.
+    lastDate : TYPE float.
+        DESCRIPTION. Last date of the tree.
+    volatility : TYPE float or np.array.
+        DESCRIPTION. Volatility or volastructure of the tree.
+    cashflows : TYPE list.
+        DESCRIPTION. One [date, amount] array per instrument.
+    ExDates : TYPE list.
+        DESCRIPTION. One [date, price] array per instrument.
+    bumps : TYPE, np.array.
+        DESCRIPTION. The default is None (key rates). Shifts of the zero
+        rates (number of scenarios, number of curve dates).
+    bumpSize : TYPE, float.
+        DESCRIPTION. The default is 1e-4 (one basis point). Shift of the
+        default key rate scenarios.
+    StepsPerYear : TYPE, int.
+        DESCRIPTION. The default is 72.
+    a : TYPE, float.
+        DESCRIPTION. The default is 0. Mean reversion.
+    isPut : TYPE, bool or np.array.
+        DESCRIPTION. The default is None (calls). See BondOptionPortfolio.
+    maxWorkers : TYPE, int.
+        DESCRIPTION. The default is None (number of cores). Size of the
+        process pool and number of chunks.
+    executor : TYPE, concurrent.futures.Executor.
+        DESCRIPTION. The default is None. Executor to be used instead of a
+        new process pool (it is not shut down).
+
+    Returns
+    -------
+    TYPE tuple.
+        DESCRIPTION. Base prices (instruments) and the ladder of price
+        changes bumped - base (scenarios, instruments).
+
+    '''
+    Zerocurve = Zerocurve if isinstance(Zerocurve, ZeroCurve) else ZeroCurve(Zerocurve)
+    if bumps is None:
+        bumps = getKeyRateBumps(Zerocurve, bumpSize)
+    bumps = np.atleast_2d(np.asarray(bumps, dtype = float))
+    if bumps.shape[1] != Zerocurve.dates.shape[0]:
+        raise ValueError("one shift per curve date is needed, got {} shifts for {} dates"
+                         .format(bumps.shape[1], Zerocurve.dates.shape[0]))
+
+    numberOfChunks = min(maxWorkers or os.cpu_count() or 1, bumps.shape[0])
+    arguments = (Zerocurve, lastDate, volatility, cashflows, ExDates, StepsPerYear, a, isPut)
+
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = ProcessPoolExecutor(max_workers = maxWorkers)
+    try:
+        # the base prices are the first row of the first chunk
+        chunks = np.array_split(np.vstack((np.zeros(bumps.shape[1]), bumps)), max(numberOfChunks, 1))
+        futures = [executor.submit(priceScenarios, *arguments, chunk) for chunk in chunks if chunk.shape[0]]
+        prices = np.vstack([future.result() for future in futures])
+    finally:
+        if ownExecutor:
+            executor.shutdown(cancel_futures = True)
+
+    return prices[0], prices[1:] - prices[0]
+
+
+def priceScenarios(Zerocurve, lastDate, volatility, cashflows, ExDates, StepsPerYear, a, isPut, bumps):
+    '''
+    Prices of all instruments in the bumped curves of one chunk, runs in the
+    worker process. One tree is built and refitted to every bumped curve.
+
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. (scenarios, instruments).
+
+    '''
+    Tree = None
+    prices = np.zeros((bumps.shape[0], len(cashflows)))
+    for index, bump in enumerate(bumps):
+        bumpedCurve = ZeroCurve(np.column_stack((Zerocurve.dates, Zerocurve.rates + bump)),
+                                Zerocurve.interpolation, memoize = False)
+        if Tree is None:
+            Tree = treeConstruction(bumpedCurve, lastDate, volatility, StepsPerYear, a)
+        else:
+            Tree.UpdateZeroCurve(bumpedCurve)
+        prices[index] = calculatePortfolioPrices(Tree, cashflows, ExDates, isPut)
+
+    return prices
+
+
+def getKeyRateBumps(Zerocurve, bumpSize = 1e-4):
+    # one scenario per curve date, only its rate is shifted
+    numberOfDates = (Zerocurve.dates if isinstance(Zerocurve, ZeroCurve) else np.asarray(Zerocurve)[:,0]).shape[0]
+
+    return bumpSize*np.eye(numberOfDates)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of the tree: per stage timers, counters and debug dumps.
+
+The stages of the tree (SetUpDates, TreeStructure, TreeAdjustments,
+calculateNumericrates, BondOptionPortfolio) are decorated with timed,
+the counters are increased with count. Both do nothing but one attribute
+check while the instrumentation is disabled (the default), so the tree
+runs at full speed. Counter values which cost more than arithmetic are
+only computed under "if instrumentation.enabled". Dumps go through the logger 'TrinomialTree' at level
+DEBUG and are only formatted if that level is enabled:
+
+    import logging
+    from Instrumentation import instrumentation
+    logging.basicConfig(level = logging.DEBUG)
+    instrumentation.enable()
+    ...
+    print(instrumentation.getStatistics())
+@author: Marcel Pommer
+"""
+
+import time
+import logging
+import threading
+import functools
+
+
+logger = logging.getLogger('TrinomialTree')
+
+
+class Instrumentation:
+
+    def __init__(self, enabled = False):
+        '''
+        Parameters
+        ----------
+        enabled : TYPE, bool.
+            DESCRIPTION. The default is False. Collect timers and counters.
+
+        '''
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+
+    def enable(self):
+        self.enabled = True
+
+
+    def disable(self):
+        self.enabled = False
+
+
+    def timed(self, stage):
+        '''
+        Decorator, adds the run time of every call to the timer of the stage.
+
+        Parameters
+        ----------
+        stage : TYPE str.
+            DESCRIPTION. Name of the timer.
+
+        '''
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+
+                startTime = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    seconds = time.perf_counter() - startTime
+                    with self.lock:
+                        calls, totalSeconds = self.timers.get(stage, (0, 0.))
+                        self.timers[stage] = (calls + 1, totalSeconds + seconds)
+                    logger.debug('%s took %.6f s', stage, seconds)
+            return wrapper
+        return decorator
+
+
+    def count(self, counter, value = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+
+    def getStatistics(self):
+        '''
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'timers' ({stage : {'calls', 'seconds'}}) and
+            'counters' ({counter : value}).
+
+        '''
+        with self.lock:
+            return {'timers' : {stage : {'calls' : calls, 'seconds' : seconds}
+                                for stage, (calls, seconds) in self.timers.items()},
+                    'counters' : dict(self.counters)}
+
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+
+# shared by all trees
+instrumentation = Instrumentation()
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo simulation of the Ho-Lee (a = 0) / Hull-White short rate of a
+built trinomial tree. The paths live on the node times of the tree and use
+its fitted Alpha, so the simulated model is the one the tree discretises:
+    r_i = Alpha_i + x_i,   x_{i+1} = exp(-a dt_i) x_i + s_i Z_i,
+with the exact variance s_i^2 = vol_{i+1}^2 (1 - exp(-2 a dt_i))/(2a) of
+the Ornstein-Uhlenbeck process x.
+
+Paths are generated in chunks of (paths, steps) arrays, the memory is
+bounded by the chunk size. Every chunk has its own numpy Generator spawned
+from one SeedSequence, so the results only depend on the seed and the
+chunk size, not on the number of workers the chunks are evaluated on.
+
+Zero bond prices of the simulated model are known in closed form
+(getBondPrices), the discounted zero bond of a date can be used as a
+control variate with an exact mean. Antithetic paths flip the normals,
+a path and its antithetic path count as one sample for the errors.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+class MonteCarlo:
+
+    def __init__(self, Tree, numberOfPaths, chunkSize = 4096, antithetic = False, seed = None):
+        '''
+        Parameters
+        ----------
+        Tree : TYPE TrinomialTree.
+            DESCRIPTION. Built tree, its node times, vols and alphas are used.
+        numberOfPaths : TYPE int.
+            DESCRIPTION. Number of simulated paths.
+        chunkSize : TYPE, int.
+            DESCRIPTION. The default is 4096. Paths per chunk, a chunk holds
+            a few (chunkSize, steps) arrays.
+        antithetic : TYPE, bool.
+            DESCRIPTION. The default is False. Half of the paths of a chunk
+            use the negated normals.
+        seed : TYPE, int or np.random.SeedSequence.
+            DESCRIPTION. The default is None.
+
+        '''
+        parameters = Tree.TrinomialTreeparameters
+        self.a = Tree.a
+        # the last node of the tree is a dummy, the paths end there
+        self.times = np.array(parameters['t'])
+        self.dt = np.array(parameters['dt'][:-1])
+        self.alpha = np.array(parameters['Alpha'][:-1])
+        volatility = np.array(parameters['volatility'][1:])
+        if self.a == 0:
+            self.stepStandardDeviations = volatility*np.sqrt(self.dt)
+        else:
+            self.stepStandardDeviations = volatility*np.sqrt((1 - np.exp(-2*self.a*self.dt))/(2*self.a))
+
+        if antithetic and chunkSize % 2:
+            raise ValueError("antithetic paths need an even chunk size, got {}".format(chunkSize))
+        self.numberOfPaths = numberOfPaths
+        self.chunkSize = chunkSize
+        self.antithetic = antithetic
+        self.seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+        # sums of exp(-a t_i) dt_i, used by the closed form bond prices
+        self.cumulatedDecay = np.concatenate(([0.], np.cumsum(np.exp(-self.a*self.times[:-1])*self.dt)))
+
+
+    def getChunkSizes(self):
+        numberOfChunks = -(-self.numberOfPaths // self.chunkSize)
+        chunkSizes = np.full(numberOfChunks, self.chunkSize)
+        chunkSizes[-1] = self.numberOfPaths - self.chunkSize*(numberOfChunks - 1)
+        if self.antithetic:
+            chunkSizes += chunkSizes % 2
+
+        return chunkSizes
+
+
+    def simulateChunk(self, chunkIndex):
+        '''
+        Parameters
+        ----------
+        chunkIndex : TYPE int.
+            DESCRIPTION. Index of the chunk, defines its random numbers.
+
+        Returns
+        -------
+        TYPE tuple.
+            DESCRIPTION. Short rates (paths, steps) of the nodes 0, ..., N-2 and
+            discount factors (paths, steps+1) to the node times 0, ..., N-1.
+
+        '''
+        # the child seed of a chunk is fixed by its index (SeedSequence.spawn counts its calls)
+        childSeed = np.random.SeedSequence(self.seedSequence.entropy, spawn_key = self.seedSequence.spawn_key
+                                           + (chunkIndex,), pool_size = self.seedSequence.pool_size)
+        generator = np.random.default_rng(childSeed)
+        numberOfPaths = self.getChunkSizes()[chunkIndex]
+
+        numberOfSteps = self.alpha.shape[0]
+        normals = generator.standard_normal((numberOfPaths // 2 if self.antithetic else numberOfPaths,
+                                             numberOfSteps - 1))
+        if self.antithetic:
+            normals = np.concatenate((normals, -normals))
+
+        # x_i = exp(-a t_i) sum_{k<i} exp(a t_{k+1}) s_k Z_k, one cumulative sum over the steps
+        shortRates = np.zeros((numberOfPaths, numberOfSteps))
+        normals *= self.stepStandardDeviations[:-1]*np.exp(self.a*self.times[1:-1])
+        np.cumsum(normals, axis = 1, out = shortRates[:, 1:])
+        shortRates *= np.exp(-self.a*self.times[:-1])
+        shortRates += self.alpha
+
+        discountFactors = np.zeros((numberOfPaths, numberOfSteps + 1))
+        np.cumsum(shortRates*self.dt, axis = 1, out = discountFactors[:, 1:])
+        np.exp(-discountFactors, out = discountFactors)
+
+        return shortRates, discountFactors
+
+
+    def generatePaths(self):
+        # generator of the chunks (short rates, discount factors)
+        for chunkIndex in range(self.getChunkSizes().shape[0]):
+            yield self.simulateChunk(chunkIndex)
+
+
+    def getBondPrices(self, startStep, endStep, shortRates = None):
+        '''
+        Zero bond prices P(t_m, t_n) of the simulated model, given the short
+        rate at t_m.
+
+        Parameters
+        ----------
+        startStep : TYPE int.
+            DESCRIPTION. Step m of the valuation date.
+        endStep : TYPE int.
+            DESCRIPTION. Step n >= m of the maturity.
+        shortRates : TYPE, float or np.array.
+            DESCRIPTION. The default is None (Alpha_m, the rate at t = 0).
+            Short rates r_m on the paths.
+
+        Returns
+        -------
+        TYPE float or np.array.
+            DESCRIPTION. Bond prices.
+
+        '''
+        m, n = startStep, endStep
+        x = 0. if shortRates is None else np.asarray(shortRates) - self.alpha[m]
+        if n <= m:
+            return np.ones(np.shape(x)) if np.ndim(x) else 1.
+
+        # int x dt = -x_m B + sum of normals, B and the variance V of the sum from
+        # the sums of exp(-a t_i) dt_i
+        C = self.cumulatedDecay
+        B = np.exp(self.a*self.times[m])*(C[n] - C[m])
+        k = np.arange(m, n - 1)
+        V = np.sum(self.stepStandardDeviations[k]**2*(np.exp(self.a*self.times[k+1])*(C[n] - C[k+1]))**2)
+
+        return np.exp(-self.alpha[m:n] @ self.dt[m:n] - x*B + 0.5*V)
+
+
+    def price(self, payoff, controlDate = None, maxWorkers = 1, executor = None):
+        '''
+        Parameters
+        ----------
+        payoff : TYPE callable.
+            DESCRIPTION. Maps (shortRates, discountFactors) of a chunk to the
+            discounted payoffs of its paths, picklable for process pools.
+        controlDate : TYPE, float.
+            DESCRIPTION. The default is None (no control variate). Maturity of
+            the discounted zero bond used as control variate, rounded to the
+            nearest node.
+        maxWorkers : TYPE, int.
+            DESCRIPTION. The default is 1 (chunks in this process). Size of a
+            process pool for the chunks.
+        executor : TYPE, concurrent.futures.Executor.
+            DESCRIPTION. The default is None. Executor for the chunks (it is
+            not shut down).
+
+        Returns
+        -------
+        TYPE tuple.
+            DESCRIPTION. Price and its standard error.
+
+        '''
+        controlStep = None if controlDate is None else int(np.argmin(np.abs(self.times - controlDate)))
+        chunkIndices = range(self.getChunkSizes().shape[0])
+
+        ownExecutor = executor is None and maxWorkers != 1
+        if ownExecutor:
+            executor = ProcessPoolExecutor(max_workers = maxWorkers)
+        try:
+            if executor is None:
+                sums = [simulateChunkSums(self, chunkIndex, payoff, controlStep) for chunkIndex in chunkIndices]
+            else:
+                futures = [executor.submit(simulateChunkSums, self, chunkIndex, payoff, controlStep)
+                           for chunkIndex in chunkIndices]
+                sums = [future.result() for future in futures]
+        finally:
+            if ownExecutor:
+                executor.shutdown(cancel_futures = True)
+
+        # sums of 1, Y, C, Y^2, C^2, YC over all samples
+        n, sumY, sumC, sumYY, sumCC, sumYC = np.sum(sums, axis = 0)
+        varianceY = (sumYY - sumY**2/n)/(n - 1)
+        if controlStep is None:
+            return sumY/n, np.sqrt(varianceY/n)
+
+        # optimal coefficient beta = cov(Y, C)/var(C), the control has mean P(0, t_n)
+        varianceC = (sumCC - sumC**2/n)/(n - 1)
+        covariance = (sumYC - sumY*sumC/n)/(n - 1)
+        beta = covariance/varianceC if varianceC > 0 else 0.
+        price = sumY/n - beta*(sumC/n - self.getBondPrices(0, controlStep))
+        variance = max(varianceY - covariance**2/varianceC if varianceC > 0 else varianceY, 0.)
+
+        return price, np.sqrt(variance/n)
+
+
+def simulateChunkSums(simulation, chunkIndex, payoff, controlStep):
+    # sums of the samples of one chunk, runs in the worker process
+    shortRates, discountFactors = simulation.simulateChunk(chunkIndex)
+    Y = np.asarray(payoff(shortRates, discountFactors), dtype = float)
+    C = discountFactors[:, controlStep] if controlStep is not None else np.zeros_like(Y)
+
+    # a path and its antithetic path are one sample
+    if simulation.antithetic:
+        Y = 0.5*(Y[:Y.shape[0]//2] + Y[Y.shape[0]//2:])
+        C = 0.5*(C[:C.shape[0]//2] + C[C.shape[0]//2:])
+
+    return np.array([Y.shape[0], Y.sum(), C.sum(), Y @ Y, C @ C, Y @ C])
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of built trinomial trees. A tree is identified by the contents of the
+zero curve (dates, rates and interpolation) together with the volatility,
+the mean reversion, the steps per year and the last date. On a hit the
+already built tree is returned, its arrays are read only, so it can be
+shared by all callers. Shared trees can not calculate their yields lazily,
+trees with yields are requested with withYields and the memory of the
+yields is charged to the budget. Trees are evicted least recently used
+first once the memory of all cached trees exceeds the budget.
+@author: Marcel Pommer
+"""
+
+import hashlib
+import threading
+import numpy as np
+from copy import copy
+from collections import OrderedDict
+from ZeroCurve import ZeroCurve
+from TrinomialTree import treeConstruction
+
+
+class TreeCache:
+
+    def __init__(self, memoryBudget = 2**30):
+        '''
+        Parameters
+        ----------
+        memoryBudget : TYPE, int.
+            DESCRIPTION. The default is 2**30 (1 GB). Maximal memory in bytes
+            of all cached trees, trees larger than the budget are built but
+            not cached.
+
+        '''
+        self.memoryBudget = memoryBudget
+        self.trees = OrderedDict()
+        self.sizes = {}
+        self.memorySize = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+
+    def treeConstruction(self, Zerocurve, lastDate, volatility, StepsPerYear = 72, a = 0, withYields = False):
+        '''
+        Cached version of TrinomialTree.treeConstruction.
+
+        Parameters
+        ----------
+        Zerocurve : TYPE np.array or ZeroCurve.
+            DESCRIPTION. [date, zero rate] in rows.
+        lastDate : TYPE float.
+            DESCRIPTION. Last date of the tree.
+        volatility : TYPE float.
+            DESCRIPTION. Volatility of the short rate.
+        StepsPerYear : TYPE, int.
+            DESCRIPTION. The default is 72.
+        a : TYPE, float.
+            DESCRIPTION. The default is 0. Mean reversion.
+        withYields : TYPE, bool.
+            DESCRIPTION. The default is False. Calculate the yields of all
+            nodes (getYieldCurve) before the tree is cached.
+
+        Returns
+        -------
+        TYPE TrinomialTree.
+            DESCRIPTION. Built tree with read only arrays.
+
+        '''
+        Zerocurve = Zerocurve if isinstance(Zerocurve, ZeroCurve) else ZeroCurve(Zerocurve)
+        key = self.getKey(Zerocurve, lastDate, volatility, StepsPerYear, a)
+
+        with self.lock:
+            Tree = self.trees.get(key)
+            if Tree is not None and (not withYields or 'Yield' in Tree.TrinomialTreeparameters):
+                self.trees.move_to_end(key)
+                self.hits += 1
+                return Tree
+            self.misses += 1
+
+        # build outside of the lock, concurrent misses of the same key build twice
+        if Tree is None:
+            Tree = treeConstruction(Zerocurve, lastDate, volatility, StepsPerYear, a)
+        else:
+            # the cached tree is shared, the yields are added to a copy on the same arrays
+            Tree = copy(Tree)
+            Tree.TrinomialTreeparameters = dict(Tree.TrinomialTreeparameters)
+            Tree.isReadOnly = False
+        if withYields:
+            Tree.calculateNumericrates()
+        Tree.setReadOnly()
+        self.add(key, Tree)
+
+        return Tree
+
+
+    def add(self, key, Tree):
+        memorySize = Tree.getMemorySize()
+        if memorySize > self.memoryBudget:
+            return
+
+        with self.lock:
+            # a tree with yields replaces the cached one without
+            cachedTree = self.trees.get(key)
+            if cachedTree is not None:
+                if 'Yield' in cachedTree.TrinomialTreeparameters or 'Yield' not in Tree.TrinomialTreeparameters:
+                    return
+                del self.trees[key]
+                self.memorySize -= self.sizes.pop(key)
+            self.trees[key] = Tree
+            self.memorySize += memorySize
+            self.sizes[key] = memorySize
+
+            while self.memorySize > self.memoryBudget:
+                evictedKey, _ = self.trees.popitem(last = False)
+                self.memorySize -= self.sizes.pop(evictedKey)
+                self.evictions += 1
+
+
+    def getKey(self, Zerocurve, lastDate, volatility, StepsPerYear, a):
+        '''
+        Hash of the curve contents and the tree parameters.
+
+        '''
+        volatility = np.ascontiguousarray(volatility, dtype = float)
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(Zerocurve.curve).tobytes())
+        digest.update(Zerocurve.interpolation.encode())
+        digest.update(str(volatility.shape).encode())
+        digest.update(volatility.tobytes())
+        digest.update(np.array([lastDate, StepsPerYear, a], dtype = float).tobytes())
+
+        return digest.hexdigest()
+
+
+    def getStatistics(self):
+        '''
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'hits', 'misses', 'evictions', number of cached
+            'trees' and their 'memorySize' in bytes.
+
+        '''
+        with self.lock:
+            return {'hits' : self.hits,
+                    'misses' : self.misses,
+                    'evictions' : self.evictions,
+                    'trees' : len(self.trees),
+                    'memorySize' : self.memorySize}
+
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.sizes.clear()
+            self.memorySize = 0
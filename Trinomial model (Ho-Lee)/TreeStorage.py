@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Persistence of built trinomial trees in one file of flat arrays, which
+other processes attach with np.memmap (read only, zero copy) instead of
+rebuilding the tree.
+
+File layout
+    b'TRINOMIALTREE' + header length (uint64, little endian)
+    header (json): tree parameters and the dtype, shape and offset of
+                   every array
+    arrays (C order, 64 byte aligned): node times, rate dates, zero curve
+                   and all arrays of TrinomialTreeparameters (alphas,
+                   probabilities, branch indices, arrow debrau prices ...)
+
+Only the used entries of the padded per step arrays are written, the
+padding stays a hole of the (sparse) file on most file systems. The pages
+of an attached tree are only read from the file (or the page cache shared
+by all workers) when they are used.
+@author: Marcel Pommer
+"""
+
+import json
+import numpy as np
+from copy import copy
+from ZeroCurve import ZeroCurve
+from TrinomialTree import TrinomialTree
+
+
+MAGIC = b'TRINOMIALTREE'
+ALIGNMENT = 64
+PADDEDARRAYS = ('k', 'pu', 'pd', 'ArrowDebrauPrices', 'Yield')
+
+
+def saveTree(Tree, path, withYields = True):
+    '''
+    Parameters
+    ----------
+    Tree : TYPE TrinomialTree.
+        DESCRIPTION. Built tree.
+    path : TYPE str.
+        DESCRIPTION. File to be written (overwritten if it exists).
+    withYields : TYPE, bool.
+        DESCRIPTION. The default is True. Write the yields of all nodes
+        (getYieldCurve), they are calculated if the tree has none. Read
+        only attached trees can not calculate them later.
+
+    '''
+    if withYields and 'Yield' not in Tree.TrinomialTreeparameters:
+        # the yields are calculated on a copy on the same arrays, the tree (possibly
+        # shared and read only) is not changed
+        Tree = copy(Tree)
+        Tree.TrinomialTreeparameters = dict(Tree.TrinomialTreeparameters)
+        Tree.isReadOnly = False
+        Tree.calculateNumericrates()
+
+    arrays = {'NodeTimes' : Tree.NodeTimes, 'RateDates' : Tree.RateDates, 'curve' : Tree.Zerocurve.curve}
+    arrays.update(('parameters/' + key, value) for key, value in Tree.TrinomialTreeparameters.items())
+    if np.ndim(Tree.volatility):
+        arrays['volatility'] = np.asarray(Tree.volatility, dtype = float)
+
+    # header with the offsets of the arrays, the data starts after the header
+    header = {'StepsPerYear' : Tree.StepsPerYear, 'lastDate' : float(Tree.lastDate), 'a' : Tree.a,
+              'volatility' : None if np.ndim(Tree.volatility) else float(Tree.volatility),
+              'interpolation' : Tree.Zerocurve.interpolation, 'arrays' : {}}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        header['arrays'][name] = {'dtype' : array.dtype.str, 'shape' : list(array.shape), 'offset' : offset}
+        offset += -(-array.nbytes // ALIGNMENT)*ALIGNMENT
+    encodedHeader = json.dumps(header).encode()
+    dataOffset = -(-(len(MAGIC) + 8 + len(encodedHeader)) // ALIGNMENT)*ALIGNMENT
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC + np.uint64(len(encodedHeader)).astype('<u8').tobytes() + encodedHeader)
+        file.truncate(dataOffset + offset)
+
+    if offset == 0:
+        return
+    data = np.memmap(path, dtype = np.uint8, mode = 'r+', offset = dataOffset, shape = (offset,))
+    numberOfJNodes = Tree.TrinomialTreeparameters['numberOfJNodes']
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        description = header['arrays'][name]
+        target = data[description['offset']:description['offset'] + array.nbytes].view(array.dtype).reshape(array.shape)
+        if name.split('/')[-1] in PADDEDARRAYS:
+            # only the used nodes of every step, the padding stays zero
+            for i, numberOfNodes in enumerate(numberOfJNodes[:array.shape[0]]):
+                target[i, :numberOfNodes] = array[i, :numberOfNodes]
+        else:
+            target[...] = array
+    data.flush()
+    del data
+
+
+def loadTree(path, mmapMode = 'r'):
+    '''
+    Parameters
+    ----------
+    path : TYPE str.
+        DESCRIPTION. File written by saveTree.
+    mmapMode : TYPE, str.
+        DESCRIPTION. The default is 'r' (read only, shared pages). 'c' gives
+        a writable copy on write tree.
+
+    Returns
+    -------
+    TYPE TrinomialTree.
+        DESCRIPTION. Tree on memory mapped arrays, read only for mode 'r'.
+
+    '''
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is no tree file".format(path))
+        headerLength = int(np.frombuffer(file.read(8), dtype = '<u8')[0])
+        header = json.loads(file.read(headerLength).decode())
+    dataOffset = -(-(len(MAGIC) + 8 + headerLength) // ALIGNMENT)*ALIGNMENT
+
+    arrays = {}
+    for name, description in header['arrays'].items():
+        shape = tuple(description['shape'])
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype = description['dtype'])
+        else:
+            arrays[name] = np.memmap(path, dtype = description['dtype'], mode = mmapMode,
+                                     offset = dataOffset + description['offset'], shape = shape)
+
+    # the tree is assembled without building it
+    Tree = TrinomialTree.__new__(TrinomialTree)
+    Tree.StepsPerYear = header['StepsPerYear']
+    Tree.lastDate = header['lastDate']
+    Tree.a = header['a']
+    Tree.volatility = arrays.pop('volatility', header['volatility'])
+    Tree.Zerocurve = ZeroCurve(arrays.pop('curve'), header['interpolation'])
+    Tree.NodeTimes = arrays.pop('NodeTimes')
+    Tree.RateDates = Tree.TermStructureDates = arrays.pop('RateDates')
+    Tree.TotalNumberofNodes = Tree.NodeTimes.shape[0]
+    Tree.TrinomialTreeparameters = {name.split('/', 1)[1] : array for name, array in arrays.items()}
+    Tree.isReadOnly = mmapMode == 'r'
+
+    return Tree
@@ -4,8 +4,11 @@ Created on Mon Oct 11 17:02:58 2021
 
 @author: marce
 """
+import logging
 import numpy as np
 from copy import copy
+from ZeroCurve import ZeroCurve
+from Instrumentation import instrumentation, logger
 
 
 class TrinomialTree:
@@ -13,17 +16,19 @@ class TrinomialTree:
     def __init__(self, StepsPerYear, lastDate, Zerocurve):
         self.StepsPerYear = StepsPerYear
         self.lastDate = lastDate
-        self.Zerocurve = Zerocurve
+        # [date, rate] arrays are wrapped, a ZeroCurve object (and its memo) is shared
+        self.Zerocurve = Zerocurve if isinstance(Zerocurve, ZeroCurve) else ZeroCurve(Zerocurve)
         
-        self.NodeTimes, self.TermStructureDates = self.SetUpDates(Zerocurve)
+        self.NodeTimes, self.TermStructureDates = self.SetUpDates(self.Zerocurve)
         self.TotalNumberofNodes = self.NodeTimes.shape[0]
+        self.isReadOnly = False
         
         
+    @instrumentation.timed('SetUpDates')
     def SetUpDates(self, Zerocurve):
-        self.RateDates = copy(Zerocurve)
-        
-        index = np.argwhere(Zerocurve[:,0]>self.lastDate)[0][0]
-        self.RateDates = self.RateDates[:index, :]
+        # rate dates up to the last date of the tree
+        index = np.searchsorted(Zerocurve.dates, self.lastDate, side = 'right')
+        self.RateDates = np.array(Zerocurve.curve[:index, :])
         
         dt = float(1/self.StepsPerYear)
 
@@ -44,7 +49,8 @@ class TrinomialTree:
         self.a = float(a)
         self.volatility = volatility
         
-        # initialize the diccionary        
+        # initialize the diccionary, the per step arrays are allocated in TreeStructure
+        # once the width of the tree is known
         self.TrinomialTreeparameters = {'t' : np.zeros((self.TotalNumberofNodes)),
                                 'volatility' : np.zeros((self.TotalNumberofNodes)),
                                 'dR' : np.zeros((self.TotalNumberofNodes)),
@@ -52,19 +58,13 @@ class TrinomialTree:
                                 'minj' : np.zeros((self.TotalNumberofNodes)).astype(int),
                                 'numberOfJNodes' : np.zeros((self.TotalNumberofNodes)).astype(int),
                                 'numberOfRates' : np.zeros((self.TotalNumberofNodes)).astype(int),
-                                'Alpha' : np.zeros((self.TotalNumberofNodes)),
-                                'pu' : np.zeros((self.TotalNumberofNodes), dtype = object),
-                                'pd' : np.zeros((self.TotalNumberofNodes), dtype = object),
-                                'k' : np.zeros((self.TotalNumberofNodes), dtype = object),
-                                'ArrowDebrauPrices' : np.zeros((self.TotalNumberofNodes), dtype = object),
-                                'OptionPrice' : np.zeros((self.TotalNumberofNodes), dtype = object),
-                                'Yield' : np.zeros((self.TotalNumberofNodes), dtype = object)}
+                                'Alpha' : np.zeros((self.TotalNumberofNodes))}
         
         # initialize some parameters
         # times
         self.TrinomialTreeparameters['t'] = self.NodeTimes
-        # vola
-        self.TrinomialTreeparameters['volatility'] = np.full((1, self.TotalNumberofNodes), self.volatility)[0]
+        # vola, a float or a piecewise constant term structure
+        self.TrinomialTreeparameters['volatility'] = self.getNodeVolatilities(volatility)
         # delta times
         self.TrinomialTreeparameters['dt'][:-1] = self.TrinomialTreeparameters['t'][1:] - self.TrinomialTreeparameters['t'][:-1]
         # vertical spacing dR = sigma * sqrt(3* \Delta t)
@@ -79,199 +79,314 @@ class TrinomialTree:
         #step 2
         self.TreeAdjustments()
         
-        # now build the numeric rates
-        self.calculateNumericrates()
+    def getNodeVolatilities(self, volatility):
+        # volatility of the step ending at each node. A volastructure ([date, vol] rows,
+        # dates ascending) is piecewise constant, vol_k holds on (date_{k-1}, date_k] and
+        # the last vol is extended
+        if np.ndim(volatility) == 0:
+            nodeVolatilities = np.full((self.TotalNumberofNodes), float(volatility))
+        else:
+            volastructure = np.asarray(volatility, dtype = float).reshape(-1, 2)
+            bucket = np.searchsorted(volastructure[:,0], self.NodeTimes - 1e-10)
+            nodeVolatilities = volastructure[np.minimum(bucket, volastructure.shape[0] - 1), 1]
+        
+        # the spacing dR of a step is proportional to its vol
+        if not np.all(nodeVolatilities[1:] > 0):
+            raise ValueError("the volatilities must be positive")
+        
+        return nodeVolatilities
+        
+    def UpdateVolatility(self, volatility):
+        # new volatility (float or volastructure) for a built tree, see UpdateTree
+        return self.UpdateTree(volatility = volatility)
+        
+    def UpdateZeroCurve(self, Zerocurve):
+        # new (e.g. bumped) zero curve for a built tree, see UpdateTree
+        return self.UpdateTree(Zerocurve = Zerocurve)
+        
+    def UpdateTree(self, Zerocurve = None, volatility = None):
+        # applies a curve and/or vol bump to a built tree. The arrow debrau prices are
+        # built forward in time, so all steps before the first changed node are kept:
+        # a vol bump rebuilds the structure after the first changed vol, a curve bump
+        # only the arrow debrau prices and alphas after the first changed zero bond.
+        # Returns the first rebuilt step (TotalNumberofNodes if nothing changed)
+        if self.isReadOnly:
+            raise ValueError("the tree is read only")
         
+        firstStep = self.TotalNumberofNodes
+        if volatility is not None:
+            nodeVolatilities = self.getNodeVolatilities(volatility)
+            isChanged = nodeVolatilities[1:] != self.TrinomialTreeparameters['volatility'][1:]
+            self.volatility = volatility
+            if np.any(isChanged):
+                # node i+1 defines the spacing used by the branching of step i
+                firstStep = int(np.argmax(isChanged))
+                self.TrinomialTreeparameters['volatility'] = nodeVolatilities
+                self.TrinomialTreeparameters['dR'][firstStep+1:] = nodeVolatilities[firstStep+1:] \
+                    * np.sqrt(3* self.TrinomialTreeparameters['dt'][firstStep:-1])
+                self.TreeStructure(firstStep)
         
-    def TreeStructure(self):
-        # initlize parameters at the first node
-        numberverticalNodes = 1
-        self.TrinomialTreeparameters['k'][0] = np.zeros((numberverticalNodes)).astype(int)
-        self.TrinomialTreeparameters['pu'][0] = np.zeros((numberverticalNodes))
-        self.TrinomialTreeparameters['pd'][0] = np.zeros((numberverticalNodes))
-        self.TrinomialTreeparameters['ArrowDebrauPrices'][0] = np.zeros((numberverticalNodes))
-        self.TrinomialTreeparameters['OptionPrice'][0] = np.zeros((numberverticalNodes))
-        self.TrinomialTreeparameters['Yield'][0] = np.zeros((numberverticalNodes), dtype=object)
+        if Zerocurve is not None:
+            Zerocurve = Zerocurve if isinstance(Zerocurve, ZeroCurve) else ZeroCurve(Zerocurve)
+            # alpha of step i is fitted to the zero bond maturing at node i+1
+            isChanged = Zerocurve.getNodeDiscountFactors(self.NodeTimes)[1:] \
+                != self.Zerocurve.getNodeDiscountFactors(self.NodeTimes)[1:]
+            self.Zerocurve = Zerocurve
+            self.NodeTimes, self.TermStructureDates = self.SetUpDates(self.Zerocurve)
+            self.TrinomialTreeparameters['t'] = self.NodeTimes
+            self.TrinomialTreeparameters.pop('Yield', None)
+            if np.any(isChanged):
+                firstStep = min(firstStep, int(np.argmax(isChanged)))
         
-        self.TrinomialTreeparameters['numberOfJNodes'][0] = numberverticalNodes
-        # minj is zero since we only have one node
+        if firstStep < self.TotalNumberofNodes:
+            self.TreeAdjustments(firstStep)
+            self.TrinomialTreeparameters.pop('Yield', None)
+        
+        return firstStep
+        
+    def TreeWidths(self, firstStep = 0):
+        # the number of vertical nodes of the next step only depends on the
+        # branching of the highest node, so all widths are known before the
+        # probabilities are calculated
+        self.TrinomialTreeparameters['numberOfJNodes'][0] = 1
         self.TrinomialTreeparameters['minj'][0] = 0
-        # we initialize alpha with zero and adjust it in the second step
-        self.TrinomialTreeparameters['Alpha'][0] = 0
         
-        # now loop over allhorizontal nodes (times)
-        for i in range(self.TotalNumberofNodes-1): # only until -1, since we calculate for the next (i+1) period
-            # get all necessray parameters (from period before)
-            minj = self.TrinomialTreeparameters['minj'][i]
+        for i in range(firstStep, self.TotalNumberofNodes-2):
             dt = self.TrinomialTreeparameters['dt'][i]
-            dRNext = self.TrinomialTreeparameters['dR'][i+1]
-            dR = self.TrinomialTreeparameters['dR'][i]
-            Alpha = self.TrinomialTreeparameters['Alpha'][i]
-            centralNode = -self.TrinomialTreeparameters['minj'][i]  # central node (vertical) starting to count by the lowest node
+            highestNode = -self.TrinomialTreeparameters['minj'][i]
+            
+            rNext = highestNode*self.TrinomialTreeparameters['dR'][i]*(1. - self.a*dt)
+            kValuation = int(rNext/self.TrinomialTreeparameters['dR'][i+1] + 0.5)
+            
+            self.TrinomialTreeparameters['numberOfJNodes'][i+1] = int(2*(kValuation+1) +1)
+            self.TrinomialTreeparameters['minj'][i+1] = -(kValuation +1)
+            
+        
+    @instrumentation.timed('TreeStructure')
+    def TreeStructure(self, firstStep = 0):
+        # widths and offsets (minj) of all steps, the steps before firstStep are kept
+        self.TreeWidths(firstStep)
+        # the number of nodes is only summed up if it is counted
+        if instrumentation.enabled:
+            instrumentation.count('structureSteps', self.TotalNumberofNodes - firstStep)
+            instrumentation.count('structureNodes', int(self.TrinomialTreeparameters['numberOfJNodes'][firstStep:].sum()))
+        
+        # all per node quantities are stored in 2-D arrays (step, vertical node),
+        # padded to the maximal width. Node j of step i is at the vertical position
+        # minj[i] + j, only the first numberOfJNodes[i] entries of a row are used.
+        # A partial rebuild only allocates new arrays if the tree got wider
+        shape = (self.TotalNumberofNodes, max(self.TrinomialTreeparameters['numberOfJNodes'].max(), 1))
+        for key, dtype in [('k', int), ('pu', float), ('pd', float), ('ArrowDebrauPrices', float)]:
+            previous = self.TrinomialTreeparameters.get(key) if firstStep > 0 else None
+            if previous is None or previous.shape[1] < shape[1]:
+                self.TrinomialTreeparameters[key] = np.zeros(shape, dtype = dtype)
+                if previous is not None:
+                    self.TrinomialTreeparameters[key][:, :previous.shape[1]] = previous
+        
+        # we initialize alpha with zero and adjust it in the second step
+        self.TrinomialTreeparameters['Alpha'][firstStep:] = 0
+        
+        # now loop over allhorizontal nodes (times), all vertical nodes of a step at once
+        upperPositions = np.arange(-self.TrinomialTreeparameters['minj'].min() + 1)
+        for i in range(firstStep, self.TotalNumberofNodes-1): # only until -1, since we calculate for the next (i+1) period
             numberOfVerticalNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+            centralNode = -self.TrinomialTreeparameters['minj'][i]  # central node (vertical) starting to count by the lowest node
+            dt = self.TrinomialTreeparameters['dt'][i]
             
-            variance = self.TrinomialTreeparameters['volatility'][i+1]**2 * dt
+            # expected position of the next step (mean of the process) in units of the next
+            # spacing, because of symmetry only for the upper part
+            expectedPosition = upperPositions[:centralNode+1]*(self.TrinomialTreeparameters['dR'][i]\
+                *(1. - self.a*dt)/self.TrinomialTreeparameters['dR'][i+1])
+            kValuation = np.floor(expectedPosition + 0.5)
             
-            # next we loop over all vertical nodes and calculate the probs for going up and down
-            for j in range(centralNode, numberOfVerticalNodes): # because of symmetry same for over and under the central nodes
-                r = Alpha + (minj +j)*dR    # basically the first step, the spacing is always j*dR, but counting from 0!!
-                
-                rNext = r*(1. - self.a*dt)  # from mean of the process
-                
-                kValuation = int(rNext/dRNext + 0.5) # the next k 
-                
-                nextK = kValuation
-                self.TrinomialTreeparameters['k'][i][j] = nextK
+            # branching probabilities of hull and white, eta is the distance between the
+            # expected position and the middle branch
+            eta = expectedPosition - kValuation
+            pu = 1/6 + 0.5*(eta*eta + eta)
+            pd = pu - eta
             
-                self.TrinomialTreeparameters['pu'][i][j] = 1/6 + 0.5*(self.a**2*(minj +j)*dt**2 - self.a*(minj +j)*dt)
-                self.TrinomialTreeparameters['pd'][i][j] = 1/6 + 0.5*(self.a**2*(minj +j)*dt**2 + self.a*(minj +j)*dt)               
-                # consistency check
-                if self.TrinomialTreeparameters['pu'][i][j]< 0 or self.TrinomialTreeparameters['pd'][i][j] < 0 \
-                    or self.TrinomialTreeparameters['pu'][i][j] + self.TrinomialTreeparameters['pd'][i][j] > 1:
-                    self.TrinomialTreeparameters['pu'][i][j] = 1
-                    self.TrinomialTreeparameters['pd'][i][j] = 0
-                    
-                # for symmetry applay parameters for lower part
-                self.TrinomialTreeparameters['k'][i][2* centralNode - j] = - int(kValuation)
-                self.TrinomialTreeparameters['pu'][i][2* centralNode - j] = self.TrinomialTreeparameters['pd'][i][j]
-                self.TrinomialTreeparameters['pd'][i][2* centralNode - j] = self.TrinomialTreeparameters['pu'][i][j]
-                
-            # if we are before the last step we have to initlaize space for the next step
+            # if we are before the last step we change the counting from k, so that it
+            # is in range[1,2*minj_{i+1}-1]
             if i<(self.TotalNumberofNodes - 2):
-                numberOfNewNodes = int(2*(kValuation+1) +1)
-                self.TrinomialTreeparameters['numberOfJNodes'][i+1] = numberOfNewNodes
-                self.TrinomialTreeparameters['minj'][i+1] = -(kValuation +1)
-                self.TrinomialTreeparameters['Alpha'][i+1] = 0
-                
-                # ensure that we have at least one node
-                if self.TrinomialTreeparameters['numberOfJNodes'][i+1] < 1:
-                    self.TrinomialTreeparameters['numberOfJNodes'][i+1] = 1
-                    
-                # stoarge for next step
-                self.TrinomialTreeparameters['k'][i+1] = np.zeros((numberOfNewNodes)).astype(int)
-                self.TrinomialTreeparameters['pu'][i+1] = np.zeros((numberOfNewNodes))
-                self.TrinomialTreeparameters['pd'][i+1] = np.zeros((numberOfNewNodes))
-                self.TrinomialTreeparameters['ArrowDebrauPrices'][i+1] = np.zeros((numberOfNewNodes))
-                self.TrinomialTreeparameters['OptionPrice'][i+1] = np.zeros((numberOfNewNodes))
-                self.TrinomialTreeparameters['Yield'][i+1] = np.zeros((numberOfNewNodes), dtype=object)
+                kShift = self.TrinomialTreeparameters['minj'][i+1]
+            else:
+                kShift = 0
                 
-                # finaly we also change the counting from k, so that it is in range[1,2*minj_{i+1}-1]
-                for j in range(numberOfVerticalNodes):
-                    self.TrinomialTreeparameters['k'][i][j] = self.TrinomialTreeparameters['k'][i][j] - self.TrinomialTreeparameters['minj'][i+1]
-                # print(self.TrinomialTreeparameters['k'][11])
-                # print(self.TotalNumberofNodes)
-        
-    def TreeAdjustments(self):
-        # initialize the arrow debrau price at 1
-        self.TrinomialTreeparameters['ArrowDebrauPrices'][0][0] = 1
-            
+            # for symmetry applay parameters for lower part
+            self.TrinomialTreeparameters['k'][i, centralNode:numberOfVerticalNodes] = kValuation - kShift
+            self.TrinomialTreeparameters['k'][i, :centralNode] = -kValuation[:0:-1] - kShift
+            self.TrinomialTreeparameters['pu'][i, centralNode:numberOfVerticalNodes] = pu
+            self.TrinomialTreeparameters['pu'][i, :centralNode] = pd[:0:-1]
+            self.TrinomialTreeparameters['pd'][i, centralNode:numberOfVerticalNodes] = pd
+            self.TrinomialTreeparameters['pd'][i, :centralNode] = pu[:0:-1]
+        
+    @instrumentation.timed('TreeAdjustments')
+    def TreeAdjustments(self, firstStep = 0):
+        # initialize the arrow debrau price at 1, the arrow debrau prices up to firstStep
+        # and the alphas before firstStep are kept
+        self.TrinomialTreeparameters['ArrowDebrauPrices'][0, 0] = 1
+        self.TrinomialTreeparameters['ArrowDebrauPrices'][firstStep+1:] = 0
+        
+        instrumentation.count('adjustmentSteps', self.TotalNumberofNodes - 1 - firstStep)
+        
+        # zero bond prices of the curve at the end of each step
+        zeroBondPrices = self.Zerocurve.getNodeDiscountFactors(self.NodeTimes)[1:]
+        positions = np.arange(self.TrinomialTreeparameters['minj'].min(), 1 - self.TrinomialTreeparameters['minj'].min())
+        
         # calculate alphas according to hull and white
-        for i in range(self.TotalNumberofNodes-1):
-            shortRate = np.zeros((self.TrinomialTreeparameters['numberOfJNodes'][i]))
-            nextT = self.TrinomialTreeparameters['t'][i+1]
+        for i in range(firstStep, self.TotalNumberofNodes-1):
+            numberOfVerticalNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+            offset = self.TrinomialTreeparameters['minj'][i] - positions[0]
+            verticalRates = positions[offset:offset + numberOfVerticalNodes] * self.TrinomialTreeparameters['dR'][i]
             dt1 = self.TrinomialTreeparameters['dt'][i]
-
-            p = np.exp(-nextT * getZero(self.Zerocurve,nextT))
-                
-            summe = 0
-            for j in range(self.TrinomialTreeparameters['numberOfJNodes'][i]):
-                summe += self.TrinomialTreeparameters['ArrowDebrauPrices'][i][j]\
-                    * np.exp(-1*(self.TrinomialTreeparameters['minj'][i] + j) * self.TrinomialTreeparameters['dR'][i]*dt1)
-            alpha = (np.log(summe) - np.log(p))/dt1
+            ArrowDebrauPrices = self.TrinomialTreeparameters['ArrowDebrauPrices'][i, :numberOfVerticalNodes]
+            
+            # alpha from sum_j Q_j exp(-(alpha + j dR) dt) = P(0, t_{i+1})
+            discountFactor = ArrowDebrauPrices*np.exp(-dt1*verticalRates)
+            summe = discountFactor.sum()
+            alpha = (np.log(summe) - np.log(zeroBondPrices[i]))/dt1
                 
             self.TrinomialTreeparameters['Alpha'][i] = alpha
                 
-            # determine arrow debrau prices for the next time step
+            # determine arrow debrau prices for the next time step, every node sends its
+            # discounted price to the three nodes k+1, k, k-1
             if i< self.TotalNumberofNodes-2:
-                for j in range(self.TrinomialTreeparameters['numberOfJNodes'][i]):
-                    r = self.TrinomialTreeparameters['Alpha'][i] + (self.TrinomialTreeparameters['minj'][i] + j)* self.TrinomialTreeparameters['dR'][i]
-                        
-                    shortRate[j] = r
-                    discountFactor = self.TrinomialTreeparameters['ArrowDebrauPrices'][i][j]*np.exp(-r*dt1)
-
-                    currentK = self.TrinomialTreeparameters['k'][i][j] 
-                    pu = self.TrinomialTreeparameters['pu'][i][j]
-                    pd = self.TrinomialTreeparameters['pd'][i][j]
-                    pm = 1- pu-pd
-                        
-                    # calculate the arrow debrau prices 
-                    self.TrinomialTreeparameters['ArrowDebrauPrices'][i+1][currentK +1] += pu* discountFactor
-                    self.TrinomialTreeparameters['ArrowDebrauPrices'][i+1][currentK ] += pm* discountFactor
-                    self.TrinomialTreeparameters['ArrowDebrauPrices'][i+1][currentK -1] += pd* discountFactor
-        
-                # now safe the short rate
-                self.TrinomialTreeparameters['ArrowDebrauPrices'][i] = shortRate
+                discountFactor *= zeroBondPrices[i]/summe
+                currentK = self.TrinomialTreeparameters['k'][i, :numberOfVerticalNodes]
+                upFlow = self.TrinomialTreeparameters['pu'][i, :numberOfVerticalNodes]*discountFactor
+                downFlow = self.TrinomialTreeparameters['pd'][i, :numberOfVerticalNodes]*discountFactor
+                
+                numberOfNextNodes = self.TrinomialTreeparameters['numberOfJNodes'][i+1]
+                nextArrowDebrauPrices = self.TrinomialTreeparameters['ArrowDebrauPrices'][i+1, :numberOfNextNodes]
+                nextArrowDebrauPrices += np.bincount(currentK, discountFactor - upFlow - downFlow, numberOfNextNodes)
+                nextArrowDebrauPrices[1:] += np.bincount(currentK, upFlow, numberOfNextNodes - 1)
+                nextArrowDebrauPrices[:-1] += np.bincount(currentK - 1, downFlow, numberOfNextNodes - 1)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('tree with %d steps (from step %d), maximal width %d\nwidths %s\nalphas %s',
+                         self.TotalNumberofNodes, firstStep, self.TrinomialTreeparameters['numberOfJNodes'].max(),
+                         self.TrinomialTreeparameters['numberOfJNodes'], self.TrinomialTreeparameters['Alpha'])
                 
     
+    @instrumentation.timed('calculateNumericrates')
     def calculateNumericrates(self):
-        datesOfRate = self.RateDates[:,0][::-1]
-
+        # zero bond prices of all rate dates, rolled back through the tree for all
+        # nodes of a step at once (rate dates first, vertical nodes last). Read only
+        # trees are shared (caches, memory maps), their yields are calculated before
+        if self.isReadOnly:
+            raise ValueError("the tree is read only, the yields have to be calculated before")
+        
+        datesOfRate = self.RateDates[:,0]
+        totalNumberOfRates = datesOfRate.shape[0]
+        
+        # one yield per node and rate date (ascending as in RateDates)
+        Yields = np.full(self.TrinomialTreeparameters['pu'].shape + (totalNumberOfRates,), np.nan)
+        numberOfRates = np.zeros((self.TotalNumberofNodes), dtype = int)
+        
+        ZeroBondPrices = None
         for i in range(self.TotalNumberofNodes-2, -1, -1):
             t = self.TrinomialTreeparameters['t'][i]
-            print("t: ",t)
-            print("u: ",i)
-            # check the number of rates to be calculated
-            if t<= datesOfRate[-1]:
-                numberOfRates = datesOfRate.shape[0]
+            numberOfNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+            shortRates = self.getShortRates(i)
+            
+            # check the number of rates to be calculated (all rate dates not before t)
+            isAlive = datesOfRate >= t
+            numberOfRates[i] = int(np.sum(isAlive))
+            
+            if ZeroBondPrices is None:
+                ZeroBondPrices = np.full((totalNumberOfRates, numberOfNodes), np.nan)
             else:
-                numberOfRates =  np.argwhere(datesOfRate<t)[0][0]
-                
-            print("Rates: ", numberOfRates)
+                ZeroBondPrices = self.discountedExpectation(i, ZeroBondPrices)
             
-            self.TrinomialTreeparameters['numberOfRates'][i] = int(numberOfRates)
-            numberOfNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+            # bonds maturing today are worth one, bonds maturing before the next step
+            # are discounted with the short rate of the node
+            TimeDelta = datesOfRate - t
+            isToday = np.abs(TimeDelta) <= (1/365)
+            isBeforeNextStep = ~isToday & (TimeDelta > 0) & (datesOfRate < self.TrinomialTreeparameters['t'][i+1] - 1/365)
+            ZeroBondPrices[isToday] = 1
+            ZeroBondPrices[isBeforeNextStep] = np.exp(-np.outer(TimeDelta[isBeforeNextStep], shortRates))
             
-            for j in range(numberOfNodes):
-                self.TrinomialTreeparameters['Yield'][i][j] = np.zeros((numberOfRates, 2))
-                self.TrinomialTreeparameters['Yield'][i][j][:,0] = datesOfRate[0:numberOfRates]
-                for k in range(numberOfRates):
-                    if i == self.TotalNumberofNodes or abs(t-datesOfRate[k])<=(1/365):
-                        # print("anaotehr i: ", i)
-                        # print(t)
-                        # print(datesOfRate[k])
-                        self.TrinomialTreeparameters['Yield'][i][j][k,1] = 1
-                    else:
-                        print("i and J")
-                        print(i)
-                        print(j)
-                        self.TrinomialTreeparameters['Yield'][i][j][k,1] = self.BondValue(i,j,k)
-                    
-        for i in range(self.TotalNumberofNodes-2, -1, -1):
-            t = self.TrinomialTreeparameters['t'][i] 
-            numberOfNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+            # continuously compounded yields, the short rate for the bond maturing today
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                Yield = np.where((TimeDelta > 0)[:, None], -np.log(ZeroBondPrices)/TimeDelta[:, None], shortRates)
+            Yields[i, :numberOfNodes, isAlive] = Yield[isAlive]
             
-            for j in range(numberOfNodes):
-                for k in range(self.TrinomialTreeparameters['numberOfRates'][i]):
-                    TimeDelta = self.TrinomialTreeparameters['Yield'][i][j][k,0] - t
-                    
-                    if TimeDelta >0:
-                        self.TrinomialTreeparameters['Yield'][i][j][k,1] = -np.log(self.TrinomialTreeparameters['Yield'][i][j][k,1])/TimeDelta
-                    else:
-                        self.TrinomialTreeparameters['Yield'][i][j][k,1] = self.TrinomialTreeparameters['ArrowDebrauPrices'][i][j]
-                    
-                # last reverse the array
-                self.TrinomialTreeparameters['Yield'][i][j][:,0] = self.TrinomialTreeparameters['Yield'][i][j][::-1, 0]
-                self.TrinomialTreeparameters['Yield'][i][j][:,1] = self.TrinomialTreeparameters['Yield'][i][j][::-1, 1]
-                print(self.TrinomialTreeparameters['Yield'][i][j])
-    def BondValue(self, horizontalNode, verticalNode, Rate):
+        instrumentation.count('rateSteps', self.TotalNumberofNodes - 1)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('yields of %d rate dates, rates per step %s\nyields at t = 0 %s',
+                         totalNumberOfRates, numberOfRates, Yields[0, 0])
+        
+        self.TrinomialTreeparameters['numberOfRates'] = numberOfRates
+        self.TrinomialTreeparameters['Yield'] = Yields
+                
+    def setReadOnly(self):
+        # marks all arrays of a built tree as read only, e.g. for trees shared by a cache
+        self.isReadOnly = True
+        for array in [self.NodeTimes, self.RateDates] + list(self.TrinomialTreeparameters.values()):
+            array.setflags(write = False)
+            
+    def getMemorySize(self):
+        # bytes of all arrays of the tree
+        return sum(array.nbytes for array in [self.NodeTimes, self.RateDates] \
+                   + list(self.TrinomialTreeparameters.values()))
+                
+    def getShortRates(self, horizontalNode):
+        # short rates alpha_i + (minj_i + j)*dR_i of all vertical nodes of a step
         i = horizontalNode
-        j = verticalNode
-        k = self.TrinomialTreeparameters['k'][i][j]
-        pu = self.TrinomialTreeparameters['pu'][i][j]
-        pd = self.TrinomialTreeparameters['pd'][i][j]
+        verticalPositions = self.TrinomialTreeparameters['minj'][i] + np.arange(self.TrinomialTreeparameters['numberOfJNodes'][i])
+        
+        return self.TrinomialTreeparameters['Alpha'][i] + verticalPositions*self.TrinomialTreeparameters['dR'][i]
+                
+    def getYieldCurve(self, horizontalNode, verticalNode):
+        # zero curve [date, yield] seen from a node, only rate dates after the node time.
+        # The yields of all nodes are calculated on the first request (not for read only trees)
+        if 'Yield' not in self.TrinomialTreeparameters:
+            self.calculateNumericrates()
+        
+        numberOfRates = self.TrinomialTreeparameters['numberOfRates'][horizontalNode]
+        YieldCurve = np.zeros((numberOfRates, 2))
+        YieldCurve[:,0] = self.RateDates[self.RateDates.shape[0] - numberOfRates:, 0]
+        YieldCurve[:,1] = self.TrinomialTreeparameters['Yield'][horizontalNode, verticalNode,
+                                                                 self.RateDates.shape[0] - numberOfRates:]
+        
+        return YieldCurve
+        
+    def discountedExpectation(self, horizontalNode, values, out = None, scratch = None):
+        # one step of the backward induction for all vertical nodes of step i at once:
+        # values holds the prices of step i+1 on its last axis (any number of leading
+        # axes, e.g. several instruments), the result holds the discounted expectation
+        # at the nodes of step i. out and scratch are optional arrays of the shape of
+        # the result (not overlapping values), which avoids allocations in long loops
+        i = horizontalNode
+        numberOfNodes = self.TrinomialTreeparameters['numberOfJNodes'][i]
+        k = self.TrinomialTreeparameters['k'][i, :numberOfNodes]
+        pu = self.TrinomialTreeparameters['pu'][i, :numberOfNodes]
+        pd = self.TrinomialTreeparameters['pd'][i, :numberOfNodes]
         pm = 1- pd - pu
         
-        alpha = self.TrinomialTreeparameters['Alpha'][i] 
-        dt1 = self.TrinomialTreeparameters['dt'][i]
-        dR = self.TrinomialTreeparameters['dR'][i] 
-        verticalPosition = j + self.TrinomialTreeparameters['minj'][i] 
-        discountFactor = np.exp(-(alpha+ verticalPosition*dR)*dt1)
+        discountFactor = np.exp(-self.getShortRates(i)*self.TrinomialTreeparameters['dt'][i])
         
-        result = discountFactor*(pu*self.TrinomialTreeparameters['Yield'][i+1][k+1][Rate,1] +\
-           pm*self.TrinomialTreeparameters['Yield'][i+1][k][Rate,1] + pu*self.TrinomialTreeparameters['Yield'][i+1][k-1][Rate,1])
+        # gather the three branches and accumulate in place, the branches k-1, k, k+1
+        # are always inside the next step (mode 'clip' skips the index check)
+        result = np.take(values, k+1, axis = -1, out = out, mode = 'clip')
+        result *= discountFactor*pu
+        branch = np.take(values, k, axis = -1, out = scratch, mode = 'clip')
+        branch *= discountFactor*pm
+        result += branch
+        np.take(values, k-1, axis = -1, out = branch, mode = 'clip')
+        branch *= discountFactor*pd
+        result += branch
         
         return result
     
+    def discountFactors(self, horizontalNode, dates):
+        # discount factors from step i to dates after t_i with the short rate of each
+        # node, (dates, vertical nodes)
+        i = horizontalNode
+        t = self.TrinomialTreeparameters['t'][i]
+        
+        return np.exp(-np.outer(np.asarray(dates) - t, self.getShortRates(i)))
+    
     def getStep(self, date):
         if date == 0:
             return 0
@@ -280,85 +395,92 @@ class TrinomialTree:
         return index
     
     def BondOption(self, Cashflow, ExDates):
-        numberOfSteps = self.getStep(ExDates[-1,0])
+        # bermudan call on the bond paying Cashflow ([date, amount]) with strikes ExDates
+        # ([date, price]), ex dates which are no node times are not exercised
+        return self.BondOptionPortfolio([Cashflow], [ExDates])[0]
+    
+    @instrumentation.timed('BondOptionPortfolio')
+    def BondOptionPortfolio(self, Cashflows, ExDates, isPut = None):
+        # bermudan calls (or puts, where isPut is True) on many bonds at once, Cashflows
+        # and ExDates are lists with one [date, amount] and one [date, price] array per
+        # instrument. All instruments are rolled back together in one (bond/option,
+        # instrument, vertical node) array, the tree is not changed
+        numberOfInstruments = len(Cashflows)
+        if len(ExDates) != numberOfInstruments:
+            raise ValueError("one exercise schedule per instrument is needed, got {} cashflows and {} schedules"
+                             .format(numberOfInstruments, len(ExDates)))
         
-        for i in range(numberOfSteps, -1, -1):
-            time = self.TrinomialTreeparameters['t'][i]
+        # flatten the payments and ex dates of all instruments to (instrument, date, amount)
+        Payments = self._stackSchedules(Cashflows)
+        Exercises = self._stackSchedules(ExDates)
+        
+        # every payment is added at the last step before its date, payments after the
+        # last step of the tree are discounted with its short rates
+        lastStep = self.TotalNumberofNodes - 2
+        paymentSteps = np.minimum(np.searchsorted(self.NodeTimes, Payments[:,1]) - 1, lastStep)
+        
+        # exercise only on ex dates which are node times
+        exerciseSteps = np.minimum(np.searchsorted(self.NodeTimes, Exercises[:,1]), lastStep)
+        isOnNode = self.NodeTimes[exerciseSteps] == Exercises[:,1]
+        Exercises, exerciseSteps = Exercises[isOnNode], exerciseSteps[isOnNode]
+        
+        firstStep = max(paymentSteps.max(initial = 0), exerciseSteps.max(initial = 0))
+        payoffSign = np.ones(numberOfInstruments) if isPut is None \
+            else np.where(np.broadcast_to(isPut, (numberOfInstruments,)), -1., 1.)
+        
+        # bonds (row 0) and options (row 1) of all instruments, the steps rotate through
+        # three buffers (values, result, scratch) of the maximal width
+        numberOfJNodes = self.TrinomialTreeparameters['numberOfJNodes']
+        Buffers = np.empty((3, 2*numberOfInstruments*numberOfJNodes[:firstStep+1].max()))
+        getBuffer = lambda index, i: Buffers[index % 3, :2*numberOfInstruments*numberOfJNodes[i]]\
+            .reshape(2, numberOfInstruments, numberOfJNodes[i])
+        
+        instrumentation.count('inductionSteps', int(firstStep) + 1)
+        instrumentation.count('instruments', numberOfInstruments)
+        
+        Prices = getBuffer(0, firstStep)
+        Prices[:] = 0
+        for i in range(firstStep, -1, -1):
+            if i < firstStep:
+                Prices = self.discountedExpectation(i, Prices, out = getBuffer(firstStep - i, i),
+                                                    scratch = getBuffer(firstStep - i + 1, i))
             
-            # check if ex date
-            ExPrice = 0
-            isExDate = False
-            for j in range(ExDates.shape[0]):
-                if time == ExDates[j,0]:
-                    ExPrice = ExDates[j,1]
-                    isExDate = True
-                    break
-            # next trhough all j nodes
-            for j in range(self.TrinomialTreeparameters['numberOfJNodes'][i]):
-                YieldCurve = self.TrinomialTreeparameters['Yield'][i][j]
-                InstrinsicValue = 0
-                BondValue = 0
-                
-                if isExDate:
-                    BondValue = AnalyticBondValue(time, Cashflow, YieldCurve)
-                    
-                    InstrinsicValue = BondValue - ExPrice
-                    
-                    if InstrinsicValue<0:   # beacause call option
-                        InstrinsicValue = 0
-                
-                OptionValue = 0
-                if i <numberOfSteps:
-                    OptionValue = self.dicountedOptionValue(i,j)
-                if InstrinsicValue>OptionValue:
-                    OptionValue = InstrinsicValue
-                    
-                self.TrinomialTreeparameters['OptionPrice'][i][j] = OptionValue
+            isPaid = paymentSteps == i
+            if np.any(isPaid):
+                np.add.at(Prices[0], Payments[isPaid, 0].astype(int),
+                          Payments[isPaid, 2][:, None]*self.discountFactors(i, Payments[isPaid, 1]))
+            
+            # exercise if the intrinsic value exceeds the continuation value, the first
+            # entry of an instrument wins if a date appears twice
+            isExercised = exerciseSteps == i
+            if np.any(isExercised):
+                instruments, first = np.unique(Exercises[isExercised, 0].astype(int), return_index = True)
+                ExPrices = Exercises[isExercised, 2][first]
+                Prices[1, instruments] = np.maximum(Prices[1, instruments], payoffSign[instruments, None]
+                                                    *(Prices[0, instruments] - ExPrices[:, None]))
                 
-        return self.TrinomialTreeparameters['OptionPrice'][0][0]
+        return Prices[1, :, 0]
     
-    def dicountedOptionValue(self, i, j):
-        k = self.TrinomialTreeparameters['k'][i][j]
-        pu = self.TrinomialTreeparameters['pu'][i][j]
-        pd = self.TrinomialTreeparameters['pd'][i][j]
-        pm = 1- pd - pu
-        
-        alpha = self.TrinomialTreeparameters['Alpha'][i] 
-        dt1 = self.TrinomialTreeparameters['dt'][i]
-        dR = self.TrinomialTreeparameters['dR'][i] 
-        verticalPosition = j + self.TrinomialTreeparameters['minj'][i] 
-        discountFactor = np.exp(-(alpha+ verticalPosition*dR)*dt1)
+    def _stackSchedules(self, Schedules):
+        # list of [date, value] arrays -> one [instrument, date, value] array
+        Schedules = [np.asarray(Schedule, dtype = float).reshape(-1, 2) for Schedule in Schedules]
+        instruments = np.repeat(np.arange(len(Schedules)), [Schedule.shape[0] for Schedule in Schedules])
         
-        result = discountFactor*(pu*self.TrinomialTreeparameters['OptionPrice'][i+1][k+1] +\
-        pm*self.TrinomialTreeparameters['OptionPrice'][i+1][k] + pu*self.TrinomialTreeparameters['OptionPrice'][i+1][k-1])
-        
-        return result
+        return np.column_stack((instruments, np.concatenate(Schedules + [np.zeros((0, 2))])))
            
 
 def getZero(Zerocurve, time):
-    if Zerocurve[-1,0]<= time:
-        return Zerocurve[-1,1]
-    elif Zerocurve[0,0]>= time:
-        return Zerocurve[0,1]
-    else:
-        upperBoundIndex = np.argwhere(Zerocurve[:,0]<=time)[0][0]
-        lowerBoundIndex = np.argwhere(Zerocurve[:,0]>=time)[0][0]
-        upperBound = Zerocurve[upperBoundIndex,1]
-        lowerBound = Zerocurve[lowerBoundIndex,1]
-        lowerBoundTime = Zerocurve[lowerBoundIndex,0]
-        
-        return lowerBound+ (time-lowerBoundTime)*(upperBound-lowerBound)
+    # zero rate(s) of a [date, rate] array or a ZeroCurve object, linear on the rates
+    if not isinstance(Zerocurve, ZeroCurve):
+        Zerocurve = ZeroCurve(Zerocurve, memoize = False)
+    
+    return Zerocurve.getZero(time)
 
 
 def AnalyticBondValue(time, cashflow, YieldCurve):  # fixed paments discounted
-    sum = 0
-    for i, cash in enumerate(cashflow[:,1]):
-        period_end = cashflow[i, 0]
-        
-        if period_end>time:
-            sum += cash*np.exp(-getZero(YieldCurve, period_end)*(period_end-time))
-            
-    return sum
+    cashflow = cashflow[cashflow[:,0] > time]
+    
+    return np.sum(cashflow[:,1]*np.exp(-getZero(YieldCurve, cashflow[:,0])*(cashflow[:,0] - time)))
     
 
 
@@ -372,10 +494,25 @@ def treeConstruction(Zerocurve, lastDate, volatility, StepsPerYear = 72, a = 0):
     
     return Tree
 
+def getNodeTimes(Tree, dates):
+    # nearest node time of every date (the earlier one for ties)
+    dates = np.asarray(dates, dtype = float)
+    upper = np.clip(np.searchsorted(Tree.NodeTimes, dates), 1, Tree.NodeTimes.shape[0] - 1)
+    isLower = dates - Tree.NodeTimes[upper - 1] <= Tree.NodeTimes[upper] - dates
+    
+    return Tree.NodeTimes[np.where(isLower, upper - 1, upper)]
+
+def calculatePortfolioPrices(Tree, cashflows, ExDates, isPut = None):
+    # put exdates on nodes, the ex dates of the caller are not changed
+    ExDates = [np.asarray(ExDate, dtype = float).reshape(-1, 2) for ExDate in ExDates]
+    ExDates = [np.column_stack((getNodeTimes(Tree, ExDate[:,0]), ExDate[:,1])) for ExDate in ExDates]
+    
+    return Tree.BondOptionPortfolio(cashflows, ExDates, isPut)
+
 def calculateBondPrice(Tree, cashflow, ExDates):
     # put exdates on nodes
     onlyDates = copy(ExDates[:,0])
-    if ExDates !=[]:
+    if ExDates.size:
         for index, date in enumerate(onlyDates):
             if date not in Tree.NodeTimes:
                 difference = lambda nodes : abs(nodes - date)
@@ -391,22 +528,23 @@ def calculateBondPrice(Tree, cashflow, ExDates):
 
 #%%
 
-step = 1
-l = 10
-vol = 0.01
-z = np.array([[1, 0.01],
-              [2, 0.01],
-              [11, 0.01]])
+if __name__ == '__main__':
+    step = 1
+    l = 10
+    vol = 0.01
+    z = np.array([[1, 0.01],
+                  [2, 0.01],
+                  [11, 0.01]])
 
-tree = treeConstruction(z, l, vol, step)
+    tree = treeConstruction(z, l, vol, step)
 
-cashflow = np.array([[1,1],
-                     [2,1],
-                     [3,1]])
+    cashflow = np.array([[1,1],
+                         [2,1],
+                         [3,1]])
 
-exDates = np.array([[1,0],
-                    [2,0]])
+    exDates = np.array([[1,0],
+                        [2,0]])
 
 
-value = tree.BondOption(cashflow, exDates)
-print(value)
+    value = tree.BondOption(cashflow, exDates)
+    print(value)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Calibration of a piecewise constant volatility term structure of the
+trinomial tree to caplet and swaption quotes.
+
+The market prices are calculated once from the quoted vols with the Black
+or Bachelier formulas of "vectorizedanalyticformulas". The model prices
+are calculated in the tree, where both instruments are european puts on
+bonds:
+    caplet  (T, d, K)     : put with strike 1 at T on a bond paying 1+Kd at T+d
+    payer swaption (T, d, Tn, K) : put with strike 1 at T on a bond paying Kd
+                            at T+d, ..., Tn and 1 at Tn
+
+The volastructure ([date, vol] rows) is fitted with LevenberquOptimizer.
+One tree is kept between the pricings: a new volastructure only rebuilds
+the steps after the first changed vol bucket (TrinomialTree.UpdateVolatility),
+so the bumps of the last buckets in the jacobian are cheap.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from ZeroCurve import ZeroCurve
+from TrinomialTree import TrinomialTree, calculatePortfolioPrices
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+from LevenberquMarquard import LevenberquOptimizer
+
+
+class VolatilityCalibration:
+
+    def __init__(self, Zerocurve, caplets = None, swaptions = None, model = 'black', StepsPerYear = 72,
+                 a = 0, marketPrices = None):
+        '''
+        Parameters
+        ----------
+        Zerocurve : TYPE np.array or ZeroCurve.
+            DESCRIPTION. [date, zero rate] in rows.
+        caplets : TYPE, np.array.
+            DESCRIPTION. The default is None. [optionMaturity, periodLength,
+            strike, vol] in rows.
+        swaptions : TYPE, np.array.
+            DESCRIPTION. The default is None. [optionMaturity, periodLength,
+            optionEnd, strike, vol] in rows (payer swaptions).
+        model : TYPE, str.
+            DESCRIPTION. The default is 'black'. Type of the quoted vols,
+            'black' (lognormal) or 'bachelier' (normal).
+        StepsPerYear : TYPE, int.
+            DESCRIPTION. The default is 72. Steps of the tree, the option
+            maturities should be node times.
+        a : TYPE, float.
+            DESCRIPTION. The default is 0. Mean reversion.
+        marketPrices : TYPE, np.array.
+            DESCRIPTION. The default is None (priced from the quoted vols).
+            Prices of the caplets followed by the swaptions.
+
+        '''
+        if model not in ('black', 'bachelier'):
+            raise ValueError("model must be 'black' or 'bachelier', not {}".format(model))
+
+        self.Zerocurve = Zerocurve if isinstance(Zerocurve, ZeroCurve) else ZeroCurve(Zerocurve)
+        self.caplets = np.zeros((0, 4)) if caplets is None else np.asarray(caplets, dtype = float).reshape(-1, 4)
+        self.swaptions = np.zeros((0, 5)) if swaptions is None else np.asarray(swaptions, dtype = float).reshape(-1, 5)
+        self.model = model
+        self.StepsPerYear = StepsPerYear
+        self.a = a
+
+        self.Cashflows, self.ExDates = self.getBondOptions()
+        self.lastDate = max(Cashflow[-1, 0] for Cashflow in self.Cashflows)
+        self.marketPrices = self.getMarketPrices() if marketPrices is None else np.asarray(marketPrices, dtype = float)
+
+        self.Tree = None
+        self.treeBuilds = 0
+        self.rebuiltSteps = 0
+
+
+    def getMarketPrices(self):
+        '''
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Prices of the caplets and swaptions from the quoted vols.
+
+        '''
+        formulas = vectorizedanalyticformulas()
+        formula = formulas.blackScholesCallGeneralForm if self.model == 'black' else formulas.bachelierCall
+
+        # caplets on the forward rate of [T, T+d]
+        optionMaturity, periodLength, strike, volatility = self.caplets.T
+        discountFactor = self.Zerocurve.getDiscountFactor(optionMaturity + periodLength)
+        forward = (self.Zerocurve.getDiscountFactor(optionMaturity)/discountFactor - 1)/periodLength
+        capletPrices = formula(forward, strike, volatility, optionMaturity, periodLength, discountFactor)
+
+        # swaptions on the swap rate, the annuity is the discount factor of a period length 1
+        annuities = np.array([swaption[1]*self.Zerocurve.getDiscountFactor(self.getPaymentDates(swaption)).sum()
+                              for swaption in self.swaptions])
+        optionMaturity, _, optionEnd, strike, volatility = self.swaptions.T
+        swapRates = (self.Zerocurve.getDiscountFactor(optionMaturity)
+                     - self.Zerocurve.getDiscountFactor(optionEnd))/np.where(annuities > 0, annuities, 1.)
+        swaptionPrices = formula(swapRates, strike, volatility, optionMaturity, 1, annuities)
+
+        return np.concatenate((np.ravel(capletPrices), np.ravel(swaptionPrices)))
+
+
+    def getBondOptions(self):
+        # cashflows and ex dates of the puts on bonds, caplets first
+        Cashflows, ExDates = [], []
+        for optionMaturity, periodLength, strike, _ in self.caplets:
+            Cashflows.append(np.array([[optionMaturity + periodLength, 1 + strike*periodLength]]))
+            ExDates.append(np.array([[optionMaturity, 1.]]))
+
+        for swaption in self.swaptions:
+            optionMaturity, periodLength, _, strike, _ = swaption
+            paymentDates = self.getPaymentDates(swaption)
+            amounts = np.full(paymentDates.shape, strike*periodLength)
+            amounts[-1] += 1
+            Cashflows.append(np.column_stack((paymentDates, amounts)))
+            ExDates.append(np.array([[optionMaturity, 1.]]))
+
+        return Cashflows, ExDates
+
+
+    def getPaymentDates(self, swaption):
+        optionMaturity, periodLength, optionEnd = swaption[:3]
+        numberOfPeriods = max(int(round((optionEnd - optionMaturity)/periodLength)), 1)
+
+        return optionMaturity + periodLength*np.arange(1, numberOfPeriods + 1)
+
+
+    def getModelPrices(self, volastructure):
+        '''
+        Prices in the tree, the tree of the last call is reused and only rebuilt
+        after the first changed vol bucket.
+
+        Parameters
+        ----------
+        volastructure : TYPE np.array.
+            DESCRIPTION. [date, vol] in rows, piecewise constant vols.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Prices of the caplets and swaptions.
+
+        '''
+        if self.Tree is None:
+            self.Tree = TrinomialTree(self.StepsPerYear, self.lastDate, self.Zerocurve)
+            self.Tree.BuildTree(self.a, volastructure)
+            self.treeBuilds += 1
+            self.rebuiltSteps += self.Tree.TotalNumberofNodes
+        else:
+            firstStep = self.Tree.UpdateVolatility(volastructure)
+            self.rebuiltSteps += max(self.Tree.TotalNumberofNodes - firstStep, 0)
+
+        return calculatePortfolioPrices(self.Tree, self.Cashflows, self.ExDates, isPut = True)
+
+
+    def calibrate(self, initialGuess, bounds = (1e-4, np.inf), **optimizerArguments):
+        '''
+        Parameters
+        ----------
+        initialGuess : TYPE np.array.
+            DESCRIPTION. Volastructure, [date, vol] in rows.
+        bounds : TYPE, list.
+            DESCRIPTION. The default is (1e-4, inf). See LevenberquOptimizer, the
+            tree needs positive vols.
+        **optimizerArguments :
+            DESCRIPTION. Further arguments of LevenberquOptimizer.
+
+        Returns
+        -------
+        TYPE tuple.
+            DESCRIPTION. Output of LevenberquOptimizer, the calibrated volastructure first.
+
+        '''
+        return LevenberquOptimizer(self.getModelPrices, self.marketPrices, initialGuess, bounds, **optimizerArguments)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Zero curve built once from a [date, zero rate] array (continuously
+compounded rates, ascending dates). Lookups use a binary search
+(np.searchsorted) and work for floats and arrays of dates.
+
+Interpolation
+    'linear'    : linear on the zero rates
+    'loglinear' : linear on the logarithm of the discount factors
+                  (piecewise flat forward rates)
+Before the first and after the last date the zero rate is extrapolated
+flat, as in the original getZero.
+
+The discount factors at the node times of a tree can be memoised, so that
+several trees on the same time grid only evaluate the curve once.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+
+
+class ZeroCurve:
+
+    def __init__(self, Zerocurve, interpolation = 'linear', memoize = True):
+        '''
+        Parameters
+        ----------
+        Zerocurve : TYPE np.array or ZeroCurve.
+            DESCRIPTION. [date, zero rate] in rows, dates ascending.
+        interpolation : TYPE, str.
+            DESCRIPTION. The default is 'linear'. 'linear' (on the rates) or
+            'loglinear' (on the discount factors).
+        memoize : TYPE, bool.
+            DESCRIPTION. The default is True. Keep the discount factors of
+            getNodeDiscountFactors.
+
+        '''
+        if isinstance(Zerocurve, ZeroCurve):
+            Zerocurve = Zerocurve.curve
+        if interpolation not in ('linear', 'loglinear'):
+            raise ValueError("interpolation must be 'linear' or 'loglinear', not {}".format(interpolation))
+
+        self.curve = np.array(Zerocurve, dtype = float).reshape(-1, 2)
+        if self.curve.shape[0] == 0 or np.any(np.diff(self.curve[:,0]) <= 0):
+            raise ValueError("the dates of the zero curve must be non empty and strictly ascending")
+        self.curve.setflags(write = False)
+
+        self.dates = self.curve[:,0]
+        self.rates = self.curve[:,1]
+        self.interpolation = interpolation
+        self.memoize = memoize
+        self.nodeDiscountFactors = {}
+
+        # interpolated quantity at the dates: the rate or the log discount factor
+        if interpolation == 'linear':
+            self.values = self.rates
+        else:
+            self.values = -self.rates*self.dates
+
+
+    def getZero(self, time):
+        '''
+        Parameters
+        ----------
+        time : TYPE float or np.array.
+            DESCRIPTION. Dates (>=0).
+
+        Returns
+        -------
+        TYPE float or np.array.
+            DESCRIPTION. Interpolated zero rates.
+
+        '''
+        isScalar = np.ndim(time) == 0
+        time = np.asarray(time, dtype = float)
+
+        if self.dates.shape[0] == 1:
+            zero = np.full(time.shape, self.rates[0])
+        else:
+            # bracketing dates dates[upper-1] <= time < dates[upper]
+            upper = np.clip(np.searchsorted(self.dates, time, side = 'right'), 1, self.dates.shape[0] - 1)
+            lower = upper - 1
+            weight = (time - self.dates[lower])/(self.dates[upper] - self.dates[lower])
+            value = self.values[lower] + weight*(self.values[upper] - self.values[lower])
+
+            if self.interpolation == 'linear':
+                zero = value
+            else:
+                isInside = time > self.dates[0]
+                zero = -value/np.where(isInside, time, 1.)
+
+            # flat extrapolation of the zero rate
+            zero = np.where(time <= self.dates[0], self.rates[0], zero)
+            zero = np.where(time >= self.dates[-1], self.rates[-1], zero)
+
+        return float(zero) if isScalar else zero
+
+
+    def getDiscountFactor(self, time):
+        '''
+        Parameters
+        ----------
+        time : TYPE float or np.array.
+            DESCRIPTION. Dates (>=0).
+
+        Returns
+        -------
+        TYPE float or np.array.
+            DESCRIPTION. Discount factors exp(-r(t) t).
+
+        '''
+        return np.exp(-self.getZero(time)*np.asarray(time, dtype = float)) if np.ndim(time) \
+            else float(np.exp(-self.getZero(time)*time))
+
+
+    def getNodeDiscountFactors(self, NodeTimes):
+        '''
+        Discount factors at the node times of a tree, memoised per time grid.
+
+        Parameters
+        ----------
+        NodeTimes : TYPE np.array.
+            DESCRIPTION. Times of the tree steps.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Discount factors (read only).
+
+        '''
+        NodeTimes = np.ascontiguousarray(NodeTimes, dtype = float)
+        key = NodeTimes.tobytes()
+
+        discountFactors = self.nodeDiscountFactors.get(key)
+        if discountFactors is None:
+            discountFactors = self.getDiscountFactor(NodeTimes)
+            discountFactors.setflags(write = False)
+            if self.memoize:
+                self.nodeDiscountFactors[key] = discountFactors
+
+        return discountFactors
+
+
+    def clearMemo(self):
+        self.nodeDiscountFactors.clear()
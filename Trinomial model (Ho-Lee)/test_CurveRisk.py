@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+from CurveRisk import keyRateLadder
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+cashflows = [np.array([[1, 0.04], [2, 0.04], [3, 0.04], [4, 1.04]]),
+             np.array([[2.5, 1.0]]),
+             np.array([[1, 0.05], [2, 0.05], [3, 0.05], [4, 0.05], [5, 1.05]])]
+ExDates = [np.array([[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]),
+           np.array([[0.0, 0.0]]),
+           np.array([[2.0, 1.0]])]
+
+
+def test_keyRateLadderMatchesRebuiltTrees():
+    with ThreadPoolExecutor(2) as executor:
+        basePrices, ladder = keyRateLadder(Zerocurve, 5, 0.01, cashflows, ExDates, StepsPerYear=12, a=0.1,
+                                           executor=executor)
+
+    assert ladder.shape == (5, 3)
+    assert np.allclose(basePrices, calculatePortfolioPrices(treeConstruction(Zerocurve, 5, 0.01, 12, 0.1),
+                                                            cashflows, ExDates), atol=1e-15)
+    for index in range(5):
+        bumpedCurve = Zerocurve.copy()
+        bumpedCurve[index, 1] += 1e-4
+        bumpedPrices = calculatePortfolioPrices(treeConstruction(bumpedCurve, 5, 0.01, 12, 0.1), cashflows, ExDates)
+        assert np.allclose(ladder[index], bumpedPrices - basePrices, atol=1e-14)
+
+    # the zero bond maturing at 2.5 only depends on the rates at 2 and 3
+    assert np.all(ladder[[1, 2], 1] < 0) and np.allclose(ladder[[0, 3, 4], 1], 0, atol=1e-14)
+
+
+def test_keyRatesAddUpToParallelShift():
+    bumps = np.vstack((np.eye(5)*1e-4, np.full(5, 1e-4)))
+    basePrices, ladder = keyRateLadder(Zerocurve, 5, 0.01, cashflows, ExDates, bumps=bumps, StepsPerYear=12,
+                                       maxWorkers=2)
+
+    assert np.allclose(ladder[:5].sum(axis=0), ladder[5], rtol=1e-3)
+
+    with pytest.raises(ValueError):
+        keyRateLadder(Zerocurve, 5, 0.01, cashflows, ExDates, bumps=np.ones((2, 3)))
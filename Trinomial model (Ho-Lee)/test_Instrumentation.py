@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import logging
+import numpy as np
+from Instrumentation import instrumentation
+from TrinomialTree import treeConstruction
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+
+def test_timersAndCounters(caplog):
+    instrumentation.reset()
+    treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=12)
+    assert instrumentation.getStatistics() == {'timers' : {}, 'counters' : {}}
+
+    instrumentation.enable()
+    try:
+        with caplog.at_level(logging.DEBUG, logger='TrinomialTree'):
+            tree = treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=12)
+            tree.BondOption(np.array([[2., 1.]]), np.array([[1., 0.95]]))
+            tree.getYieldCurve(12, 1)
+        statistics = instrumentation.getStatistics()
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+    stages = ['SetUpDates', 'TreeStructure', 'TreeAdjustments', 'BondOptionPortfolio', 'calculateNumericrates']
+    assert sorted(statistics['timers']) == sorted(stages)
+    assert all(timer['calls'] == 1 and timer['seconds'] >= 0 for timer in statistics['timers'].values())
+
+    numberOfJNodes = tree.TrinomialTreeparameters['numberOfJNodes']
+    assert statistics['counters'] == {'structureSteps' : 62, 'structureNodes' : numberOfJNodes.sum(),
+                                      'adjustmentSteps' : 61, 'inductionSteps' : 24, 'instruments' : 1,
+                                      'rateSteps' : 61}
+
+    # the stages and the tree are dumped at level DEBUG
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('TreeStructure took') for message in messages)
+    assert any(message.startswith('tree with 62 steps') for message in messages)
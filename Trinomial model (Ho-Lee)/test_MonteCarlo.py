@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+from MonteCarlo import MonteCarlo
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+tree = treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0.1)
+
+
+def zeroBond(shortRates, discountFactors):
+    return discountFactors[:, 36]
+
+
+def test_bondPricesMatchTheCurve():
+    hoLeeTree = treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0)
+    for meanReversion, Tree, tolerance in [(0, hoLeeTree, 1e-12), (0.1, tree, 1e-5)]:
+        simulation = MonteCarlo(Tree, 1000, seed=1)
+        for step in [12, 30, 60]:
+            curvePrice = Tree.Zerocurve.getDiscountFactor(Tree.NodeTimes[step])
+            assert abs(simulation.getBondPrices(0, step)/curvePrice - 1) < tolerance
+
+        # P(0, t_n) = E[D(t_m) P(t_m, t_n)] on the simulated paths
+        price, standardError = simulation.price(lambda shortRates, discountFactors: discountFactors[:, 24]
+                                                * simulation.getBondPrices(24, 36, shortRates[:, 24]))
+        assert abs(price - simulation.getBondPrices(0, 36)) < 4*standardError
+
+
+def test_chunksAreReproducible():
+    simulation = MonteCarlo(tree, 5000, chunkSize=1024, antithetic=True, seed=7)
+    chunks = list(simulation.generatePaths())
+    assert [chunk[0].shape for chunk in chunks] == [(1024, 61)]*4 + [(904, 61)]
+    assert np.all(chunks[0][1][:, 0] == 1) and chunks[0][1].shape == (1024, 62)
+
+    # antithetic paths are mirrored around alpha
+    shortRates = chunks[0][0]
+    assert np.allclose(shortRates[:512] + shortRates[512:], 2*simulation.alpha, atol=1e-15)
+
+    with ThreadPoolExecutor(2) as executor:
+        assert simulation.price(zeroBond, executor=executor) == simulation.price(zeroBond)
+    assert MonteCarlo(tree, 5000, chunkSize=1024, seed=7).price(zeroBond) != simulation.price(zeroBond)
+
+
+def test_capletMatchesTreeWithVarianceReduction():
+    # caplet on [2, 2.5] with strike 4.5%: put on the bond paying 1.0225 at 2.5
+    treePrice = calculatePortfolioPrices(tree, [np.array([[2.5, 1.0225]])], [np.array([[2., 1.]])], isPut=True)[0]
+    simulation = MonteCarlo(tree, 20000, seed=1)
+    def caplet(shortRates, discountFactors):
+        bondPrices = simulation.getBondPrices(24, 30, shortRates[:, 24])
+        return discountFactors[:, 24]*np.maximum(1 - 1.0225*bondPrices, 0)
+
+    price, standardError = simulation.price(caplet)
+    reducedPrice, reducedError = MonteCarlo(tree, 20000, antithetic=True, seed=1).price(caplet, controlDate=2.5)
+
+    assert abs(price - treePrice) < 4*standardError
+    assert abs(reducedPrice - treePrice) < 4*reducedError
+    assert reducedError < 0.6*standardError
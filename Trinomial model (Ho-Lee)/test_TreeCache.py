@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from TreeCache import TreeCache
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [4., 0.05],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+
+def test_hitsReturnTheBuiltTree():
+    cache = TreeCache()
+    tree = cache.treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear = 12, a = 0.1)
+
+    # same contents in a new array is a hit, any other parameter is a miss
+    assert cache.treeConstruction(Zerocurve.copy(), 5, 0.01, 12, 0.1) is tree
+    assert cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.05) is not tree
+    bumpedCurve = Zerocurve.copy()
+    bumpedCurve[2, 1] += 1e-4
+    assert cache.treeConstruction(bumpedCurve, 5, 0.01, 12, 0.1) is not tree
+
+    assert cache.getStatistics() == {'hits' : 1, 'misses' : 3, 'evictions' : 0, 'trees' : 3,
+                                     'memorySize' : 3*tree.getMemorySize()}
+
+    # cached trees are immutable
+    with pytest.raises(ValueError):
+        tree.TrinomialTreeparameters['Alpha'][0] = 0
+
+    # shared trees do not calculate yields lazily
+    with pytest.raises(ValueError):
+        tree.getYieldCurve(0, 0)
+
+
+def test_yieldsAreChargedToTheBudget():
+    cache = TreeCache()
+    tree = cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1)
+
+    # the yields are calculated on a copy, which replaces the cached tree
+    treeWithYields = cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1, withYields = True)
+    assert treeWithYields is not tree and 'Yield' not in tree.TrinomialTreeparameters
+    assert treeWithYields.TrinomialTreeparameters['Alpha'] is tree.TrinomialTreeparameters['Alpha']
+    assert treeWithYields.getYieldCurve(0, 0).shape == (5, 2)
+    assert not treeWithYields.TrinomialTreeparameters['Yield'].flags.writeable
+
+    assert cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1) is treeWithYields
+    statistics = cache.getStatistics()
+    assert (statistics['hits'], statistics['misses'], statistics['trees']) == (1, 2, 1)
+    assert statistics['memorySize'] == treeWithYields.getMemorySize() > tree.getMemorySize()
+
+    # trees whose yields exceed the budget are not cached
+    cache = TreeCache(memoryBudget = tree.getMemorySize())
+    cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1, withYields = True)
+    assert cache.getStatistics()['trees'] == 0
+
+
+def test_leastRecentlyUsedEviction():
+    treeSize = TreeCache().treeConstruction(Zerocurve, 5, 0.01, 12, 0.1).getMemorySize()
+    cache = TreeCache(memoryBudget = 2*treeSize)
+
+    first = cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1)
+    cache.treeConstruction(Zerocurve, 5, 0.02, 12, 0.1)
+    cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1)
+    cache.treeConstruction(Zerocurve, 5, 0.03, 12, 0.1)
+
+    # the tree with volatility 0.02 was used least recently
+    statistics = cache.getStatistics()
+    assert (statistics['hits'], statistics['misses'], statistics['evictions'], statistics['trees']) == (1, 3, 1, 2)
+    assert statistics['memorySize'] <= 2*treeSize
+    assert cache.treeConstruction(Zerocurve, 5, 0.01, 12, 0.1) is first
+    assert cache.getStatistics()['hits'] == 2
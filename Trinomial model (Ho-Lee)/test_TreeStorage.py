@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+from TreeStorage import saveTree, loadTree
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+cashflows = [np.array([[1, 0.04], [2, 0.04], [3, 0.04], [4, 1.04]]),
+             np.array([[2.5, 1.0]])]
+ExDates = [np.array([[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]),
+           np.array([[0.0, 0.0]])]
+
+
+@pytest.mark.parametrize('volatility', [0.01, np.array([[2., 0.01], [5., 0.012]])])
+def test_savedTreeIsAttachedReadOnly(tmp_path, volatility):
+    tree = treeConstruction(Zerocurve, lastDate = 5, volatility = volatility, StepsPerYear=12, a = 0.1)
+    tree.getYieldCurve(0, 0)
+    path = str(tmp_path/'tree.bin')
+    saveTree(tree, path)
+
+    attachedTree = loadTree(path)
+    parameters = attachedTree.TrinomialTreeparameters
+    assert sorted(parameters) == sorted(tree.TrinomialTreeparameters)
+    assert isinstance(parameters['ArrowDebrauPrices'], np.memmap) and not parameters['pu'].flags.writeable
+    for key in ['t', 'Alpha', 'dR', 'numberOfJNodes', 'minj']:
+        assert np.array_equal(parameters[key], tree.TrinomialTreeparameters[key])
+    assert np.array_equal(np.asarray(attachedTree.volatility), np.asarray(volatility))
+
+    assert np.array_equal(calculatePortfolioPrices(attachedTree, cashflows, ExDates),
+                          calculatePortfolioPrices(tree, cashflows, ExDates))
+    assert np.array_equal(attachedTree.getYieldCurve(12, 3), tree.getYieldCurve(12, 3))
+    with pytest.raises(ValueError):
+        attachedTree.UpdateZeroCurve(Zerocurve)
+
+    # a copy on write tree can be bumped, the file is not changed
+    bumpedCurve = Zerocurve.copy()
+    bumpedCurve[2, 1] += 0.0001
+    privateTree = loadTree(path, mmapMode = 'c')
+    privateTree.UpdateZeroCurve(bumpedCurve)
+    expectedTree = treeConstruction(bumpedCurve, lastDate = 5, volatility = volatility, StepsPerYear=12, a = 0.1)
+    assert np.allclose(privateTree.TrinomialTreeparameters['Alpha'], expectedTree.TrinomialTreeparameters['Alpha'],
+                       atol=1e-15)
+    assert np.array_equal(loadTree(path).TrinomialTreeparameters['Alpha'], tree.TrinomialTreeparameters['Alpha'])
+
+
+def test_yieldsAreSaved(tmp_path):
+    tree = treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0.1)
+    path, pathWithoutYields = str(tmp_path/'tree.bin'), str(tmp_path/'treeWithoutYields.bin')
+    saveTree(tree, path)
+    saveTree(tree, pathWithoutYields, withYields = False)
+    assert 'Yield' not in tree.TrinomialTreeparameters
+
+    # read only trees have the yields of the file, copy on write trees calculate them
+    expectedYieldCurve = treeConstruction(Zerocurve, 5, 0.01, 12, 0.1).getYieldCurve(12, 3)
+    assert np.array_equal(loadTree(path).getYieldCurve(12, 3), expectedYieldCurve)
+    with pytest.raises(ValueError):
+        loadTree(pathWithoutYields).getYieldCurve(12, 3)
+    assert np.array_equal(loadTree(pathWithoutYields, mmapMode = 'c').getYieldCurve(12, 3), expectedYieldCurve)
+
+
+def test_invalidFile(tmp_path):
+    path = tmp_path/'noTree.bin'
+    path.write_bytes(b'0123456789abcdefghij')
+    with pytest.raises(ValueError):
+        loadTree(str(path))
@@ -6,7 +6,7 @@ Created on Mon Oct 25 10:55:19 2021
 """
 
 import numpy as np
-from TrinomialTree import treeConstruction, calculateBondPrice
+from TrinomialTree import treeConstruction, calculateBondPrice, calculatePortfolioPrices, getZero
 from tabulate import tabulate
 
 
@@ -52,3 +52,118 @@ print(tabulate(data, headers = colNames))
 
 
 
+
+
+def test_ArrowDebrauPricesReproduceCurve():
+    for a in [0, 0.1]:
+        meanRevertingTree = treeConstruction(ZeroCurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = a)
+        parameters = meanRevertingTree.TrinomialTreeparameters
+        
+        # the arrow debrau prices of a step sum up to the zero bond of the curve
+        for i in range(1, meanRevertingTree.TotalNumberofNodes - 1):
+            t = parameters['t'][i]
+            ArrowDebrauSum = parameters['ArrowDebrauPrices'][i, :parameters['numberOfJNodes'][i]].sum()
+            assert abs(ArrowDebrauSum - np.exp(-t*getZero(ZeroCurve, t))) < 1e-12
+            
+        # probabilities are valid and match mean and variance of the next step
+        for i in range(meanRevertingTree.TotalNumberofNodes - 2):
+            numberOfNodes = parameters['numberOfJNodes'][i]
+            pu = parameters['pu'][i, :numberOfNodes]
+            pd = parameters['pd'][i, :numberOfNodes]
+            assert np.all(pu > 0) and np.all(pd > 0) and np.all(pu + pd < 1)
+            
+            nextPosition = parameters['k'][i, :numberOfNodes] + parameters['minj'][i+1]
+            meanPosition = nextPosition + pu - pd
+            position = parameters['minj'][i] + np.arange(numberOfNodes)
+            expectedMean = position*parameters['dR'][i]*(1 - a*parameters['dt'][i])/parameters['dR'][i+1]
+            assert np.allclose(meanPosition, expectedMean, atol=1e-12)
+            assert np.allclose(pu + pd - (pu - pd)**2, 1/3, atol=1e-12)
+            
+            
+def test_ZeroBondsReproduceCurve():
+    for a in [0, 0.1]:
+        meanRevertingTree = treeConstruction(ZeroCurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = a)
+        
+        for maturity in range(1, 6):
+            numericPrice = calculateBondPrice(meanRevertingTree, np.array([[maturity, 1.0]]), np.array([[0.0, 0.0]]))
+            assert abs(numericPrice - np.exp(-maturity*getZero(ZeroCurve, maturity))) < 1e-12
+            
+            
+def test_BondOptionMatchesNodeByNodeInduction():
+    meanRevertingTree = treeConstruction(ZeroCurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0.1)
+    parameters = meanRevertingTree.TrinomialTreeparameters
+    cashflow = np.array([[1, 0.04], [2, 0.04], [3, 0.04], [4, 1.04]])
+    ExDates = np.array([[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]])
+    
+    # node by node induction of the bond and the option
+    BondPrices = [None]*meanRevertingTree.TotalNumberofNodes
+    OptionPrices = [None]*meanRevertingTree.TotalNumberofNodes
+    lastStep = meanRevertingTree.getStep(4)
+    for i in range(lastStep, -1, -1):
+        t = parameters['t'][i]
+        numberOfNodes = parameters['numberOfJNodes'][i]
+        BondPrices[i] = np.zeros(numberOfNodes)
+        OptionPrices[i] = np.zeros(numberOfNodes)
+        for j in range(numberOfNodes):
+            shortRate = parameters['Alpha'][i] + (parameters['minj'][i] + j)*parameters['dR'][i]
+            if i < lastStep:
+                k = parameters['k'][i, j]
+                pu, pd = parameters['pu'][i, j], parameters['pd'][i, j]
+                discountFactor = np.exp(-shortRate*parameters['dt'][i])
+                for values, nextValues in [(BondPrices[i], BondPrices[i+1]), (OptionPrices[i], OptionPrices[i+1])]:
+                    values[j] = discountFactor*(pu*nextValues[k+1] + (1 - pu - pd)*nextValues[k] + pd*nextValues[k-1])
+            for date, amount in cashflow:
+                if t < date <= parameters['t'][i+1]:
+                    BondPrices[i][j] += amount*np.exp(-shortRate*(date - t))
+            for date, price in ExDates:
+                if t == date:
+                    OptionPrices[i][j] = max(OptionPrices[i][j], BondPrices[i][j] - price)
+                    
+    assert abs(calculateBondPrice(meanRevertingTree, cashflow, ExDates) - OptionPrices[0][0]) < 1e-14
+    
+    # a bermudan option is worth at least the european options on its ex dates
+    for ExDate in ExDates:
+        assert OptionPrices[0][0] >= calculateBondPrice(meanRevertingTree, cashflow, ExDate[None, :]) - 1e-14
+
+    
+def test_PortfolioMatchesSingleInstruments():
+    meanRevertingTree = treeConstruction(ZeroCurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0.1)
+    cashflows = [np.array([[1, 0.04], [2, 0.04], [3, 0.04], [4, 1.04]]),
+                 np.array([[2.5, 1.0]]),
+                 np.array([[0.5, 0.03], [1.5, 0.03], [2.5, 1.03]]),
+                 np.array([[1, 0.05], [2, 1.05]])]
+    ExDates = [np.array([[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]),
+               np.array([[0.0, 0.0]]),
+               np.array([[0.52, 0.98], [1.49, 0.99]]),
+               np.zeros((0, 2))]
+    
+    portfolioPrices = calculatePortfolioPrices(meanRevertingTree, cashflows, ExDates)
+    
+    # the ex dates of the caller are not moved to the nodes
+    assert ExDates[2][0, 0] == 0.52
+    assert portfolioPrices[3] == 0
+    for index in range(3):
+        singlePrice = calculateBondPrice(meanRevertingTree, cashflows[index], ExDates[index].copy())
+        assert abs(portfolioPrices[index] - singlePrice) < 1e-14
+
+
+def test_UpdateTreeMatchesNewTree():
+    meanRevertingTree = treeConstruction(ZeroCurve, lastDate = 5, volatility = 0.01, StepsPerYear=12, a = 0.1)
+    bumpedCurve = ZeroCurve.copy()
+    bumpedCurve[3, 1] += 0.0001
+    volastructure = np.array([[2., 0.01], [5., 0.012]])
+    
+    # the curve bump changes the zero bonds after 3, the vol bump the steps after 2
+    assert meanRevertingTree.UpdateZeroCurve(bumpedCurve) == 36
+    assert meanRevertingTree.UpdateTree(bumpedCurve, volastructure) == 24
+    assert meanRevertingTree.UpdateZeroCurve(bumpedCurve) == meanRevertingTree.TotalNumberofNodes
+    
+    expectedTree = treeConstruction(bumpedCurve, lastDate = 5, volatility = volastructure, StepsPerYear=12, a = 0.1)
+    parameters = meanRevertingTree.TrinomialTreeparameters
+    expectedParameters = expectedTree.TrinomialTreeparameters
+    assert np.allclose(parameters['Alpha'], expectedParameters['Alpha'], atol=1e-15)
+    for i, numberOfNodes in enumerate(expectedParameters['numberOfJNodes']):
+        for key in ['k', 'pu', 'pd', 'ArrowDebrauPrices']:
+            assert np.allclose(parameters[key][i, :numberOfNodes], expectedParameters[key][i, :numberOfNodes], atol=1e-15)
+    assert np.allclose(meanRevertingTree.getYieldCurve(10, 1), expectedTree.getYieldCurve(10, 1), atol=1e-15)
+
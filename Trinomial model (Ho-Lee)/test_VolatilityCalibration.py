@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+from VolatilityCalibration import VolatilityCalibration
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+volastructure = np.array([[1., 0.010],
+                          [2., 0.012],
+                          [3., 0.009],
+                          [5., 0.011]])
+
+caplets = np.array([[T, 0.5, 0.045, 0.2] for T in [0.5, 1., 1.5, 2., 3., 4.]])
+swaptions = np.array([[1., 1., 3., 0.05, 0.2],
+                      [2., 1., 5., 0.06, 0.2]])
+
+
+def getValidEntries(Tree, key):
+    numberOfJNodes = Tree.TrinomialTreeparameters['numberOfJNodes']
+    return np.concatenate([Tree.TrinomialTreeparameters[key][i, :n] for i, n in enumerate(numberOfJNodes)])
+
+
+@pytest.mark.parametrize('bucket', [0, 1, 3])
+def test_updateVolatilityMatchesNewTree(bucket):
+    Tree = treeConstruction(Zerocurve, 6, volastructure, StepsPerYear=12, a=0.05)
+    bumpedVolastructure = volastructure.copy()
+    bumpedVolastructure[bucket, 1] += 0.003
+    expectedTree = treeConstruction(Zerocurve, 6, bumpedVolastructure, StepsPerYear=12, a=0.05)
+
+    # only the steps after the first changed bucket are rebuilt
+    firstStep = Tree.UpdateVolatility(bumpedVolastructure)
+    assert firstStep == [0, 12, 36][[0, 1, 3].index(bucket)]
+    assert Tree.UpdateVolatility(bumpedVolastructure) == Tree.TotalNumberofNodes
+
+    for key in ['numberOfJNodes', 'minj', 'Alpha', 'dR']:
+        assert np.allclose(Tree.TrinomialTreeparameters[key], expectedTree.TrinomialTreeparameters[key], atol=1e-15)
+    for key in ['k', 'pu', 'pd', 'ArrowDebrauPrices']:
+        assert np.allclose(getValidEntries(Tree, key), getValidEntries(expectedTree, key), atol=1e-15)
+
+
+def test_putsOnBondsSatisfyParity():
+    Tree = treeConstruction(Zerocurve, 6, volastructure, StepsPerYear=12, a=0.05)
+    calibration = VolatilityCalibration(Zerocurve, caplets, swaptions, StepsPerYear=12)
+
+    puts = calculatePortfolioPrices(Tree, calibration.Cashflows, calibration.ExDates, isPut=True)
+    calls = calculatePortfolioPrices(Tree, calibration.Cashflows, calibration.ExDates)
+    bonds = calculatePortfolioPrices(Tree, calibration.Cashflows, [np.array([[0., 0.]])]*len(calibration.Cashflows))
+    strikes = calculatePortfolioPrices(Tree, calibration.ExDates,
+                                       [np.array([[0., 0.]])]*len(calibration.ExDates))
+
+    assert np.all(puts > 0)
+    assert np.allclose(calls - puts, bonds - strikes, atol=1e-12)
+
+
+def test_calibrationRecoversTreeVolatilities():
+    calibration = VolatilityCalibration(Zerocurve, caplets, swaptions, StepsPerYear=12, a=0.05)
+    assert calibration.marketPrices.shape == (8,)
+
+    # prices of a known volastructure are matched again
+    calibration.marketPrices = calibration.getModelPrices(volastructure)
+    initialGuess = volastructure.copy()
+    initialGuess[:, 1] = 0.015
+    solution, MSE, iteration, diagnostics = calibration.calibrate(initialGuess, tol=1e-24, returnDiagnostics=True)
+
+    assert MSE < 1e-20
+    assert np.allclose(solution[:, 1], volastructure[:, 1], atol=1e-6)
+    assert calibration.treeBuilds == 1
+    assert calibration.rebuiltSteps < (diagnostics['functionEvaluations'] + 1)*calibration.Tree.TotalNumberofNodes
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from ZeroCurve import ZeroCurve
+
+
+Zerocurve = np.array([[1., 0.03],
+                      [2., 0.04],
+                      [3., 0.04],
+                      [5., 0.06],
+                      [6., 0.07]])
+
+times = np.linspace(0, 8, 161)
+
+
+def test_linearInterpolation():
+    curve = ZeroCurve(Zerocurve)
+
+    assert np.allclose(curve.getZero(times), np.interp(times, Zerocurve[:,0], Zerocurve[:,1]), atol=1e-15)
+    assert curve.getZero(4.) == pytest.approx(0.05, abs=1e-15)
+    assert isinstance(curve.getZero(4.), float)
+    assert np.allclose(curve.getDiscountFactor(times), np.exp(-times*curve.getZero(times)), atol=1e-15)
+
+
+def test_loglinearInterpolation():
+    curve = ZeroCurve(Zerocurve, interpolation='loglinear')
+
+    # rates at the dates and flat extrapolation
+    assert np.allclose(curve.getZero(Zerocurve[:,0]), Zerocurve[:,1], atol=1e-15)
+    assert curve.getZero(0.) == curve.getZero(0.5) == 0.03
+    assert curve.getZero(7.) == 0.07
+
+    # the forward rates between the dates are flat
+    logDiscountFactors = np.log(curve.getDiscountFactor(np.linspace(3, 5, 9)))
+    assert np.allclose(np.diff(logDiscountFactors, 2), 0, atol=1e-15)
+    assert np.all([curve.getZero(t) == curve.getZero(np.array([t]))[0] for t in times])
+
+
+def test_nodeDiscountFactorsAreMemoised():
+    curve = ZeroCurve(Zerocurve)
+    NodeTimes = np.arange(0, 73)/12
+
+    discountFactors = curve.getNodeDiscountFactors(NodeTimes)
+    assert curve.getNodeDiscountFactors(NodeTimes.copy()) is discountFactors
+    assert not discountFactors.flags.writeable
+    assert np.allclose(discountFactors, curve.getDiscountFactor(NodeTimes), atol=1e-15)
+
+    curve.clearMemo()
+    assert curve.getNodeDiscountFactors(NodeTimes) is not discountFactors
+
+
+def test_invalidCurve():
+    with pytest.raises(ValueError):
+        ZeroCurve(Zerocurve[::-1])
+    with pytest.raises(ValueError):
+        ZeroCurve(Zerocurve, interpolation='cubic')
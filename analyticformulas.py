@@ -9,7 +9,7 @@ for the caplet.
 
 import numpy as np
 import math
-import scipy.stats as st
+from normaldistribution import normalCdf, normalPdf, normalCdfArray
 
 
 class analyticformulas:
@@ -45,15 +45,16 @@ class analyticformulas:
 
         '''
         if forward == optionStrike :
-            return volatility * math.sqrt(optionMaturity / math.pi / 2.0)
+            return nominal * periodLength * discountFactor * volatility * math.sqrt(optionMaturity / math.pi / 2.0)
         else:
             if optionMaturity > 0:
                 dPlus = (forward - optionStrike) / (volatility * math.sqrt(optionMaturity));
             else:
-                dPlus = np.Inf
+                # at maturity only the intrinsic value is left
+                dPlus = np.inf if forward > optionStrike else -np.inf
                 
-            valueAnalytic = periodLength * discountFactor* ((forward - optionStrike) * st.norm.cdf(dPlus, 0.0, 1.0)\
-			+ volatility * math.sqrt(optionMaturity) * st.norm.pdf(dPlus, 0.0, 1.0))
+            valueAnalytic = periodLength * discountFactor* ((forward - optionStrike) * normalCdf(dPlus)\
+			+ volatility * math.sqrt(optionMaturity) * normalPdf(dPlus))
 
             return nominal * valueAnalytic
     
@@ -93,16 +94,33 @@ class analyticformulas:
             dPlus = (math.log(forward/optionStrike) + 0.5*volatility *volatility *\
                  optionMaturity)/(volatility * math.sqrt(optionMaturity))
         else:
-            dPlus = np.Inf
+            # at maturity only the intrinsic value is left
+            dPlus = np.inf if forward > optionStrike else -np.inf
             
-        dMinus = dPlus - volatility * optionMaturity
+        dMinus = dPlus - volatility * math.sqrt(optionMaturity)
         
-        analyticValue = discountFactor * periodLength * (forward * st.norm.cdf(dPlus, 0.0, 1.0) - \
-                                optionStrike * st.norm.cdf(dMinus, 0.0, 1.0))
+        analyticValue = discountFactor * periodLength * (forward * normalCdf(dPlus) - \
+                                optionStrike * normalCdf(dMinus))
             
         return nominal * analyticValue
     
     
+    def blackScholesCall(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Short name for blackScholesCallGeneralForm, used by the digital caplet 
+        and the swaption.
+
+        Returns
+        -------
+        TYPE double.
+            DESCRIPTION. Disounted option price.
+
+        '''
+        return self.blackScholesCallGeneralForm(forward, optionStrike, volatility,
+                    optionMaturity, periodLength, discountFactor, nominal)
+    
+    
     def blackScholesCallExpDiscountfactor(self, forward, optionStrike, volatility = 0.05,
         optionMaturity = 0, periodLength = 1, interestRate = 0, nominal = 1):
         '''
@@ -138,13 +156,13 @@ class analyticformulas:
             dPlus = (math.log(forward/optionStrike) + (interestRate + 0.5*volatility *volatility) *\
                 periodLength)/(volatility * math.sqrt(periodLength))                     
         else:
-            dPlus = np.Inf
+            dPlus = np.inf
             
         dMinus = (math.log(forward/optionStrike) + (interestRate - 0.5*volatility *volatility) *\
                 periodLength)/(volatility * math.sqrt(periodLength))
         
-        analyticValue =  (forward * st.norm.cdf(dPlus, 0.0, 1.0) - \
-                    optionStrike* np.exp(-interestRate * periodLength) * st.norm.cdf(dMinus, 0.0, 1.0))
+        analyticValue =  (forward * normalCdf(dPlus) - \
+                    optionStrike* np.exp(-interestRate * periodLength) * normalCdf(dMinus))
             
         return nominal * analyticValue
     
@@ -158,8 +176,10 @@ class analyticformulas:
         dMinus = (np.log(forward / strike) - 0.5 * volatility ** 2 * maturity) / \
             (volatility * np.sqrt(maturity))
        
-        analyticValue = periodLength*discountFactor*(strike  * st.norm.cdf(-dMinus, 0.0, 1.0) -\
-                    forward * st.norm.cdf(-dPlus, 0.0, 1.0))
+        # the formula is written with numpy, arrays go through the array kernel
+        cdf = normalCdfArray if np.ndim(dPlus) else normalCdf
+        analyticValue = periodLength*discountFactor*(strike  * cdf(-dMinus) -\
+                    forward * cdf(-dPlus))
           
         return analyticValue *nominal
         
@@ -199,10 +219,15 @@ class analyticformulas:
             DESCRIPTION. Disounted option price.
 
         '''
-        analyticValue = self.blackScholesCall(0, -1, volatility,
-                            optionMaturity,periodLength,discountFactor, nominal=nominal)
+        if optionMaturity > 0:
+            dMinus = (math.log(forward/optionStrike) - 0.5*volatility *volatility *\
+                 optionMaturity)/(volatility * math.sqrt(optionMaturity))
+        else:
+            dMinus = np.inf if forward > optionStrike else -np.inf
         
-        return analyticValue
+        analyticValue = discountFactor * periodLength * normalCdf(dMinus)
+        
+        return nominal * analyticValue
     
     
     def BlackScholesSwaption(self, forward, optionStrike, volatility = 0.05,
@@ -248,17 +273,12 @@ class analyticformulas:
             print("Number of Periods is no integer")
             return np.inf
             
-        discountArray = np.array(discountFactor)
+        # derive swap annuity, one discount factor for all periods or one per period
+        discountArray = np.asarray(discountFactor, dtype = float)
         if discountArray.size != numberOfPeriods:
-            x = np.arange(numberOfPeriods, dtype=int)
-            x = np.full_like(x, discountFactor, dtype=np.double)
-            discountFactor = x
-            
-       
-        # derive swap annuity
-        swapAnnuity = 0
-        for i in range(int(numberOfPeriods)):
-            swapAnnuity += periodLength * discountFactor[i]
+            swapAnnuity = periodLength * int(numberOfPeriods) * float(discountArray)
+        else:
+            swapAnnuity = periodLength * float(discountArray.sum())
         
         analyticValue = self.blackScholesCall(forward, optionStrike, volatility,
                     optionMaturity, discountFactor=swapAnnuity, nominal = nominal)
@@ -290,12 +310,12 @@ class analyticformulas:
 
         Returns
         -------
-        delta hedge.
+        delta hedge N(dPlus).
 
         '''
         dPlus = (math.log(forward/optionStrike) + (interestRate + 0.5*volatility *volatility) *\
                 periodLength)/(volatility * math.sqrt(periodLength)) 
             
-        return dPlus
+        return normalCdf(dPlus)
         
 
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Closed form sensitivities for the formulas in "vectorizedanalyticformulas".
+Each method returns the price together with all first and second order
+Greeks in one dictionary, d1/d2 and the normal distribution values are
+calculated once and shared. All arguments can be numpy arrays.
+
+The Greeks are taken with respect to
+    delta : forward
+    gamma : forward (second order)
+    vega  : volatility
+    vanna : forward and volatility
+    volga : volatility (second order)
+    theta : minus the derivative with respect to the option maturity
+            (time decay, discount factors kept fixed)
+    rho   : parallel shift of the continuously compounded zero rates behind
+            the discount factors (forward kept fixed)
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from normaldistribution import normalCdfArray, normalPdfArray
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+
+
+class analyticgreeks(vectorizedanalyticformulas):
+
+    def bachelierCallGreeks(self, forward, optionStrike, volatility = 0.05,
+            optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Price and Greeks of a call (caplet) in the normal model (Bachelier).
+        The discount factor belongs to the payment date
+        optionMaturity + periodLength.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'price', 'delta', 'gamma', 'vega', 'vanna', 'volga',
+            'theta' and 'rho' as np.arrays.
+
+        '''
+        forward, optionStrike, volatility, optionMaturity = np.broadcast_arrays(
+            *map(np.asarray, (forward, optionStrike, volatility, optionMaturity)))
+        scaling = nominal * periodLength * discountFactor
+
+        moneyness = forward - optionStrike
+        sqrtMaturity = np.sqrt(np.maximum(optionMaturity, 0.))
+        standardDeviation = volatility * sqrtMaturity
+        isAlive = standardDeviation > 0
+
+        # dead options are set to d = +-infinity, all higher Greeks vanish
+        safeStandardDeviation = np.where(isAlive, standardDeviation, 1.)
+        safeVolatility = np.where(isAlive, volatility, 1.)
+        safeSqrtMaturity = np.where(isAlive, sqrtMaturity, 1.)
+        d = np.where(isAlive, moneyness / safeStandardDeviation,
+                     np.where(moneyness > 0, np.inf, -np.inf))
+        cdf = normalCdfArray(d)
+        pdf = np.where(isAlive, normalPdfArray(d), 0.)
+        dPdf = np.where(isAlive, d * pdf, 0.)
+
+        price = scaling * np.where(isAlive, moneyness * cdf + standardDeviation * pdf,
+                                   np.maximum(moneyness, 0.))
+
+        return {'price' : price,
+                'delta' : scaling * cdf,
+                'gamma' : scaling * pdf / safeStandardDeviation,
+                'vega' : scaling * sqrtMaturity * pdf,
+                'vanna' : -scaling * dPdf / safeVolatility,
+                'volga' : scaling * sqrtMaturity * d * dPdf / safeVolatility,
+                'theta' : -scaling * volatility * pdf / (2 * safeSqrtMaturity),
+                'rho' : -(optionMaturity + periodLength) * price}
+
+
+    def blackScholesCallGreeks(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Price and Greeks of a call (caplet) in the lognormal model
+        (Black scholes). The discount factor belongs to the payment date
+        optionMaturity + periodLength.
+
+        Parameters
+        ----------
+        see blackScholesCallGeneralForm.
+
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'price', 'delta', 'gamma', 'vega', 'vanna', 'volga',
+            'theta' and 'rho' as np.arrays.
+
+        '''
+        greeks = self._blackGreeks(forward, optionStrike, volatility, optionMaturity,
+                                   nominal * periodLength * discountFactor)
+        greeks['rho'] = -(optionMaturity + periodLength) * greeks['price']
+
+        return greeks
+
+
+    def blackScholesPutGreeks(self, forward = 0.05, interestRate = 0, volatility = 0.3,
+    periodLength = 1, discountFactor = 1,maturity = 1, strike = 0.05, nominal = 1):
+        '''
+        Price and Greeks of a put (floorlet) in the lognormal model
+        (Black scholes). The arguments follow BlackScholesPutGeneralForm, the
+        put is obtained from the call by put call parity.
+
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'price', 'delta', 'gamma', 'vega', 'vanna', 'volga',
+            'theta' and 'rho' as np.arrays.
+
+        '''
+        scaling = nominal * periodLength * discountFactor
+        greeks = self._blackGreeks(forward, strike, volatility, maturity, scaling)
+
+        # put call parity, the forward contract has no optionality
+        greeks['price'] = greeks['price'] - scaling * (np.asarray(forward) - strike)
+        greeks['delta'] = greeks['delta'] - scaling
+        greeks['rho'] = -(np.asarray(maturity) + periodLength) * greeks['price']
+
+        return greeks
+
+
+    def blackScholesDigitalCapletGreeks(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Price and Greeks of a digital caplet in the lognormal model
+        (Black scholes). The discount factor belongs to the payment date
+        optionMaturity + periodLength.
+
+        Parameters
+        ----------
+        see BlackScholesDigitalCaplet.
+
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'price', 'delta', 'gamma', 'vega', 'vanna', 'volga',
+            'theta' and 'rho' as np.arrays.
+
+        '''
+        dPlus, dMinus, isAlive = self._blackD(forward, optionStrike, volatility, optionMaturity)
+        forward, volatility, optionMaturity = np.broadcast_arrays(
+            *map(np.asarray, (forward, volatility, optionMaturity)))
+        scaling = nominal * periodLength * discountFactor
+
+        price = scaling * normalCdfArray(dMinus)
+
+        safeForward = np.where(isAlive, forward, 1.)
+        safeVolatility = np.where(isAlive, volatility, 1.)
+        safeMaturity = np.where(isAlive, optionMaturity, 1.)
+        safeStandardDeviation = safeVolatility * np.sqrt(safeMaturity)
+        dPlus = np.where(isAlive, dPlus, 0.)
+        dMinus = np.where(isAlive, dMinus, 0.)
+        pdf = np.where(isAlive, normalPdfArray(dMinus), 0.)
+
+        return {'price' : price,
+                'delta' : scaling * pdf / (safeForward * safeStandardDeviation),
+                'gamma' : -scaling * pdf * dPlus / (safeForward * safeStandardDeviation)**2,
+                'vega' : -scaling * pdf * dPlus / safeVolatility,
+                'vanna' : scaling * pdf * (dPlus * dMinus - 1) / \
+                    (safeForward * safeVolatility * safeStandardDeviation),
+                'volga' : -scaling * pdf * (dPlus**2 * dMinus - dPlus - dMinus) / safeVolatility**2,
+                'theta' : scaling * pdf * dPlus / (2 * safeMaturity),
+                'rho' : -(optionMaturity + periodLength) * price}
+
+
+    def blackScholesSwaptionGreeks(self, forward, optionStrike, volatility = 0.05,
+    optionMaturity = 0, periodLength = 1, discountFactor = 1, optionEnd = 1, nominal = 1):
+        '''
+        Price and Greeks of a swaption in the lognormal model (Black scholes),
+        the forward is the swap rate. Rho includes the change of the annuity
+        for all payment dates.
+
+        Parameters
+        ----------
+        see BlackScholesSwaption.
+
+        Returns
+        -------
+        TYPE dict.
+            DESCRIPTION. 'price', 'delta', 'gamma', 'vega', 'vanna', 'volga',
+            'theta' and 'rho' as np.arrays.
+
+        '''
+        swapAnnuity, swapAnnuityDuration = self._swapAnnuity(optionMaturity, periodLength,
+                                                             discountFactor, optionEnd)
+        greeks = self._blackGreeks(forward, optionStrike, volatility, optionMaturity,
+                                   nominal * swapAnnuity)
+        greeks['rho'] = -swapAnnuityDuration / swapAnnuity * greeks['price']
+
+        return greeks
+
+
+    def _blackGreeks(self, forward, optionStrike, volatility, optionMaturity, scaling):
+        '''
+        Price and Greeks (without rho) of scaling * Black(F, K, sigma, T).
+
+        '''
+        dPlus, dMinus, isAlive = self._blackD(forward, optionStrike, volatility, optionMaturity)
+        forward, optionStrike, volatility, optionMaturity = np.broadcast_arrays(
+            *map(np.asarray, (forward, optionStrike, volatility, optionMaturity)))
+
+        cdfPlus = normalCdfArray(dPlus)
+        cdfMinus = normalCdfArray(dMinus)
+        pdfPlus = np.where(isAlive, normalPdfArray(np.where(isAlive, dPlus, 0.)), 0.)
+
+        safeForward = np.where(isAlive, forward, 1.)
+        safeVolatility = np.where(isAlive, volatility, 1.)
+        sqrtMaturity = np.sqrt(np.where(isAlive, optionMaturity, 1.))
+        # dPlus * dMinus only enters together with the density
+        dPlusdMinus = np.where(isAlive, dPlus * dMinus, 0.)
+        vega = scaling * forward * pdfPlus * sqrtMaturity
+
+        return {'price' : scaling * (forward * cdfPlus - optionStrike * cdfMinus),
+                'delta' : scaling * cdfPlus,
+                'gamma' : scaling * pdfPlus / (safeForward * safeVolatility * sqrtMaturity),
+                'vega' : vega,
+                'vanna' : -scaling * pdfPlus * np.where(isAlive, dMinus, 0.) / safeVolatility,
+                'volga' : vega * dPlusdMinus / safeVolatility,
+                'theta' : -scaling * forward * pdfPlus * safeVolatility / (2 * sqrtMaturity)}
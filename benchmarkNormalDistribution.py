@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Per call latency of the normal distribution functions in "normaldistribution"
+compared with the scipy.stats path which was used by the analytic formulas
+before.
+@author: Marcel Pommer
+"""
+
+import timeit
+import numpy as np
+from normaldistribution import normalCdf, normalPdf, normalCdfArray, normalPdfArray
+from analyticformulas import analyticformulas
+
+numberOfCalls = 20000
+x = 0.3
+xArray = np.linspace(-5, 5, 100000)
+analytic = analyticformulas()
+
+
+def latency(statement, number = numberOfCalls):
+    # best of five runs, in microseconds per call
+    return min(timeit.repeat(statement, number = number, repeat = 5)) / number * 1e6
+
+
+def main():
+    # scipy is only needed for the comparison
+    import scipy.stats as st
+
+    print("scalar (us per call)")
+    print("scipy.stats norm.cdf:         {:8.3f}".format(latency(lambda: st.norm.cdf(x, 0.0, 1.0))))
+    print("normalCdf:                    {:8.3f}".format(latency(lambda: normalCdf(x))))
+    print("scipy.stats norm.pdf:         {:8.3f}".format(latency(lambda: st.norm.pdf(x, 0.0, 1.0))))
+    print("normalPdf:                    {:8.3f}".format(latency(lambda: normalPdf(x))))
+    print("blackScholesCallGeneralForm:  {:8.3f}".format(latency(lambda:
+        analytic.blackScholesCallGeneralForm(0.03, 0.025, 0.2, 2.0, 0.5, 0.95))))
+
+    print("array of {} points (ms per call)".format(xArray.shape[0]))
+    print("scipy.stats norm.cdf:         {:8.3f}".format(latency(lambda: st.norm.cdf(xArray), 20) / 1e3))
+    print("normalCdfArray:               {:8.3f}".format(latency(lambda: normalCdfArray(xArray), 20) / 1e3))
+    print("scipy.stats norm.pdf:         {:8.3f}".format(latency(lambda: st.norm.pdf(xArray), 20) / 1e3))
+    print("normalPdfArray:               {:8.3f}".format(latency(lambda: normalPdfArray(xArray), 20) / 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the analytic formulas, the trinomial tree and the
+Levenberg-Marquardt calibration at production sizes. Every benchmark
+reports the best time of a few runs, the throughput and the peak memory
+(tracemalloc, numpy allocations included).
+
+    python benchmarkSuite.py            run and compare with the baseline
+    python benchmarkSuite.py --save     run and store the results as baseline
+    python benchmarkSuite.py --quick    smallest sizes only
+
+The modules of the tree directory are imported by name, so the package is
+installed first (pip install -e .), which also gives the command
+financial-markets-benchmark. The baseline (benchmarkBaseline.json in the
+working directory) is machine specific and stays local. Benchmarks which are slower than the baseline
+by more than the tolerance are reported and the exit code is 1.
+@author: Marcel Pommer
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+from LevenberquMarquard import LevenberquOptimizer
+from TrinomialTree import treeConstruction
+
+BASELINE = 'benchmarkBaseline.json'
+
+
+def measure(function, repeat = 3):
+    '''
+    Parameters
+    ----------
+    function : TYPE callable.
+        DESCRIPTION. Benchmark without arguments.
+    repeat : TYPE, int.
+        DESCRIPTION. The default is 3. Number of timed runs.
+
+    Returns
+    -------
+    TYPE tuple.
+        DESCRIPTION. Best time in seconds and peak memory in bytes (of an
+        extra run, tracemalloc slows the python code down).
+
+    '''
+    tracemalloc.start()
+    function()
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = np.inf
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - startTime)
+
+    return seconds, peakMemory
+
+
+def getFormulaBenchmarks(sizes):
+    # (name, function, number of items) of the Black and Bachelier formulas
+    formulas = vectorizedanalyticformulas()
+    benchmarks = []
+    for size in sizes:
+        generator = np.random.default_rng(0)
+        forward = generator.uniform(0.01, 0.05, size)
+        strike = generator.uniform(0.01, 0.05, size)
+        maturity = generator.uniform(0.1, 30, size)
+        benchmarks.append(('black quotes={:.0e}'.format(size), lambda forward = forward, strike = strike,
+            maturity = maturity: formulas.blackScholesCallGeneralForm(forward, strike, 0.2, maturity, 0.5, 0.95), size))
+        benchmarks.append(('bachelier quotes={:.0e}'.format(size), lambda forward = forward, strike = strike,
+            maturity = maturity: formulas.bachelierCall(forward, strike, 0.01, maturity, 0.5, 0.95), size))
+
+    return benchmarks
+
+
+def getTreeBenchmarks(stepsPerYear, lastDate = 30):
+    # tree build and a bermudan call on a 10y bond out to lastDate
+    Zerocurve = np.column_stack((np.arange(1, lastDate + 1.), np.linspace(0.02, 0.04, lastDate)))
+    cashflow = np.column_stack((np.arange(1, 11.), np.r_[np.full(9, 0.04), 1.04]))
+    ExDates = np.column_stack((np.arange(1, 10.), np.ones(9)))
+
+    benchmarks = []
+    for steps in stepsPerYear:
+        benchmarks.append(('tree build steps={} years={}'.format(steps, lastDate),
+                           lambda steps = steps: treeConstruction(Zerocurve, lastDate, 0.01, steps, 0.05),
+                           steps*lastDate))
+        Tree = treeConstruction(Zerocurve, lastDate, 0.01, steps, 0.05)
+        benchmarks.append(('BondOption steps={} years={}'.format(steps, lastDate),
+                           lambda Tree = Tree: Tree.BondOption(cashflow, ExDates), steps*10))
+
+    return benchmarks
+
+
+def getCalibrationBenchmarks(numbersOfParameters):
+    # bachelier caplets, two strikes per vol bucket, from 80% of the vols
+    formulas = vectorizedanalyticformulas()
+    benchmarks = []
+    for numberOfParameters in numbersOfParameters:
+        maturity = np.repeat(np.arange(1, numberOfParameters + 1.), 2)
+        strike = np.tile([0.025, 0.035], numberOfParameters)
+        volastructure = np.column_stack((np.arange(1, numberOfParameters + 1.),
+                                         np.linspace(0.008, 0.012, numberOfParameters)))
+
+        def prices(x, maturity = maturity, strike = strike):
+            sigma = np.repeat(x[..., 1], 2, axis = -1)
+            return formulas.bachelierCall(0.03, strike, sigma, maturity, 0.5, 0.95)
+
+        initialGuess = volastructure.copy()
+        initialGuess[:, 1] *= 0.8
+        benchmarks.append(('LevenberquOptimizer parameters={}'.format(numberOfParameters),
+                           lambda prices = prices, marketPrices = prices(volastructure), initialGuess = initialGuess:
+                           LevenberquOptimizer(prices, marketPrices, initialGuess, [], tol = 1e-20, vectorized = True),
+                           numberOfParameters))
+
+    return benchmarks
+
+
+def runBenchmarks(quick = False, repeat = 3):
+    '''
+    Parameters
+    ----------
+    quick : TYPE, bool.
+        DESCRIPTION. The default is False. Smallest sizes only.
+    repeat : TYPE, int.
+        DESCRIPTION. The default is 3. Number of timed runs.
+
+    Returns
+    -------
+    TYPE dict.
+        DESCRIPTION. {name : {'seconds', 'throughput' (items per second),
+        'peakMemory' (bytes)}}.
+
+    '''
+    benchmarks = getFormulaBenchmarks([1000] if quick else [1000, 100000, 10000000]) \
+        + getTreeBenchmarks([12] if quick else [12, 52, 365], 5 if quick else 30) \
+        + getCalibrationBenchmarks([10] if quick else [10, 30, 100])
+
+    results = {}
+    for name, function, items in benchmarks:
+        seconds, peakMemory = measure(function, repeat)
+        results[name] = {'seconds' : seconds, 'throughput' : items/seconds, 'peakMemory' : peakMemory}
+
+    return results
+
+
+def compareWithBaseline(results, baseline, tolerance = 1.5):
+    '''
+    Returns
+    -------
+    TYPE list.
+        DESCRIPTION. (name, seconds, baseline seconds) of the benchmarks which
+        are slower than tolerance times the baseline.
+
+    '''
+    return [(name, result['seconds'], baseline[name]['seconds']) for name, result in results.items()
+            if name in baseline and result['seconds'] > tolerance*baseline[name]['seconds']]
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks of the pricing modules.')
+    parser.add_argument('--save', action = 'store_true', help = 'store the results as baseline')
+    parser.add_argument('--quick', action = 'store_true', help = 'smallest sizes only')
+    parser.add_argument('--tolerance', type = float, default = 1.5, help = 'allowed slow down')
+    parser.add_argument('--baseline', default = BASELINE, help = 'baseline file')
+    arguments = parser.parse_args(arguments)
+
+    results = runBenchmarks(arguments.quick)
+    baseline = {}
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+
+    print('{:40} {:>12} {:>16} {:>12} {:>12}'.format('benchmark', 'seconds', 'items/s', 'peak MB', 'baseline'))
+    for name, result in results.items():
+        reference = '{:12.6f}'.format(baseline[name]['seconds']) if name in baseline else '{:>12}'.format('-')
+        print('{:40} {:12.6f} {:16.1f} {:12.2f} {}'.format(name, result['seconds'], result['throughput'],
+                                                           result['peakMemory']/2**20, reference))
+
+    if arguments.save:
+        baseline.update(results)
+        with open(arguments.baseline, 'w') as file:
+            json.dump(baseline, file, indent = 1)
+        return 0
+
+    regressions = compareWithBaseline(results, baseline, arguments.tolerance)
+    for name, seconds, reference in regressions:
+        print('regression: {} took {:.6f}s, baseline {:.6f}s'.format(name, seconds, reference))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
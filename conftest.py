@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+The tests import the modules of the root and of the tree directory by
+name. In an installed checkout (pip install -e .) both directories are on
+the path already, otherwise they are added here for the test session.
+@author: Marcel Pommer
+"""
+
+import os
+import sys
+
+root = os.path.dirname(os.path.abspath(__file__))
+for directory in [root, os.path.join(root, 'Trinomial model (Ho-Lee)')]:
+    if directory not in sys.path:
+        sys.path.append(directory)
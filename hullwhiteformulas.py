@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Closed form prices in the Hull-White model dr = (theta(t) - a r) dt + sigma dW
+with constant volatility, Ho-Lee is the special case a = 0. The model is
+fitted to the zero curve, so all formulas take the discount factors P(0, T)
+of the curve. Every argument can be a float or a numpy array, the arguments
+are broadcast against each other (as in "vectorizedanalyticformulas").
+
+    zero bond     : P(t, T) given the short rate r(t)
+    bond option   : european option on a zero bond
+    caplet        : put on a zero bond
+    coupon bond   : european option on a coupon bond (Jamshidian)
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from normaldistribution import normalCdfArray
+
+
+class hullwhiteformulas:
+
+    def zeroBondPrice(self, shortRate, forwardRate, discountFactorStart, discountFactorEnd,
+                      startTime, endTime, volatility = 0.01, a = 0):
+        '''
+        The function calculates zero bond prices P(t, T) at t given the short
+        rate r(t).
+
+        Parameters
+        ----------
+        shortRate : TYPE float or np.array.
+            DESCRIPTION. Short rates r(t).
+        forwardRate : TYPE float or np.array.
+            DESCRIPTION. Instantaneous forward rate f(0, t) of the curve.
+        discountFactorStart : TYPE float or np.array.
+            DESCRIPTION. P(0, t).
+        discountFactorEnd : TYPE float or np.array.
+            DESCRIPTION. P(0, T).
+        startTime : TYPE float or np.array.
+            DESCRIPTION. t.
+        endTime : TYPE float or np.array.
+            DESCRIPTION. T.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.01. Volatility of the short rate.
+        a : TYPE, float or np.array.
+            DESCRIPTION. The default is 0 (Ho-Lee). Mean reversion.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Zero bond prices (broadcast shape of the inputs).
+
+        '''
+        B = self._B(a, np.asarray(endTime) - startTime)
+        variance = self._shortRateVariance(volatility, a, startTime)
+
+        return discountFactorEnd/discountFactorStart*np.exp(-B*(np.asarray(shortRate) - forwardRate) - 0.5*variance*B**2)
+
+
+    def zeroBondOption(self, discountFactorExpiry, discountFactorMaturity, optionStrike, volatility = 0.01,
+                       optionMaturity = 0, bondMaturity = 1, a = 0, isCall = True, nominal = 1):
+        '''
+        The function calculates the price of a european option with expiry T
+        on the zero bond maturing at S.
+
+        Parameters
+        ----------
+        discountFactorExpiry : TYPE float or np.array.
+            DESCRIPTION. P(0, T).
+        discountFactorMaturity : TYPE float or np.array.
+            DESCRIPTION. P(0, S).
+        optionStrike : TYPE float or np.array.
+            DESCRIPTION. Strike (price of the bond).
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.01. Volatility of the short rate.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Expiry T.
+        bondMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 1. Maturity S >= T of the bond.
+        a : TYPE, float or np.array.
+            DESCRIPTION. The default is 0 (Ho-Lee). Mean reversion.
+        isCall : TYPE, bool or np.array.
+            DESCRIPTION. The default is True. Call or put.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Option prices (broadcast shape of the inputs).
+
+        '''
+        discountFactorExpiry, discountFactorMaturity, optionStrike, isCall = np.broadcast_arrays(
+            *map(np.asarray, (discountFactorExpiry, discountFactorMaturity, optionStrike, isCall)))
+
+        # standard deviation of log P(T, S)
+        standardDeviation = self._B(a, np.asarray(bondMaturity) - optionMaturity) \
+            * np.sqrt(self._shortRateVariance(volatility, a, optionMaturity))
+        standardDeviation = np.broadcast_to(standardDeviation, discountFactorExpiry.shape)
+        isAlive = (standardDeviation > 0) & (optionStrike > 0)
+
+        # dead options (zero maturity) only keep the intrinsic value
+        safeStandardDeviation = np.where(isAlive, standardDeviation, 1.)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            h = np.log(discountFactorMaturity/(optionStrike*discountFactorExpiry))/safeStandardDeviation \
+                + 0.5*safeStandardDeviation
+        sign = np.where(isCall, 1., -1.)
+        value = sign*(discountFactorMaturity*normalCdfArray(sign*h)
+                      - optionStrike*discountFactorExpiry*normalCdfArray(sign*(h - safeStandardDeviation)))
+        intrinsic = np.maximum(sign*(discountFactorMaturity - optionStrike*discountFactorExpiry), 0.)
+
+        return nominal*np.where(isAlive, value, intrinsic)
+
+
+    def caplet(self, discountFactorStart, discountFactorEnd, optionStrike, volatility = 0.01,
+               optionMaturity = 0, periodLength = 1, a = 0, nominal = 1):
+        '''
+        The function calculates caplet prices on the rate of [T, T + periodLength],
+        paid at the end of the period. A caplet is (1 + K periodLength) puts on
+        the zero bond maturing at T + periodLength with strike 1/(1 + K periodLength).
+
+        Parameters
+        ----------
+        discountFactorStart : TYPE float or np.array.
+            DESCRIPTION. P(0, T).
+        discountFactorEnd : TYPE float or np.array.
+            DESCRIPTION. P(0, T + periodLength).
+        optionStrike : TYPE float or np.array.
+            DESCRIPTION. Strike rates.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.01. Volatility of the short rate.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Start T of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        a : TYPE, float or np.array.
+            DESCRIPTION. The default is 0 (Ho-Lee). Mean reversion.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Caplet prices (broadcast shape of the inputs).
+
+        '''
+        strikeFactor = 1 + np.asarray(optionStrike)*periodLength
+
+        return nominal*strikeFactor*self.zeroBondOption(discountFactorStart, discountFactorEnd, 1/strikeFactor,
+            volatility, optionMaturity, np.asarray(optionMaturity) + periodLength, a, isCall = False)
+
+
+    def couponBondOption(self, discountFactorExpiry, discountFactors, cashflows, paymentDates, optionStrike,
+                         volatility = 0.01, optionMaturity = 0, a = 0, isCall = True, nominal = 1):
+        '''
+        The function calculates the price of a european option on a coupon
+        bond with the decomposition of Jamshidian: the short rate r* at
+        which the bond is worth the strike is found and the option is the sum
+        of options on the zero bonds with strikes P(T, T_i; r*). A payer
+        swaption is a put with strike 1 on the bond paying K periodLength and
+        the nominal at the end.
+
+        Parameters
+        ----------
+        discountFactorExpiry : TYPE float or np.array.
+            DESCRIPTION. P(0, T).
+        discountFactors : TYPE np.array.
+            DESCRIPTION. P(0, T_i) of the payment dates along the last axis.
+        cashflows : TYPE float or np.array.
+            DESCRIPTION. Payments c_i along the last axis (non negative).
+        paymentDates : TYPE np.array.
+            DESCRIPTION. Payment dates T_i > T along the last axis.
+        optionStrike : TYPE float or np.array.
+            DESCRIPTION. Strike (price of the bond).
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.01. Volatility of the short rate.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Expiry T.
+        a : TYPE, float or np.array.
+            DESCRIPTION. The default is 0 (Ho-Lee). Mean reversion.
+        isCall : TYPE, bool or np.array.
+            DESCRIPTION. The default is True. Call or put.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Option prices (broadcast shape without the payment axis).
+
+        '''
+        expand = lambda x: np.asarray(x)[..., None]
+        discountFactors, cashflows, paymentDates = np.broadcast_arrays(
+            *map(np.asarray, (discountFactors, cashflows, paymentDates)))
+
+        # P(T, T_i) = P(0, T_i)/P(0, T) exp(-B_i y - variance B_i^2/2) with y = r(T) - f(0, T)
+        B = self._B(expand(a), paymentDates - expand(optionMaturity))
+        variance = expand(self._shortRateVariance(volatility, a, optionMaturity))
+        forwardValues = cashflows*discountFactors/expand(discountFactorExpiry)*np.exp(-0.5*variance*B**2)
+
+        # the bond price is decreasing and log convex in y, newton on the logarithm
+        y = np.zeros(np.broadcast_shapes(forwardValues.shape[:-1], np.shape(optionStrike)))
+        logStrike = np.log(optionStrike)
+        for _ in range(100):
+            values = forwardValues*np.exp(-B*expand(y))
+            bondValue = values.sum(axis = -1)
+            step = (np.log(bondValue) - logStrike)/((values*B).sum(axis = -1)/bondValue)
+            y += step
+            if np.all(np.abs(step) < 1e-14):
+                break
+
+        strikes = np.exp(-B*expand(y))*np.exp(-0.5*variance*B**2)*discountFactors/expand(discountFactorExpiry)
+        options = self.zeroBondOption(expand(discountFactorExpiry), discountFactors, strikes, expand(volatility),
+                                      expand(optionMaturity), paymentDates, expand(a), expand(isCall))
+
+        return nominal*(cashflows*options).sum(axis = -1)
+
+
+    def _B(self, a, timeToMaturity):
+        '''
+        B(t, T) = (1 - exp(-a (T - t)))/a, T - t for a = 0.
+
+        '''
+        a, timeToMaturity = np.broadcast_arrays(np.asarray(a, dtype = float), np.asarray(timeToMaturity, dtype = float))
+        safeA = np.where(a != 0, a, 1.)
+
+        return np.where(a != 0, -np.expm1(-safeA*timeToMaturity)/safeA, timeToMaturity)
+
+
+    def _shortRateVariance(self, volatility, a, time):
+        '''
+        Variance of r(t): sigma^2 (1 - exp(-2 a t))/(2 a), sigma^2 t for a = 0.
+
+        '''
+        return np.asarray(volatility)**2*self._B(2*np.asarray(a, dtype = float), time)
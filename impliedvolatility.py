@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Implied volatilities for the Black (lognormal) and Bachelier (normal) call
+formulas in "vectorizedanalyticformulas", solved for whole arrays of quotes
+at once.
+
+Both solvers work on the out of the money option (in the money quotes are
+mapped by put call parity), start from a closed form initial guess and run
+Halley iterations on the logarithm of the normalised price. Every quote
+keeps a bracket [lower, upper] of its total standard deviation
+s = sigma * sqrt(T), steps leaving the bracket are replaced by bisection and
+converged quotes are removed from the active set.
+@author: Marcel Pommer
+"""
+
+import math
+import numpy as np
+from normaldistribution import normalCdfArray, normalPdfArray, getSpecialFunction
+
+
+class impliedvolatility:
+
+    def __init__(self, tol = 1e-14, maxIterations = 100):
+        '''
+        Parameters
+        ----------
+        tol : TYPE, float.
+            DESCRIPTION. The default is 1e-14. Relative tolerance on the
+            total standard deviation sigma * sqrt(T).
+        maxIterations : TYPE, int.
+            DESCRIPTION. The default is 100. Maximal number of iterations
+            (Halley or bisection steps).
+
+        '''
+        self.tol = tol
+        self.maxIterations = maxIterations
+
+
+    def blackImpliedVolatility(self, price, forward, optionStrike, optionMaturity = 1,
+            periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Inverts blackScholesCallGeneralForm for arrays of call (caplet) prices.
+
+        Parameters
+        ----------
+        price : TYPE float or np.array.
+            DESCRIPTION. Discounted call prices.
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values (>0).
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options (>0).
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 1. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Implied lognormal volatilities, np.nan for prices
+            outside of the no arbitrage bounds (max(F-K, 0), F).
+
+        '''
+        price, forward, optionStrike, optionMaturity, scaling = np.broadcast_arrays(
+            *map(np.asarray, (price, forward, optionStrike, optionMaturity,
+                              nominal * np.asarray(periodLength) * discountFactor)))
+
+        # normalise to an out of the money call on sqrt(F*K) with log moneyness x <= 0
+        logMoneyness = np.log(forward / optionStrike)
+        callPrice = price / scaling
+        otmPrice = callPrice - np.maximum(forward - optionStrike, 0.)
+        normalisedPrice = otmPrice / np.sqrt(forward * optionStrike)
+        x = -np.abs(logMoneyness)
+
+        # prices a rounding error below the intrinsic value (deep in the money) have volatility 0
+        isValid = (forward > 0) & (optionStrike > 0) & (optionMaturity > 0) \
+            & (otmPrice >= -self._roundingError(forward, optionStrike)) & (callPrice < forward)
+        standardDeviation = np.full(price.shape, np.nan)
+        standardDeviation[isValid & (otmPrice <= 0)] = 0.
+
+        isActive = isValid & (otmPrice > 0)
+        standardDeviation[isActive] = self._solve(self._normalisedBlack,
+            self._blackInitialGuess, x[isActive], normalisedPrice[isActive])
+
+        with np.errstate(invalid = 'ignore'):
+            return standardDeviation / np.sqrt(optionMaturity)
+
+
+    def bachelierImpliedVolatility(self, price, forward, optionStrike, optionMaturity = 1,
+            periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Inverts bachelierCall for arrays of call (caplet) prices.
+
+        Parameters
+        ----------
+        price : TYPE float or np.array.
+            DESCRIPTION. Discounted call prices.
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 1. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Implied normal volatilities, np.nan for prices
+            below the intrinsic value.
+
+        '''
+        price, forward, optionStrike, optionMaturity, scaling = np.broadcast_arrays(
+            *map(np.asarray, (price, forward, optionStrike, optionMaturity,
+                              nominal * np.asarray(periodLength) * discountFactor)))
+
+        # normalise to an out of the money call with moneyness x <= 0
+        moneyness = forward - optionStrike
+        otmPrice = price / scaling - np.maximum(moneyness, 0.)
+        x = -np.abs(moneyness)
+
+        isValid = (optionMaturity > 0) & (otmPrice >= -self._roundingError(forward, optionStrike))
+        standardDeviation = np.full(price.shape, np.nan)
+        standardDeviation[isValid & (otmPrice <= 0)] = 0.
+
+        isActive = isValid & (otmPrice > 0)
+        standardDeviation[isActive] = self._solve(self._normalisedBachelier,
+            self._bachelierInitialGuess, x[isActive], otmPrice[isActive])
+
+        with np.errstate(invalid = 'ignore'):
+            return standardDeviation / np.sqrt(optionMaturity)
+
+
+    def _roundingError(self, forward, optionStrike):
+        '''
+        Bound of the rounding error of an option price (per unit of scaling)
+        calculated from the difference of terms of the size of the forward
+        and the strike.
+
+        '''
+        return 16 * np.finfo(float).eps * np.maximum(np.abs(forward), np.abs(optionStrike))
+
+
+    def _solve(self, normalisedFormula, initialGuess, x, targetPrice):
+        '''
+        Solves normalisedFormula(x, s) = targetPrice for s > 0 elementwise.
+        The formula returns the price together with the first two derivatives
+        with respect to s.
+
+        '''
+        logTarget = np.log(targetPrice)
+        standardDeviation = initialGuess(x, targetPrice)
+
+        # bracket: the price is increasing in s, lower bound 0, upper bound by doubling
+        lower = np.zeros(x.shape)
+        upper = np.maximum(2 * standardDeviation, 1.)
+        isBelow = normalisedFormula(x, upper)[0] < targetPrice
+        for doubling in range(64):
+            if not np.any(isBelow):
+                break
+            lower[isBelow] = upper[isBelow]
+            upper[isBelow] *= 2
+            isBelow[isBelow] = normalisedFormula(x[isBelow], upper[isBelow])[0] < targetPrice[isBelow]
+        standardDeviation = np.clip(standardDeviation, lower, upper)
+
+        active = np.arange(x.shape[0])
+        for iteration in range(self.maxIterations):
+            if active.shape[0] == 0:
+                break
+            s = standardDeviation[active]
+            value, firstDerivative, secondDerivative = normalisedFormula(x[active], s)
+
+            # shrink the bracket with the sign of the error
+            with np.errstate(divide = 'ignore'):
+                error = np.log(value) - logTarget[active]
+            lower[active] = np.where(error < 0, s, lower[active])
+            upper[active] = np.where(error > 0, s, upper[active])
+
+            # Halley step on log(price(s)) - log(target)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                g1 = firstDerivative / value
+                g2 = secondDerivative / value - g1 * g1
+                newtonStep = -error / g1
+                step = newtonStep / (1 + 0.5 * newtonStep * g2 / g1)
+                candidate = s + step
+
+            # bisection where the step leaves the bracket
+            isOutside = ~((candidate > lower[active]) & (candidate < upper[active]))
+            candidate = np.where(isOutside, 0.5 * (lower[active] + upper[active]), candidate)
+
+            standardDeviation[active] = candidate
+            isConverged = (np.abs(candidate - s) <= self.tol * candidate) | (error == 0) \
+                | (upper[active] - lower[active] <= self.tol * candidate)
+            active = active[~isConverged]
+
+        return standardDeviation
+
+
+    def _normalisedBlack(self, x, s):
+        '''
+        Normalised Black call b(x, s) = exp(x/2) N(x/s + s/2) - exp(-x/2) N(x/s - s/2)
+        with x = log(F/K), s = sigma * sqrt(T) (price divided by sqrt(F*K)),
+        and its first two derivatives with respect to s.
+
+        '''
+        dPlus = x / s + 0.5 * s
+        dMinus = dPlus - s
+        value = np.exp(0.5 * x) * normalCdfArray(dPlus) - np.exp(-0.5 * x) * normalCdfArray(dMinus)
+        vega = np.exp(0.5 * x) * normalPdfArray(dPlus)
+
+        return value, vega, vega * dPlus * dMinus / s
+
+
+    def _normalisedBachelier(self, x, s):
+        '''
+        Normalised Bachelier call x N(x/s) + s n(x/s) with x = F - K and
+        s = sigma * sqrt(T), and its first two derivatives with respect to s.
+
+        '''
+        d = x / s
+        pdf = normalPdfArray(d)
+        value = x * normalCdfArray(d) + s * pdf
+
+        return value, pdf, pdf * d * d / s
+
+
+    def _blackInitialGuess(self, x, normalisedPrice):
+        '''
+        Initial guess for the normalised Black formula (x <= 0). At the money
+        the formula 2 N(s/2) - 1 is inverted exactly, otherwise the rational
+        approximation of Corrado and Miller is used. Where it is not defined
+        (deep out of the money) the guess falls back to the inflection point
+        sqrt(2|x|) of the price as a function of s.
+
+        '''
+        # in units of sqrt(F*K): forward exp(x/2), strike exp(-x/2)
+        forward = np.exp(0.5 * x)
+        strike = np.exp(-0.5 * x)
+        halfMoneyness = 0.5 * (forward - strike)
+        callPrice = normalisedPrice + np.maximum(forward - strike, 0.)
+
+        with np.errstate(invalid = 'ignore'):
+            radicand = (callPrice - halfMoneyness)**2 - (forward - strike)**2 / math.pi
+            guess = math.sqrt(2 * math.pi) / (forward + strike) * \
+                (callPrice - halfMoneyness + np.sqrt(radicand))
+        guess = np.where((radicand >= 0) & (guess > 0), guess, np.sqrt(2 * np.abs(x)))
+
+        return np.where(x == 0, 2 * getSpecialFunction('ndtri')(0.5 * (1 + normalisedPrice)), guess)
+
+
+    def _bachelierInitialGuess(self, x, otmPrice):
+        '''
+        Initial guess for the normalised Bachelier formula (x <= 0). At the
+        money s = sqrt(2 pi) * price is exact. Out of the money the price is
+        approximated by its leading exponential term |x| exp(-x^2 / (2 s^2)) / sqrt(2 pi),
+        which can be inverted in closed form.
+
+        '''
+        atmGuess = math.sqrt(2 * math.pi) * otmPrice
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            logRatio = np.log(otmPrice * math.sqrt(2 * math.pi) / np.abs(x))
+            guess = np.abs(x) / np.sqrt(-2 * logRatio)
+
+        return np.where(logRatio < -1, np.maximum(guess, atmGuess), atmGuess)
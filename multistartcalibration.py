@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Multi start calibration with "LevenberquOptimizer". Many local
+optimizations are started from a latin hypercube sample of the bounds (or
+from given seeds) and run on a process pool.
+
+Every start runs in rounds of a few iterations. After each round the start
+is compared with the best start so far: starts whose MSE lags by more than
+a factor are cancelled, the others are resubmitted from their last point
+and damping. Once one start reaches the tolerance all others are cancelled.
+The starts do not wait for each other, so the runner scales with the
+number of workers as long as the rounds are much longer than the
+inter-process overhead.
+
+The pricing function is sent to the worker processes, so it has to be
+picklable (a function defined at module level).
+@author: Marcel Pommer
+"""
+
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from LevenberquMarquard import LevenberquOptimizer, getBounds
+
+
+def multiStartCalibration(function, marketPrices, initialGuess, bounds, numberOfStarts = 8, seeds = None,
+                          maxWorkers = None, executor = None, randomSeed = None, roundIterations = 20,
+                          cancelFactor = 10., maxIterations = 10000, tol = 1e-08, **optimizerArguments):
+    '''
+    Parameters
+    ----------
+    function : TYPE callable.
+        DESCRIPTION. Maps a volastructure ([date, vol] rows) to the model
+        prices, picklable for process pools.
+    marketPrices : TYPE np.array.
+        DESCRIPTION. Prices to be matched.
+    initialGuess : TYPE np.array.
+        DESCRIPTION. Volastructure, the first start and the dates of all starts.
+    bounds : TYPE list.
+        DESCRIPTION. See LevenberquOptimizer.
+    numberOfStarts : TYPE, int.
+        DESCRIPTION. The default is 8. Number of starts (initial guess and a
+        latin hypercube sample), not used if seeds are given.
+    seeds : TYPE, np.array.
+        DESCRIPTION. The default is None. Vols of the starts (number of
+        starts, number of vols).
+    maxWorkers : TYPE, int.
+        DESCRIPTION. The default is None (number of cores). Size of the
+        process pool.
+    executor : TYPE, concurrent.futures.Executor.
+        DESCRIPTION. The default is None. Executor to be used instead of a
+        new process pool (it is not shut down).
+    randomSeed : TYPE, int.
+        DESCRIPTION. The default is None. Seed of the latin hypercube sample.
+    roundIterations : TYPE, int.
+        DESCRIPTION. The default is 20. Iterations of a start between two
+        comparisons with the other starts (every round starts with a new
+        jacobian).
+    cancelFactor : TYPE, float.
+        DESCRIPTION. The default is 10. Starts with an MSE above cancelFactor
+        times the best MSE are cancelled after a round.
+    maxIterations : TYPE, int.
+        DESCRIPTION. The default is 10000. Iterations per start.
+    tol : TYPE, float.
+        DESCRIPTION. The default is 1e-08. MSE tolerance of LevenberquOptimizer.
+    **optimizerArguments :
+        DESCRIPTION. Further arguments of LevenberquOptimizer (learningRate is
+        the initial damping of every start).
+
+    Returns
+    -------
+    TYPE tuple.
+        DESCRIPTION. Best volastructure, its MSE and a list of statistics
+        per start: 'initialGuess', the final 'volastructure', 'MSE',
+        'iterations', 'rounds', 'functionEvaluations', 'converged',
+        'reason' (of the last round or 'cancelled') and 'time' (seconds in
+        the optimizer).
+
+    '''
+    initialGuess = np.array(initialGuess, dtype = float)
+    if seeds is None:
+        seeds = getLatinHypercubeStarts(initialGuess, bounds, numberOfStarts, randomSeed)
+    seeds = np.atleast_2d(np.asarray(seeds, dtype = float))
+
+    learningRate = optimizerArguments.pop('learningRate', 0.1)
+    statistics = []
+    for seed in seeds:
+        volastructure = initialGuess.copy()
+        volastructure[::,1] = seed
+        statistics.append({'initialGuess' : volastructure, 'volastructure' : volastructure, 'MSE' : np.inf,
+                           'iterations' : 0, 'rounds' : 0, 'functionEvaluations' : 0, 'converged' : False,
+                           'reason' : 'maxIterations', 'time' : 0., 'damping' : learningRate})
+
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = ProcessPoolExecutor(max_workers = maxWorkers)
+
+    def submit(index):
+        start = statistics[index]
+        iterations = min(roundIterations, maxIterations - start['iterations'])
+        return executor.submit(runCalibrationRound, function, marketPrices, start['volastructure'], bounds,
+                               start['damping'], iterations, tol, optimizerArguments)
+
+    try:
+        running = {submit(index) : index for index in range(len(statistics))}
+        bestMSE = np.inf
+        while running:
+            done, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                start = statistics[index]
+                volastructure, MSE, iteration, diagnostics, seconds = future.result()
+                start.update(volastructure = volastructure, MSE = MSE, converged = diagnostics['converged'],
+                             reason = diagnostics['reason'], damping = diagnostics['damping'])
+                start['iterations'] += iteration
+                start['rounds'] += 1
+                start['functionEvaluations'] += diagnostics['functionEvaluations']
+                start['time'] += seconds
+                bestMSE = min(bestMSE, MSE)
+
+                isFinished = diagnostics['reason'] != 'maxIterations' or start['iterations'] >= maxIterations
+                if not isFinished and MSE <= cancelFactor*bestMSE:
+                    running[submit(index)] = index
+                elif not isFinished:
+                    start['reason'] = 'cancelled'
+
+            # a start reached the tolerance, the other ones can not improve on it
+            if bestMSE <= tol:
+                for future, index in running.items():
+                    future.cancel()
+                    statistics[index]['reason'] = 'cancelled'
+                break
+    finally:
+        if ownExecutor:
+            executor.shutdown(cancel_futures = True)
+
+    for start in statistics:
+        start.pop('damping')
+    best = min(statistics, key = lambda start: start['MSE'])
+
+    return best['volastructure'], best['MSE'], statistics
+
+
+def runCalibrationRound(function, marketPrices, volastructure, bounds, damping, iterations, tol, optimizerArguments):
+    # one round of a start, runs in the worker process
+    startTime = time.perf_counter()
+    volastructure, MSE, iteration, diagnostics = LevenberquOptimizer(function, marketPrices, volastructure, bounds,
+        learningRate = damping, tol = tol, maxIterations = iterations, returnDiagnostics = True, **optimizerArguments)
+
+    return volastructure, MSE, iteration, diagnostics, time.perf_counter() - startTime
+
+
+def getLatinHypercubeStarts(initialGuess, bounds, numberOfStarts, randomSeed = None):
+    '''
+    Vols of the starts: the initial guess and a latin hypercube sample of the
+    bounds. Infinite bounds are replaced by the vol of the initial guess
+    -+ its absolute value (i.e. [0, 2 vol] for non negative vols).
+
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. (numberOfStarts, number of vols).
+
+    '''
+    sigma = np.asarray(initialGuess, dtype = float)[::,1]
+    lowerBound, upperBound = getBounds(bounds, sigma.shape[0])
+    lowerBound = np.where(np.isfinite(lowerBound), lowerBound, sigma - np.abs(sigma))
+    upperBound = np.where(np.isfinite(upperBound), upperBound, sigma + np.abs(sigma))
+
+    # one point per stratum and vol, strata in random order for every vol
+    generator = np.random.default_rng(randomSeed)
+    numberOfSamples = numberOfStarts - 1
+    strata = np.argsort(generator.random((numberOfSamples, sigma.shape[0])), axis = 0)
+    samples = (strata + generator.random((numberOfSamples, sigma.shape[0])))/max(numberOfSamples, 1)
+
+    return np.vstack((np.clip(sigma, lowerBound, upperBound), lowerBound + samples*(upperBound - lowerBound)))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Standard normal distribution functions for the pricing formulas.
+The scalar functions only use the math module (erfc), the array functions
+are numpy/scipy ufuncs. Both avoid the argument checking of the
+scipy.stats distribution objects, which is much more expensive than the
+formulas themselves. scipy.special is only imported on the first call of
+an array function, importing it takes a few hundred milliseconds.
+@author: Marcel Pommer
+"""
+
+import math
+import numpy as np
+
+
+INVERSESQRTTWO = 1.0 / math.sqrt(2.0)
+INVERSESQRTTWOPI = 1.0 / math.sqrt(2.0 * math.pi)
+
+specialFunctions = {}
+
+
+def normalCdf(x):
+    '''
+    Cumulative distribution function of the standard normal distribution
+    for a float. Uses erfc, which is accurate in both tails.
+
+    Parameters
+    ----------
+    x : TYPE float.
+        DESCRIPTION. Point of evaluation (+-infinity allowed).
+
+    Returns
+    -------
+    TYPE float.
+        DESCRIPTION. P(X <= x).
+
+    '''
+    return 0.5 * math.erfc(-x * INVERSESQRTTWO)
+
+
+def normalPdf(x):
+    '''
+    Density of the standard normal distribution for a float.
+
+    Parameters
+    ----------
+    x : TYPE float.
+        DESCRIPTION. Point of evaluation (+-infinity allowed).
+
+    Returns
+    -------
+    TYPE float.
+        DESCRIPTION. Density at x.
+
+    '''
+    return INVERSESQRTTWOPI * math.exp(-0.5 * x * x)
+
+
+def normalCdfArray(x):
+    '''
+    Cumulative distribution function of the standard normal distribution
+    for arrays (ufunc, erf/erfc based).
+
+    Parameters
+    ----------
+    x : TYPE float or np.array.
+        DESCRIPTION. Points of evaluation.
+
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. P(X <= x) elementwise.
+
+    '''
+    return getSpecialFunction('ndtr')(x)
+
+
+def normalPdfArray(x):
+    '''
+    Density of the standard normal distribution for arrays.
+
+    Parameters
+    ----------
+    x : TYPE float or np.array.
+        DESCRIPTION. Points of evaluation.
+
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. Density elementwise.
+
+    '''
+    x = np.asarray(x, dtype = float)
+
+    return INVERSESQRTTWOPI * np.exp(-0.5 * x * x)
+
+
+def getSpecialFunction(name):
+    '''
+    Function of scipy.special, the module is imported on first use.
+
+    Parameters
+    ----------
+    name : TYPE str.
+        DESCRIPTION. Name of the ufunc, e.g. 'ndtr' or 'ndtri'.
+
+    Returns
+    -------
+    TYPE np.ufunc.
+        DESCRIPTION. The function.
+
+    '''
+    function = specialFunctions.get(name)
+    if function is None:
+        import scipy.special
+        function = specialFunctions[name] = getattr(scipy.special, name)
+
+    return function
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming pricer for quote files of caplets and swaptions. The file is read
+in chunks of a fixed number of rows (readQuoteChunks is a generator), every
+chunk is priced with one call of the formulas in
+"vectorizedanalyticformulas" per instrument and model, and the prices are
+appended to the output file chunk by chunk. The memory is bounded by the
+chunk size, not by the size of the file.
+
+Csv files are plain comma separated values with a header row: fields are
+not quoted (the numbers and names of the quotes contain no commas), quoted
+files are rejected with a ValueError. Columns of the quote file (csv or
+parquet), empty fields of the optional columns take the defaults
+    instrument      'caplet' or 'swaption' (default caplet)
+    model           'black' or 'bachelier' (default black)
+    forward, strike, volatility, maturity (required)
+    periodLength    default 1
+    discountFactor  default 1, flat discount factor of the swaption periods
+    optionEnd       end of the swaption, default maturity + periodLength
+    nominal         default 1
+
+The output has all columns of the input and the column 'price'. Chunks can
+be priced on a process pool, at most a few chunks per worker are in flight
+and the output keeps the order of the input:
+
+    python quotepricer.py quotes.csv prices.csv --chunkSize 100000 --maxWorkers 4
+
+Parquet files need pyarrow, which is only imported for them.
+@author: Marcel Pommer
+"""
+
+import os
+import sys
+import argparse
+import itertools
+import collections
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+
+
+TEXTCOLUMNS = ('instrument', 'model')
+REQUIREDCOLUMNS = ('forward', 'strike', 'volatility', 'maturity')
+
+
+def readQuoteChunks(path, chunkSize = 100000):
+    '''
+    Parameters
+    ----------
+    path : TYPE str.
+        DESCRIPTION. Quote file, parquet if it ends with .parquet, csv else.
+    chunkSize : TYPE, int.
+        DESCRIPTION. The default is 100000. Rows per chunk.
+
+    Yields
+    ------
+    TYPE dict.
+        DESCRIPTION. {column : np.array} of up to chunkSize quotes, float
+        arrays except for instrument and model.
+
+    '''
+    for quotes, lines in readQuoteLines(path, chunkSize):
+        yield quotes
+
+
+def readQuoteColumns(path):
+    # names of the columns of a quote file, also of files without quotes
+    if path.endswith('.parquet'):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetFile(path).schema_arrow.names
+
+    with open(path) as file:
+        header = file.readline()
+    checkUnquoted(header, path)
+
+    return header.strip().split(',')
+
+
+def checkUnquoted(text, path):
+    # the fields are split at every comma (np.loadtxt), quoted fields would be misread
+    if '"' in text:
+        raise ValueError("{} has quoted fields, only unquoted comma separated values are supported".format(path))
+
+
+def readQuoteLines(path, chunkSize):
+    # generator of (quotes, lines) of the chunks, the text lines of csv files are kept to
+    # be copied to the output (the lines are None for parquet files)
+    if path.endswith('.parquet'):
+        for quotes in readParquetChunks(path, chunkSize):
+            yield quotes, None
+        return
+
+    columns = readQuoteColumns(path)
+    with open(path) as file:
+        file.readline()
+        textColumns = [index for index, column in enumerate(columns) if column in TEXTCOLUMNS]
+        numericColumns = [index for index, column in enumerate(columns) if column not in TEXTCOLUMNS]
+        while True:
+            lines = [line for line in itertools.islice(file, chunkSize) if line.strip()]
+            if not lines:
+                return
+            checkUnquoted(''.join(lines), path)
+            # the c parser of loadtxt, the csv module and float conversions of strings are much slower
+            quotes = {}
+            if numericColumns:
+                try:
+                    values = np.loadtxt(lines, delimiter = ',', usecols = numericColumns, ndmin = 2)
+                except ValueError:
+                    # empty fields are nan, the converter is only used for chunks which need it
+                    values = np.loadtxt(lines, delimiter = ',', usecols = numericColumns, ndmin = 2,
+                                        converters = lambda value: float(value) if value.strip() else np.nan)
+                quotes.update((columns[index], values[:, i]) for i, index in enumerate(numericColumns))
+            if textColumns:
+                values = np.loadtxt(lines, delimiter = ',', usecols = textColumns, dtype = str, ndmin = 2)
+                quotes.update((columns[index], values[:, i]) for i, index in enumerate(textColumns))
+            yield {column : quotes[column] for column in columns}, lines
+
+
+def readParquetChunks(path, chunkSize):
+    # optional dependency, only needed for parquet files
+    import pyarrow.parquet
+
+    # null cells are empty fields ('' and nan) as in csv files
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size = chunkSize):
+        yield {column : np.array(['' if value is None else value for value in batch.column(column).to_pylist()],
+                                 dtype = str) if column in TEXTCOLUMNS
+               else batch.column(column).to_numpy(zero_copy_only = False).astype(float)
+               for column in batch.schema.names}
+
+
+def priceQuotes(quotes):
+    '''
+    Parameters
+    ----------
+    quotes : TYPE dict.
+        DESCRIPTION. Chunk of readQuoteChunks.
+
+    Returns
+    -------
+    TYPE np.array.
+        DESCRIPTION. Prices of the quotes.
+
+    '''
+    missingColumns = [column for column in REQUIREDCOLUMNS if column not in quotes]
+    if missingColumns:
+        raise ValueError("the quotes have no column {}".format(', '.join(missingColumns)))
+
+    forward, strike, volatility, maturity = (quotes[name] for name in REQUIREDCOLUMNS)
+    if np.any(np.isnan(forward) | np.isnan(strike) | np.isnan(volatility) | np.isnan(maturity)):
+        raise ValueError("the columns {} can not be empty".format(', '.join(REQUIREDCOLUMNS)))
+
+    # defaults of missing columns and of empty fields (nan, '')
+    formulas = vectorizedanalyticformulas()
+    numberOfQuotes = forward.shape[0]
+    def column(name, default):
+        if name not in quotes:
+            return np.full(numberOfQuotes, default)
+        isEmpty = quotes[name] == '' if quotes[name].dtype.kind == 'U' else np.isnan(quotes[name])
+        return np.where(isEmpty, default, quotes[name])
+    instrument, model = column('instrument', 'caplet'), column('model', 'black')
+    periodLength, discountFactor, nominal = column('periodLength', 1.), column('discountFactor', 1.), \
+        column('nominal', 1.)
+    optionEnd = column('optionEnd', np.nan)
+    optionEnd = np.where(np.isnan(optionEnd), maturity + periodLength, optionEnd)
+
+    unknown = ~np.isin(instrument, ('caplet', 'swaption')) | ~np.isin(model, ('black', 'bachelier'))
+    if np.any(unknown):
+        index = np.flatnonzero(unknown)[0]
+        raise ValueError("unknown instrument {} or model {}".format(instrument[index], model[index]))
+
+    # one call of the formulas per instrument and model, swaptions are options on the swap
+    # rate discounted with the annuity
+    prices = np.empty(numberOfQuotes)
+    isSwaption = instrument == 'swaption'
+    swapAnnuity = np.where(isSwaption, formulas._swapAnnuity(maturity, periodLength, discountFactor,
+                                                             optionEnd)[0], periodLength*discountFactor)
+    for formula, isModel in ((formulas.blackScholesCallGeneralForm, model == 'black'),
+                             (formulas.bachelierCall, model == 'bachelier')):
+        if np.any(isModel):
+            prices[isModel] = formula(forward[isModel], strike[isModel], volatility[isModel], maturity[isModel],
+                                      1, swapAnnuity[isModel], nominal[isModel])
+
+    return prices
+
+
+def priceQuoteFile(inputPath, outputPath, chunkSize = 100000, maxWorkers = 1, executor = None,
+                   chunksPerWorker = 2):
+    '''
+    Parameters
+    ----------
+    inputPath : TYPE str.
+        DESCRIPTION. Quote file, see readQuoteChunks.
+    outputPath : TYPE str.
+        DESCRIPTION. Csv file of the quotes and their prices.
+    chunkSize : TYPE, int.
+        DESCRIPTION. The default is 100000. Rows per chunk.
+    maxWorkers : TYPE, int.
+        DESCRIPTION. The default is 1 (chunks in this process). Size of a
+        process pool for the chunks.
+    executor : TYPE, concurrent.futures.Executor.
+        DESCRIPTION. The default is None. Executor for the chunks (it is
+        not shut down).
+    chunksPerWorker : TYPE, int.
+        DESCRIPTION. The default is 2. Chunks in flight per worker of the
+        pool (maxWorkers or the size of the executor), bounds the memory.
+
+    Returns
+    -------
+    TYPE int.
+        DESCRIPTION. Number of priced quotes.
+
+    '''
+    chunks = readQuoteLines(inputPath, chunkSize)
+    numberOfQuotes = 0
+
+    ownExecutor = executor is None and maxWorkers != 1
+    if ownExecutor:
+        executor = ProcessPoolExecutor(max_workers = maxWorkers)
+    # the pools of concurrent.futures know their size, one worker per core for maxWorkers None
+    numberOfWorkers = getattr(executor, '_max_workers', None) or maxWorkers or os.cpu_count() or 1
+    try:
+        with open(outputPath, 'w') as file:
+            file.write(','.join(readQuoteColumns(inputPath) + ['price']) + '\n')
+            for quotes, lines, prices in priceChunks(chunks, executor, chunksPerWorker*numberOfWorkers):
+                # the lines of csv files are copied, repr of the floats round trips
+                if lines is None:
+                    lines = map(','.join, zip(*[value.tolist() if value.dtype.kind == 'U'
+                                                else map(repr, value.tolist()) for value in quotes.values()]))
+                else:
+                    lines = (line.rstrip('\r\n') for line in lines)
+                prices = prices.tolist()
+                file.write(''.join([line + ',' + repr(price) + '\n' for line, price in zip(lines, prices)]))
+                numberOfQuotes += len(prices)
+    finally:
+        if ownExecutor:
+            executor.shutdown(cancel_futures = True)
+
+    return numberOfQuotes
+
+
+def priceChunks(chunks, executor = None, maxChunksInFlight = 2):
+    # generator of (quotes, lines, prices) in the order of the chunks, a pool gets at most
+    # maxChunksInFlight chunks ahead of the writer (the lines stay in this process)
+    if executor is None:
+        for quotes, lines in chunks:
+            yield quotes, lines, priceQuotes(quotes)
+        return
+
+    futures = collections.deque()
+    for quotes, lines in chunks:
+        futures.append((quotes, lines, executor.submit(priceQuotes, quotes)))
+        if len(futures) >= maxChunksInFlight:
+            quotes, lines, future = futures.popleft()
+            yield quotes, lines, future.result()
+    while futures:
+        quotes, lines, future = futures.popleft()
+        yield quotes, lines, future.result()
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Prices a file of caplet and swaption quotes.')
+    parser.add_argument('inputPath', help = 'quote file (csv or parquet)')
+    parser.add_argument('outputPath', help = 'csv file of the prices')
+    parser.add_argument('--chunkSize', type = int, default = 100000, help = 'rows per chunk')
+    parser.add_argument('--maxWorkers', type = int, default = 1, help = 'size of the process pool')
+    arguments = parser.parse_args(arguments)
+
+    priceQuoteFile(arguments.inputPath, arguments.outputPath, arguments.chunkSize, arguments.maxWorkers)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
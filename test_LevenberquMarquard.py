@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from LevenberquMarquard import LevenberquOptimizer, getGradientFiniteDifference
+
+
+volastructure = np.array([[1.0, 0.2],
+                          [2.0, 0.3],
+                          [3.0, 0.25]])
+
+
+def prices(x):
+    # works for one volastructure and for stacks of them
+    sigma = x[..., 1]
+    return np.stack([sigma[..., 0]**2 - sigma[..., 1]**2, sigma[..., 1]**2, sigma[..., 2]**2,
+                     sigma[..., 0]*sigma[..., 2]], axis=-1)
+
+
+def jacobian(x):
+    sigma = x[:, 1]
+    return np.array([[2*sigma[0], -2*sigma[1], 0],
+                     [0, 2*sigma[1], 0],
+                     [0, 0, 2*sigma[2]],
+                     [sigma[2], 0, sigma[0]]])
+
+
+@pytest.mark.parametrize('method, tolerance', [('forward', 1e-4), ('backward', 1e-4), ('central', 1e-9)])
+def test_finiteDifferenceJacobian(method, tolerance):
+    numericJacobian = getGradientFiniteDifference(prices, volastructure, 1e-5, method)
+
+    assert numericJacobian.shape == (4, 3)
+    assert np.allclose(numericJacobian, jacobian(volastructure), atol=tolerance)
+
+
+def test_bumpsAreEvaluatedInOneCall():
+    calls = []
+    def vectorizedPrices(x):
+        calls.append(x.shape)
+        return prices(x)
+
+    numericJacobian = getGradientFiniteDifference(vectorizedPrices, volastructure, np.array([1e-5, 2e-5, 1e-6]),
+                                                  'central', vectorized=True)
+    assert calls == [(6, 3, 2)]
+    assert np.allclose(numericJacobian, jacobian(volastructure), atol=1e-9)
+
+    # the one sided methods reuse a given function value
+    getGradientFiniteDifference(vectorizedPrices, volastructure, 1e-5, 'forward', True, prices(volastructure))
+    getGradientFiniteDifference(vectorizedPrices, volastructure, 1e-5, 'backward', True)
+    assert calls[1:] == [(3, 3, 2), (4, 3, 2)]
+
+
+def test_downwardBumpsKeepVolsNonNegative():
+    volastructureAtZero = volastructure.copy()
+    volastructureAtZero[0, 1] = 0.
+
+    numericJacobian = getGradientFiniteDifference(prices, volastructureAtZero, 1e-5, 'central')
+    assert np.allclose(numericJacobian, jacobian(volastructureAtZero), atol=1e-4)
+
+
+def test_optimizerWithJacobian():
+    marketPrices = prices(np.array([[1.0, 0.3], [2.0, 0.2], [3.0, 0.1]]))
+
+    for jacobianOption in [jacobian, None]:
+        solution, MSE, iteration = LevenberquOptimizer(prices, marketPrices, volastructure, [], tol=1e-20,
+                                                       jacobian=jacobianOption)
+        assert MSE < 1e-20
+        assert np.allclose(solution[:, 1], [0.3, 0.2, 0.1], atol=1e-9)
+
+
+def test_optimizerDiagnostics():
+    marketPrices = prices(np.array([[1.0, 0.3], [2.0, 0.2], [3.0, 0.1]]))
+
+    solution, MSE, iteration, diagnostics = LevenberquOptimizer(prices, marketPrices, volastructure, [], tol=1e-20,
+                                                                jacobian=jacobian, returnDiagnostics=True)
+    assert diagnostics['converged'] and diagnostics['reason'] == 'tol'
+    assert diagnostics['acceptedSteps'] + diagnostics['rejectedSteps'] == iteration
+    assert diagnostics['jacobianEvaluations'] == diagnostics['acceptedSteps']
+    assert diagnostics['history'][-1] == MSE and np.all(np.diff(diagnostics['history']) < 0)
+
+
+def test_optimizerWithoutInfluenceOfAVol():
+    # the third vol does not change any price, the normal matrix is singular
+    def pricesWithoutThirdVol(x):
+        return prices(x)[:2]
+
+    marketPrices = pricesWithoutThirdVol(np.array([[1.0, 0.3], [2.0, 0.2], [3.0, 0.1]]))
+    solution, MSE, iteration, diagnostics = LevenberquOptimizer(pricesWithoutThirdVol, marketPrices, volastructure, [],
+                                                                tol=1e-20, returnDiagnostics=True)
+    assert diagnostics['converged']
+    assert np.allclose(solution[:, 1], [0.3, 0.2, 0.25], atol=1e-9)
+
+
+def test_boundedJacobianStaysInsideTheBox():
+    bounds = [(0.2, 0.5), (0.1, 0.3), (0.25, 0.25)]
+    def pricesInsideBounds(x):
+        assert np.all(x[..., 1] >= [0.2, 0.1, 0.25]) and np.all(x[..., 1] <= [0.5, 0.3, 0.25])
+        return prices(x)
+
+    for method in ['forward', 'backward', 'central']:
+        numericJacobian = getGradientFiniteDifference(pricesInsideBounds, volastructure, 1e-5, method, True,
+                                                      bounds=bounds)
+        expectedJacobian = jacobian(volastructure)
+        expectedJacobian[:, 2] = 0
+        assert np.allclose(numericJacobian, expectedJacobian, atol=1e-4)
+
+
+@pytest.mark.parametrize('boundHandling', ['projection', 'reject'])
+def test_boundedCalibration(boundHandling):
+    # the market vols are [0.3, 0.2, 0.1], the third one is outside of the box
+    marketPrices = prices(np.array([[1.0, 0.3], [2.0, 0.2], [3.0, 0.1]]))
+    bounds = (0.15, [0.5, 0.5, 0.5])
+    def pricesInsideBounds(x):
+        assert np.all(x[:, 1] >= 0.15) and np.all(x[:, 1] <= 0.5)
+        return prices(x)
+
+    solution, MSE, iteration, diagnostics = LevenberquOptimizer(pricesInsideBounds, marketPrices, volastructure, bounds,
+                                                                tol=1e-20, returnDiagnostics=True,
+                                                                boundHandling=boundHandling)
+    assert diagnostics['converged']
+    assert solution[2, 1] == pytest.approx(0.15, abs=1e-10)
+    assert np.all(solution[:, 1] >= 0.15)
+    if boundHandling == 'reject':
+        assert diagnostics['infeasibleSteps'] > 0
+
+
+def test_invalidBounds():
+    with pytest.raises(ValueError):
+        LevenberquOptimizer(prices, prices(volastructure), volastructure, (0.5, 0.1))
+    with pytest.raises(ValueError):
+        LevenberquOptimizer(prices, prices(volastructure), volastructure, [(0, 1)]*4)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the closed form Greeks with central finite differences of the
+batch formulas.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from analyticgreeks import analyticgreeks
+
+greeks = analyticgreeks()
+forwards = np.array([0.03, 0.02, 0.05])
+strikes = np.array([0.025, 0.03, 0.05])
+volatilities = np.array([0.2, 0.35, 0.15])
+maturities = np.array([1.5, 3.0, 0.7])
+
+
+def finiteDifferences(function, volatility):
+    # first and second order differences of the price in forward, volatility and maturity
+    def price(dForward=0., dVolatility=0., dMaturity=0.):
+        return function(forwards + dForward, strikes, volatility + dVolatility,
+                        maturities + dMaturity, 0.5, 0.93, 100)['price']
+
+    hForward, hVolatility = 1e-6, 1e-4 * volatility
+    return {'delta' : (price(hForward) - price(-hForward)) / (2 * hForward),
+            'gamma' : (price(100*hForward) - 2*price() + price(-100*hForward)) / (100*hForward)**2,
+            'vega' : (price(dVolatility=hVolatility) - price(dVolatility=-hVolatility)) / (2*hVolatility),
+            'volga' : (price(dVolatility=10*hVolatility) - 2*price() + price(dVolatility=-10*hVolatility)) \
+                / (10*hVolatility)**2,
+            'vanna' : (price(10*hForward, hVolatility) - price(10*hForward, -hVolatility) \
+                - price(-10*hForward, hVolatility) + price(-10*hForward, -hVolatility)) \
+                / (40*hForward*hVolatility),
+            'theta' : -(price(dMaturity=1e-6) - price(dMaturity=-1e-6)) / 2e-6}
+
+
+def test_greeksAgainstFiniteDifferences():
+    for function, volatility in [(greeks.blackScholesCallGreeks, volatilities),
+                                 (greeks.blackScholesDigitalCapletGreeks, volatilities),
+                                 (greeks.bachelierCallGreeks, 0.03 * volatilities)]:
+        result = function(forwards, strikes, volatility, maturities, 0.5, 0.93, 100)
+        for name, value in finiteDifferences(function, volatility).items():
+            assert np.allclose(result[name], value, rtol=1e-3, atol=1e-5), name
+
+
+def test_swaptionRho():
+    paymentTimes = 1 + 0.5 * np.arange(1, 5)
+    discountFactors = np.exp(-0.03 * paymentTimes)
+
+    def price(shift):
+        return greeks.BlackScholesSwaption(forwards, strikes, volatilities, 1., 0.5,
+                                           discountFactors * np.exp(-shift * paymentTimes), 3.)
+
+    result = greeks.blackScholesSwaptionGreeks(forwards, strikes, volatilities, 1., 0.5,
+                                               discountFactors, 3.)
+    assert np.allclose(result['rho'], (price(1e-6) - price(-1e-6)) / 2e-6, rtol=1e-6)
+
+
+def test_deadOptions():
+    result = greeks.blackScholesCallGreeks(forwards, strikes, volatilities, 0.)
+    assert np.allclose(result['price'], np.maximum(forwards - strikes, 0))
+    assert np.all(np.isfinite(np.array(list(result.values()))))
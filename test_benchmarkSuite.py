@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Quick run of the benchmark suite, the benchmarks themselves are run with
+python benchmarkSuite.py.
+@author: Marcel Pommer
+"""
+
+import json
+from benchmarkSuite import main, compareWithBaseline
+
+
+def test_quickRunStoresAndComparesBaseline(tmp_path, capsys):
+    baseline = str(tmp_path/'baseline.json')
+    assert main(['--quick', '--save', '--baseline', baseline]) == 0
+    with open(baseline) as file:
+        results = json.load(file)
+
+    assert 'tree build steps=12 years=5' in results and 'LevenberquOptimizer parameters=10' in results
+    assert all(result['seconds'] > 0 and result['peakMemory'] > 0 for result in results.values())
+    assert main(['--quick', '--baseline', baseline, '--tolerance', '1e6']) == 0
+    assert 'black quotes=1e+03' in capsys.readouterr().out
+
+
+def test_regressionsAreReported():
+    baseline = {'fast' : {'seconds' : 1.0}, 'slow' : {'seconds' : 1.0}}
+    results = {'fast' : {'seconds' : 1.2}, 'slow' : {'seconds' : 2.0}, 'new' : {'seconds' : 5.0}}
+
+    assert compareWithBaseline(results, baseline, tolerance=1.5) == [('slow', 2.0, 1.0)]
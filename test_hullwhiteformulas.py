@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from hullwhiteformulas import hullwhiteformulas
+from TrinomialTree import treeConstruction, calculatePortfolioPrices
+
+formulas = hullwhiteformulas()
+
+strikes = np.array([0.85, 0.9, 0.95, 1.0])
+maturities = np.array([0.5, 1.0, 2.0, 3.0])
+
+
+def discountFactor(time):
+    return np.exp(-0.04*np.asarray(time))
+
+
+def test_zeroBondPrice():
+    # at t = 0 with r(0) = f(0, 0) the bond price of the curve is reproduced
+    assert np.isclose(formulas.zeroBondPrice(0.04, 0.04, 1., discountFactor(3.), 0., 3., 0.01, 0.1), discountFactor(3.),
+                      rtol=1e-15)
+    # higher short rates give lower prices, Ho-Lee is the limit of small mean reversion
+    prices = formulas.zeroBondPrice(np.array([0.02, 0.04, 0.06]), 0.04, discountFactor(1.), discountFactor(4.), 1., 4.)
+    assert np.all(np.diff(prices) < 0)
+    assert np.allclose(prices, formulas.zeroBondPrice(np.array([0.02, 0.04, 0.06]), 0.04, discountFactor(1.),
+                                                      discountFactor(4.), 1., 4., a=1e-9), rtol=1e-8)
+
+
+def test_putCallParityAndVectorization():
+    calls = formulas.zeroBondOption(discountFactor(maturities), discountFactor(maturities[:, None] + 2), strikes,
+                                    0.01, maturities, maturities[:, None] + 2, 0.05)
+    puts = formulas.zeroBondOption(discountFactor(maturities), discountFactor(maturities[:, None] + 2), strikes,
+                                   0.01, maturities, maturities[:, None] + 2, 0.05, isCall=False)
+
+    assert calls.shape == (4, 4)
+    assert np.allclose(calls - puts, discountFactor(maturities[:, None] + 2) - strikes*discountFactor(maturities),
+                       atol=1e-15)
+    # expired options keep the intrinsic value
+    assert formulas.zeroBondOption(1., 0.9, 0.8, 0.01, 0., 1.) == 0.9 - 0.8
+
+
+def test_capletIsCouponBondOption():
+    caplets = formulas.caplet(discountFactor(maturities), discountFactor(maturities + 0.5), 0.04, 0.01, maturities, 0.5,
+                              0.1)
+    couponBondPuts = formulas.couponBondOption(discountFactor(maturities), discountFactor(maturities + 0.5)[:, None],
+                                               1.02, (maturities + 0.5)[:, None], 1., 0.01, maturities, 0.1,
+                                               isCall=False)
+
+    assert np.all(caplets > 0)
+    assert np.allclose(caplets, couponBondPuts, rtol=1e-12)
+
+
+def test_jamshidianMatchesIntegration():
+    # under the T forward measure y = r(T) - f(0, T) is normal with mean 0
+    a, volatility, optionMaturity = 0.1, 0.015, 1.
+    paymentDates = np.array([2., 3., 4., 5.])
+    cashflows = np.array([0.05, 0.05, 0.05, 1.05])
+    B = formulas._B(a, paymentDates - optionMaturity)
+    variance = formulas._shortRateVariance(volatility, a, optionMaturity)
+
+    y = np.linspace(-10, 10, 200001)*np.sqrt(variance)
+    bondValues = (cashflows*discountFactor(paymentDates)/discountFactor(optionMaturity)
+                  *np.exp(-B*y[:, None] - 0.5*variance*B**2)).sum(axis=1)
+    density = np.exp(-0.5*y**2/variance)/np.sqrt(2*np.pi*variance)
+
+    prices = formulas.couponBondOption(discountFactor(optionMaturity), discountFactor(paymentDates), cashflows,
+                                       paymentDates, strikes[:, None]*1.05, volatility, optionMaturity, a,
+                                       isCall=np.array([True, False]))
+    assert prices.shape == (4, 2)
+    for index, strike in enumerate(strikes*1.05):
+        for column, sign in enumerate([1, -1]):
+            integral = np.trapezoid(np.maximum(sign*(bondValues - strike), 0)*density, y)
+            assert abs(prices[index, column] - discountFactor(optionMaturity)*integral) < 1e-9
+
+
+def test_EuropeanOptionsMatchTree():
+    Zerocurve = np.array([[1., 0.03], [2., 0.04], [3., 0.04], [4., 0.05], [5., 0.06], [6., 0.07]])
+    cashflow = np.array([[2., 0.05], [3., 0.05], [4., 1.05]])
+    for a in [0, 0.1]:
+        tree = treeConstruction(Zerocurve, lastDate = 5, volatility = 0.01, StepsPerYear=72, a = a)
+        curveDiscountFactor = tree.Zerocurve.getDiscountFactor
+
+        treePrices = calculatePortfolioPrices(tree, [np.array([[4., 1.]]), cashflow, cashflow],
+                                              [np.array([[2., 0.9]]), np.array([[1., 1.]]), np.array([[1., 1.]])],
+                                              isPut = [False, False, True])
+        analyticPrices = [formulas.zeroBondOption(curveDiscountFactor(2.), curveDiscountFactor(4.), 0.9, 0.01, 2., 4., a),
+                          formulas.couponBondOption(curveDiscountFactor(1.), curveDiscountFactor(cashflow[:,0]),
+                                                    cashflow[:,1], cashflow[:,0], 1., 0.01, 1., a),
+                          formulas.couponBondOption(curveDiscountFactor(1.), curveDiscountFactor(cashflow[:,0]),
+                                                    cashflow[:,1], cashflow[:,0], 1., 0.01, 1., a, isCall = False)]
+        assert np.allclose(treePrices, analyticPrices, atol=2e-5)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Round trip tests for the implied volatility solvers.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+from impliedvolatility import impliedvolatility
+
+formulas = vectorizedanalyticformulas()
+solver = impliedvolatility()
+rng = np.random.default_rng(42)
+numberOfQuotes = 10000
+forwards = rng.uniform(0.005, 0.08, numberOfQuotes)
+strikes = forwards * np.exp(rng.normal(0, 0.5, numberOfQuotes))
+maturities = rng.uniform(0.1, 30, numberOfQuotes)
+
+
+def test_blackImpliedVolatility():
+    volatilities = rng.uniform(0.05, 1.0, numberOfQuotes)
+    prices = formulas.blackScholesCallGeneralForm(forwards, strikes, volatilities, maturities, 0.5, 0.9, 1e4)
+    result = solver.blackImpliedVolatility(prices, forwards, strikes, maturities, 0.5, 0.9, 1e4)
+
+    # the volatility is only determined where the price depends on it
+    isWellPosed = volatilities * np.sqrt(maturities) > 0.3 * np.abs(np.log(forwards / strikes))
+    assert np.allclose(result[isWellPosed], volatilities[isWellPosed], rtol=1e-12, atol=0)
+    repriced = formulas.blackScholesCallGeneralForm(forwards, strikes, result, maturities, 0.5, 0.9, 1e4)
+    assert np.allclose(repriced, prices, rtol=1e-9, atol=0)
+
+
+def test_bachelierImpliedVolatility():
+    volatilities = rng.uniform(0.001, 0.02, numberOfQuotes)
+    prices = formulas.bachelierCall(forwards, strikes, volatilities, maturities, 0.5, 0.9)
+    result = solver.bachelierImpliedVolatility(prices, forwards, strikes, maturities, 0.5, 0.9)
+
+    isWellPosed = volatilities * np.sqrt(maturities) > 0.3 * np.abs(forwards - strikes)
+    assert np.allclose(result[isWellPosed], volatilities[isWellPosed], rtol=1e-12, atol=0)
+    repriced = formulas.bachelierCall(forwards, strikes, result, maturities, 0.5, 0.9)
+    assert np.allclose(repriced, prices, rtol=1e-9, atol=0)
+
+
+def test_arbitrageBounds():
+    result = solver.blackImpliedVolatility(np.array([0.1, 0.5, 0.25]), 0.5, 0.25, 1.0)
+    assert np.isnan(result[0]) and np.isnan(result[1]) and result[2] == 0
+
+
+def test_pricesBelowIntrinsicByRounding():
+    # one ulp below the intrinsic value is volatility 0, clearly below is no price
+    intrinsic = 0.5 - 0.25
+    for implied in [solver.blackImpliedVolatility, solver.bachelierImpliedVolatility]:
+        result = implied(np.array([np.nextafter(intrinsic, 0), intrinsic - 1e-10]), 0.5, 0.25, 1.0)
+        assert result[0] == 0 and np.isnan(result[1])
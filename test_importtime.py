@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Cold import of the pricing modules in a fresh interpreter: no output, no
+scipy (it is loaded on first use), no change of sys.path and an import
+budget on top of numpy. The budget can be raised for slow or loaded
+machines with the environment variable IMPORTBUDGET (seconds).
+@author: Marcel Pommer
+"""
+
+import os
+import json
+import subprocess
+import sys
+
+# seconds for all pricing modules after numpy is imported
+IMPORTBUDGET = float(os.environ.get('IMPORTBUDGET', 0.25))
+
+root = os.path.dirname(os.path.abspath(__file__))
+treeDirectory = os.path.join(root, 'Trinomial model (Ho-Lee)')
+
+modules = ['normaldistribution', 'analyticformulas', 'vectorizedanalyticformulas', 'analyticgreeks',
+           'impliedvolatility', 'hullwhiteformulas', 'LevenberquMarquard', 'multistartcalibration',
+           'ZeroCurve', 'TrinomialTree', 'TreeCache', 'VolatilityCalibration', 'CurveRisk', 'MonteCarlo']
+
+script = '''
+import sys, time, json
+import numpy
+path = list(sys.path)
+startTime = time.perf_counter()
+{}
+seconds = time.perf_counter() - startTime
+print(json.dumps({{'seconds' : seconds, 'isPathChanged' : sys.path != path,
+                  'scipyModules' : [name for name in sys.modules if name.split('.')[0] == 'scipy']}}))
+'''.format('\n'.join('import ' + module for module in modules))
+
+
+def test_coldImport():
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([root, treeDirectory]))
+    result = subprocess.run([sys.executable, '-c', script], env=environment, capture_output=True, text=True,
+                            check=True)
+
+    # the only output is the measurement, i.e. no demo runs at import
+    assert len(result.stdout.splitlines()) == 1 and result.stderr == ''
+    measurement = json.loads(result.stdout)
+    assert measurement['scipyModules'] == []
+    assert not measurement['isPathChanged']
+    assert measurement['seconds'] < IMPORTBUDGET, 'cold import took {:.3f}s'.format(measurement['seconds'])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from multistartcalibration import multiStartCalibration, getLatinHypercubeStarts
+
+
+volastructure = np.array([[1.0, 0.5],
+                          [2.0, 0.5]])
+bounds = (-1, 1)
+
+
+def prices(x):
+    # two local minima in every vol, the global one at +-0.4
+    sigma = x[:, 1]
+    return np.concatenate((sigma**2 - 0.16, 0.3*(sigma + 0.4)))
+
+
+marketPrices = np.zeros(4)
+
+
+def test_latinHypercubeStarts():
+    starts = getLatinHypercubeStarts(volastructure, bounds, 11, randomSeed=1)
+
+    assert starts.shape == (11, 2)
+    assert np.all(starts[0] == 0.5)
+    # one sample in each tenth of the box for every vol
+    assert np.all(np.sort(np.floor((starts[1:] + 1)/0.2), axis=0) == np.arange(10)[:, None])
+
+    # non negative vols without upper bound are sampled in [0, 2 vol]
+    starts = getLatinHypercubeStarts(volastructure, [], 5, randomSeed=1)
+    assert np.all((starts >= 0) & (starts <= 1))
+
+
+def test_multiStartFindsTheGlobalMinimum():
+    with ThreadPoolExecutor(2) as executor:
+        solution, MSE, statistics = multiStartCalibration(prices, marketPrices, volastructure, bounds,
+                                                          numberOfStarts=8, randomSeed=0, executor=executor,
+                                                          roundIterations=5, tol=1e-20)
+
+    # the initial guess converges to the local minimum at +0.4
+    assert statistics[0]['MSE'] > 0.01
+    assert np.allclose(solution[:, 1], -0.4, atol=1e-8)
+    assert MSE == min(start['MSE'] for start in statistics)
+    assert len(statistics) == 8
+    # starts still queued when the tolerance is reached are cancelled before their first round
+    assert all(start['rounds'] >= 1 and start['functionEvaluations'] > 0 for start in statistics
+               if start['reason'] != 'cancelled')
+
+
+def test_laggingStartsAreCancelled():
+    seeds = np.array([[-0.5, -0.5], [0.5, 0.5]])
+    with ThreadPoolExecutor(1) as executor:
+        solution, MSE, statistics = multiStartCalibration(prices, marketPrices, volastructure, bounds, seeds=seeds,
+                                                          executor=executor, roundIterations=1, tol=1e-30,
+                                                          cancelFactor=2.)
+    assert statistics[1]['reason'] == 'cancelled'
+    assert statistics[1]['iterations'] < statistics[0]['iterations']
+    assert np.allclose(solution[:, 1], -0.4, atol=1e-8)
+
+
+def test_processPool():
+    solution, MSE, statistics = multiStartCalibration(prices, marketPrices, volastructure, bounds, numberOfStarts=4,
+                                                      randomSeed=0, maxWorkers=2, tol=1e-20)
+    assert np.allclose(solution[:, 1], -0.4, atol=1e-8)
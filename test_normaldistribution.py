@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the normal distribution functions with scipy.stats.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import scipy.stats as st
+from normaldistribution import normalCdf, normalPdf, normalCdfArray, normalPdfArray
+
+points = np.array([-np.inf, -38.5, -8.0, -1.0, 0.0, 0.3, 2.5, 9.0, np.inf])
+
+
+def test_normalDistribution():
+    assert np.allclose([normalCdf(x) for x in points], st.norm.cdf(points), rtol=1e-13, atol=0)
+    assert np.allclose([normalPdf(x) for x in points], st.norm.pdf(points), rtol=1e-13, atol=0)
+    assert np.allclose(normalCdfArray(points), st.norm.cdf(points), rtol=1e-13, atol=0)
+    assert np.allclose(normalPdfArray(points), st.norm.pdf(points), rtol=1e-13, atol=0)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the streaming quote pricer with the scalar formulas in "analyticformulas".
+@author: Marcel Pommer
+"""
+
+import csv
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from analyticformulas import analyticformulas
+from quotepricer import readQuoteChunks, priceQuotes, priceQuoteFile
+
+scalar = analyticformulas()
+
+
+def writeQuotes(path, numberOfQuotes = 23):
+    generator = np.random.default_rng(1)
+    with open(path, 'w', newline = '') as file:
+        writer = csv.writer(file)
+        writer.writerow(['instrument', 'model', 'forward', 'strike', 'volatility', 'maturity', 'periodLength',
+                         'discountFactor', 'optionEnd', 'nominal'])
+        for index in range(numberOfQuotes):
+            maturity = float(generator.integers(1, 10))
+            isSwaption = index % 3 == 0
+            writer.writerow(['swaption' if isSwaption else 'caplet', 'bachelier' if index % 2 else 'black',
+                             generator.uniform(0.01, 0.05), generator.uniform(0.01, 0.05),
+                             generator.uniform(0.1, 0.4) if index % 2 == 0 else 0.01, maturity, 0.5,
+                             generator.uniform(0.7, 1), maturity + 5 if isSwaption else maturity + 0.5, 100])
+
+
+def getScalarPrice(row):
+    instrument, model = row[:2]
+    forward, strike, volatility, maturity, periodLength, discountFactor, optionEnd, nominal = map(float, row[2:10])
+    if instrument == 'caplet' and model == 'black':
+        return scalar.blackScholesCallGeneralForm(forward, strike, volatility, maturity, periodLength,
+                                                  discountFactor, nominal)
+    if instrument == 'caplet':
+        return scalar.bachelierCall(forward, strike, volatility, maturity, periodLength, discountFactor, nominal)
+    if model == 'black':
+        return scalar.BlackScholesSwaption(forward, strike, volatility, maturity, periodLength, discountFactor,
+                                           optionEnd, nominal)
+    swapAnnuity = periodLength*round((optionEnd - maturity)/periodLength)*discountFactor
+    return scalar.bachelierCall(forward, strike, volatility, maturity, 1, swapAnnuity, nominal)
+
+
+@pytest.mark.parametrize('useExecutor', [False, True])
+def test_priceQuoteFile(tmp_path, useExecutor):
+    inputPath, outputPath = str(tmp_path/'quotes.csv'), str(tmp_path/'prices.csv')
+    writeQuotes(inputPath)
+
+    assert [chunk['forward'].shape[0] for chunk in readQuoteChunks(inputPath, 5)] == [5, 5, 5, 5, 3]
+    if useExecutor:
+        with ThreadPoolExecutor(2) as executor:
+            numberOfQuotes = priceQuoteFile(inputPath, outputPath, 5, maxWorkers = 2, executor = executor)
+    else:
+        numberOfQuotes = priceQuoteFile(inputPath, outputPath, 5)
+    assert numberOfQuotes == 23
+
+    with open(inputPath, newline = '') as file:
+        inputRows = list(csv.reader(file))
+    with open(outputPath, newline = '') as file:
+        outputRows = list(csv.reader(file))
+    assert outputRows[0] == inputRows[0] + ['price']
+    # the rows keep their order and values
+    for inputRow, outputRow in zip(inputRows[1:], outputRows[1:]):
+        assert [float(value) for value in outputRow[2:-1]] == [float(value) for value in inputRow[2:]]
+        assert np.isclose(float(outputRow[-1]), getScalarPrice(inputRow), rtol=1e-12, atol=1e-14)
+
+
+def test_defaultsAndErrors():
+    quotes = {'forward' : np.array([0.03, 0.04]), 'strike' : np.array([0.03, 0.03]),
+              'volatility' : np.array([0.2, 0.2]), 'maturity' : np.array([1., 2.])}
+    expected = [scalar.blackScholesCallGeneralForm(forward, 0.03, 0.2, maturity)
+                for forward, maturity in [(0.03, 1.), (0.04, 2.)]]
+    assert np.allclose(priceQuotes(quotes), expected, rtol=1e-12)
+
+    with pytest.raises(ValueError):
+        priceQuotes({**quotes, 'model' : np.array(['black', 'sabr'])})
+    with pytest.raises(ValueError):
+        priceQuotes({'forward' : quotes['forward']})
+
+
+def test_emptyFieldsTakeTheDefaults(tmp_path):
+    inputPath, outputPath = str(tmp_path/'quotes.csv'), str(tmp_path/'prices.csv')
+    with open(inputPath, 'w') as file:
+        file.write('instrument,model,forward,strike,volatility,maturity,periodLength,discountFactor,optionEnd,nominal\n'
+                   'caplet,black,0.03,0.03,0.2,2,0.5,0.9,,\n'
+                   'swaption,black,0.03,0.03,0.2,2,0.5,0.9,5,100\n'
+                   ',bachelier,0.03,0.025,0.01,1,,,,\n')
+    assert priceQuoteFile(inputPath, outputPath) == 3
+
+    with open(outputPath, newline = '') as file:
+        prices = [float(row[-1]) for row in list(csv.reader(file))[1:]]
+    expected = [scalar.blackScholesCallGeneralForm(0.03, 0.03, 0.2, 2, 0.5, 0.9),
+                scalar.BlackScholesSwaption(0.03, 0.03, 0.2, 2, 0.5, 0.9, 5, 100),
+                scalar.bachelierCall(0.03, 0.025, 0.01, 1)]
+    assert np.allclose(prices, expected, rtol=1e-12)
+
+    with open(inputPath, 'w') as file:
+        file.write('forward,strike,volatility,maturity\n0.03,,0.2,1\n')
+    with pytest.raises(ValueError):
+        priceQuoteFile(inputPath, outputPath)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    # records the largest number of chunks submitted but not yet collected by the writer
+    def __init__(self, maxWorkers):
+        super().__init__(maxWorkers)
+        self.inFlight = 0
+        self.maxInFlight = 0
+
+    def submit(self, function, *args):
+        self.inFlight += 1
+        self.maxInFlight = max(self.maxInFlight, self.inFlight)
+        future = super().submit(function, *args)
+        result = future.result
+        def collect(*resultArgs):
+            self.inFlight -= 1
+            return result(*resultArgs)
+        future.result = collect
+        return future
+
+
+def test_chunksInFlightAndEmptyFiles(tmp_path):
+    inputPath, outputPath = str(tmp_path/'quotes.csv'), str(tmp_path/'prices.csv')
+    writeQuotes(inputPath, 40)
+
+    # the limit follows the size of the executor, not maxWorkers
+    with CountingExecutor(3) as executor:
+        assert priceQuoteFile(inputPath, outputPath, 2, executor = executor, chunksPerWorker = 1) == 40
+    assert executor.maxInFlight == 3
+
+    # files without quotes give the header
+    with open(inputPath, 'w') as file:
+        file.write('forward,strike,volatility,maturity\n')
+    assert priceQuoteFile(inputPath, outputPath) == 0
+    with open(outputPath) as file:
+        assert file.read() == 'forward,strike,volatility,maturity,price\n'
+
+
+def test_quotedFieldsAreRejected(tmp_path):
+    inputPath, outputPath = str(tmp_path/'quotes.csv'), str(tmp_path/'prices.csv')
+    for quotes in ['"instrument",forward,strike,volatility,maturity\ncaplet,0.03,0.03,0.2,1\n',
+                   'instrument,forward,strike,volatility,maturity\n"caplet",0.03,0.03,0.2,1\n']:
+        with open(inputPath, 'w') as file:
+            file.write(quotes)
+        with pytest.raises(ValueError, match='quoted'):
+            priceQuoteFile(inputPath, outputPath)
+
+
+def test_parquetNullsTakeTheDefaults(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    inputPath, outputPath = str(tmp_path/'quotes.parquet'), str(tmp_path/'prices.csv')
+    table = pyarrow.table({'instrument' : ['caplet', None, 'swaption'], 'model' : [None, 'bachelier', 'black'],
+                           'forward' : [0.03, 0.03, 0.03], 'strike' : [0.03, 0.025, 0.03],
+                           'volatility' : [0.2, 0.01, 0.2], 'maturity' : [2., 1., 2.],
+                           'periodLength' : [0.5, None, 0.5], 'discountFactor' : [0.9, None, 0.9],
+                           'optionEnd' : [None, None, 5.], 'nominal' : [None, None, 100.]})
+    pyarrow.parquet.write_table(table, inputPath, row_group_size = 2)
+    assert [chunk['forward'].shape[0] for chunk in readQuoteChunks(inputPath, 2)] == [2, 1]
+    assert priceQuoteFile(inputPath, outputPath, 2) == 3
+
+    with open(outputPath, newline = '') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == table.column_names + ['price']
+    expected = [scalar.blackScholesCallGeneralForm(0.03, 0.03, 0.2, 2, 0.5, 0.9),
+                scalar.bachelierCall(0.03, 0.025, 0.01, 1),
+                scalar.BlackScholesSwaption(0.03, 0.03, 0.2, 2, 0.5, 0.9, 5, 100)]
+    assert np.allclose([float(row[-1]) for row in rows[1:]], expected, rtol=1e-12)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the batch formulas with the scalar formulas in "analyticformulas".
+@author: Marcel Pommer
+"""
+
+import numpy as np
+import pytest
+from analyticformulas import analyticformulas
+from vectorizedanalyticformulas import vectorizedanalyticformulas
+
+scalar = analyticformulas()
+vectorized = vectorizedanalyticformulas()
+
+forwards = np.array([0.02, 0.03, 0.05, 0.03, 0.04])
+strikes = np.array([0.03, 0.03, 0.04, 0.025, 0.05])
+volatilities = np.array([0.2, 0.3, 0.25, 0.4, 0.1])
+maturities = np.array([1.0, 2.0, 0.0, 5.0, 0.5])
+
+
+def test_bachelierCall():
+    prices = vectorized.bachelierCall(forwards, strikes, 0.01, maturities, 0.5, 0.97, 100)
+    for index in range(forwards.shape[0]):
+        expected = scalar.bachelierCall(forwards[index], strikes[index], 0.01, maturities[index],
+                                        0.5, 0.97, 100)
+        assert np.isclose(prices[index], expected, rtol=1e-12, atol=1e-14)
+
+
+def test_blackScholesCallAndDigital():
+    prices = vectorized.blackScholesCallGeneralForm(forwards, strikes, volatilities, maturities, 0.5, 0.97)
+    digitals = vectorized.BlackScholesDigitalCaplet(forwards, strikes, volatilities, maturities, 0.5, 0.97)
+    for index in range(forwards.shape[0]):
+        expected = scalar.blackScholesCallGeneralForm(forwards[index], strikes[index],
+                                    volatilities[index], maturities[index], 0.5, 0.97)
+        assert np.isclose(prices[index], expected, rtol=1e-12, atol=1e-14)
+        expected = scalar.BlackScholesDigitalCaplet(forwards[index], strikes[index],
+                                    volatilities[index], maturities[index], 0.5, 0.97)
+        assert np.isclose(digitals[index], expected, rtol=1e-12, atol=1e-14)
+
+
+def test_putCallParity():
+    calls = vectorized.blackScholesCallGeneralForm(forwards, strikes, volatilities, maturities + 0.1)
+    puts = vectorized.BlackScholesPutGeneralForm(forward=forwards, volatility=volatilities,
+                                                 maturity=maturities + 0.1, strike=strikes)
+    assert np.allclose(calls - puts, forwards - strikes, atol=1e-14)
+
+    # the scalar put takes arrays as well
+    scalarPuts = scalar.BlackScholesPutGeneralForm(forward=forwards, volatility=volatilities,
+                                                   maturity=maturities + 0.1, strike=strikes)
+    assert scalarPuts.shape == forwards.shape
+    assert np.allclose(scalarPuts, puts, rtol=1e-12, atol=1e-14)
+    assert np.isclose(scalar.BlackScholesPutGeneralForm(forward=forwards[0], volatility=volatilities[0],
+                                                        maturity=1.1, strike=strikes[0]),
+                      vectorized.BlackScholesPutGeneralForm(forwards[0], 0, volatilities[0], 1, 1, 1.1, strikes[0]))
+
+
+def test_swaptionBroadcast():
+    discountFactors = np.array([0.95, 0.9, 0.85])
+    prices = vectorized.BlackScholesSwaption(forwards[:, None], strikes[None, :], 0.2, 1,
+                                             discountFactor=discountFactors, optionEnd=4)
+    assert prices.shape == (5, 5)
+    expected = scalar.BlackScholesSwaption(forwards[1], strikes[2], 0.2, 1,
+                                           discountFactor=discountFactors, optionEnd=4)
+    assert np.isclose(prices[1, 2], expected, rtol=1e-12)
+
+
+def test_swaptionCube():
+    discountCurve = lambda dates: np.exp(-0.03*dates - 0.002*dates**2)
+    optionMaturities = np.array([0.5, 1.0, 2.0])
+    tenors = np.array([1.0, 2.5, 5.0])
+    cube = vectorized.SwaptionCube(discountCurve, optionMaturities, tenors, strikes, 0.2, periodLength=0.5)
+    assert cube.shape == (3, 3, 5)
+
+    for i, optionMaturity in enumerate(optionMaturities):
+        for j, tenor in enumerate(tenors):
+            paymentDates = optionMaturity + 0.5*np.arange(1, int(tenor/0.5) + 1)
+            discountFactors = discountCurve(paymentDates)
+            swapRate = (discountCurve(optionMaturity) - discountFactors[-1])/(0.5*discountFactors.sum())
+            expected = scalar.BlackScholesSwaption(swapRate, strikes[3], 0.2, optionMaturity, 0.5,
+                                                   discountFactor=discountFactors, optionEnd=optionMaturity + tenor)
+            assert np.isclose(cube[i, j, 3], expected, rtol=1e-12)
+
+    # at the money normal cube
+    atm = vectorized.SwaptionCube(discountCurve, optionMaturities, tenors, [0.], 0.01, 0.5, 'bachelier',
+                                  relativeStrikes=True)
+    swapAnnuity, forward = vectorized.swapAnnuityCube(discountCurve, optionMaturities, tenors, 0.5)
+    assert np.allclose(atm[..., 0], swapAnnuity*0.01*np.sqrt(optionMaturities[:, None]/(2*np.pi)), rtol=1e-12)
+
+    with pytest.raises(ValueError):
+        vectorized.SwaptionCube(discountCurve, [0.3], tenors, strikes, periodLength=0.5)
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+Batch version of the formulas in "analyticformulas". Every argument can be
+a float or a numpy array, all arguments are broadcast against each other and
+the prices are returned as a numpy array. The special cases of the scalar
+formulas (at the money, zero maturity) are handled with masks, so whole
+books of caplets and swaptions can be priced in one call.
+@author: Marcel Pommer
+"""
+
+import numpy as np
+from normaldistribution import normalCdfArray, normalPdfArray
+
+
+class vectorizedanalyticformulas:
+
+    def bachelierCall(self, forward, optionStrike, volatility = 0.05,
+            optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        The function calculates the option (call) prices for a normal model
+        (Bachelier) for arrays of inputs.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Disounted option prices (broadcast shape of the inputs).
+
+        '''
+        forward, optionStrike, volatility, optionMaturity = np.broadcast_arrays(
+            *map(np.asarray, (forward, optionStrike, volatility, optionMaturity)))
+
+        moneyness = forward - optionStrike
+        standardDeviation = volatility * np.sqrt(np.maximum(optionMaturity, 0.))
+        isAlive = standardDeviation > 0
+
+        # dead options (zero maturity) only keep the intrinsic value
+        safeStandardDeviation = np.where(isAlive, standardDeviation, 1.)
+        dPlus = np.where(isAlive, moneyness / safeStandardDeviation, 0.)
+
+        value = np.where(isAlive, moneyness * normalCdfArray(dPlus) + \
+                         standardDeviation * normalPdfArray(dPlus), np.maximum(moneyness, 0.))
+
+        return nominal * periodLength * discountFactor * value
+
+
+    def blackScholesCallGeneralForm(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        The function calculates the option (call, Caplet) prices for a lognormal model
+        (Black scholes) for arrays of inputs.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Disounted option prices (broadcast shape of the inputs).
+
+        '''
+        dPlus, dMinus, isAlive = self._blackD(forward, optionStrike, volatility, optionMaturity)
+
+        value = forward * normalCdfArray(dPlus) - optionStrike * normalCdfArray(dMinus)
+
+        return nominal * periodLength * discountFactor * value
+
+
+    def blackScholesCall(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        Short name for blackScholesCallGeneralForm.
+
+        '''
+        return self.blackScholesCallGeneralForm(forward, optionStrike, volatility,
+                    optionMaturity, periodLength, discountFactor, nominal)
+
+
+    def blackScholesCallExpDiscountfactor(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, interestRate = 0, nominal = 1):
+        '''
+        The function calculates the option (call, Caplet) prices for a lognormal model
+        (Black scholes) for arrays of inputs. The bank account is modeled by:
+        B(t) = exp(-rt), the period length is the time to maturity.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Options with maturity 0 are
+            valued with dPlus = infinity (as in the scalar formula).
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        interestRate : Type, float or np.array.
+            DESCRIPTION. The default is 0.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Disounted option prices (broadcast shape of the inputs).
+
+        '''
+        forward, optionStrike, volatility, optionMaturity, periodLength, interestRate = \
+            np.broadcast_arrays(*map(np.asarray, (forward, optionStrike, volatility,
+                                                  optionMaturity, periodLength, interestRate)))
+
+        standardDeviation = volatility * np.sqrt(periodLength)
+        logMoneyness = np.log(forward / optionStrike)
+        dMinus = (logMoneyness + (interestRate - 0.5*volatility *volatility) *\
+                periodLength) / standardDeviation
+        dPlus = np.where(optionMaturity > 0, dMinus + standardDeviation, np.inf)
+
+        value = forward * normalCdfArray(dPlus) - \
+            optionStrike * np.exp(-interestRate * periodLength) * normalCdfArray(dMinus)
+
+        return nominal * value
+
+
+    def BlackScholesPutGeneralForm(self, forward = 0.05, interestRate = 0, volatility = 0.3,
+    periodLength = 1, discountFactor = 1,maturity = 1, strike = 0.05, nominal = 1):
+        '''
+        The function calculates the put (Floorlet) prices for a lognormal model
+        (Black scholes) for arrays of inputs. The arguments follow the
+        scalar formula.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Disounted option prices (broadcast shape of the inputs).
+
+        '''
+        dPlus, dMinus, isAlive = self._blackD(forward, strike, volatility, maturity)
+
+        value = strike * normalCdfArray(-dMinus) - forward * normalCdfArray(-dPlus)
+
+        return nominal * periodLength * discountFactor * value
+
+
+    def BlackScholesDigitalCaplet(self, forward, optionStrike, volatility = 0.05,
+        optionMaturity = 0, periodLength = 1, discountFactor = 1, nominal = 1):
+        '''
+        The function calculates the digital caplet prices for a lognormal model
+        (Black scholes) for arrays of inputs. The payoff is 1 if the forward
+        ends above the strike.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Initial forward values.
+        optionStrike : TYPE, float or np.array.
+            DESCRIPTION. Strikes for the options.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. The default is 0. Start of the period.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : Type, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting).
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Disounted option prices (broadcast shape of the inputs).
+
+        '''
+        dPlus, dMinus, isAlive = self._blackD(forward, optionStrike, volatility, optionMaturity)
+
+        return nominal * periodLength * discountFactor * normalCdfArray(dMinus)
+
+
+    def BlackScholesSwaption(self, forward, optionStrike, volatility = 0.05,
+    optionMaturity = 0, periodLength = 1, discountFactor = 1, optionEnd = 1, nominal = 1):
+        '''
+        The function calculates swaption prices for a lognormal model
+        (Black scholes) for arrays of inputs.
+
+        Parameters
+        ----------
+        forward : TYPE float or np.array.
+            DESCRIPTION. Inital values of the swap rates.
+        optionStrike : TYPE float or np.array.
+            DESCRIPTION. Strikes of the swaptions.
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. Volatility of the model. The default is 0.05.
+        optionMaturity : TYPE, float or np.array.
+            DESCRIPTION. Start of the Swpation. The default is 0.
+        periodLength : TYPE, float or np.array.
+            DESCRIPTION. The default is 1.
+        discountFactor : TYPE, float or np.array.
+            DESCRIPTION. The default is 1 (no discounting). Either one
+            discount factor per swaption (used for all periods) or, if the
+            last axis has one entry per period, the discount factors of the
+            payment dates.
+        optionEnd : TYPE, float or np.array.
+            DESCRIPTION. The default is 1. End of the swaption.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Swaption prices (broadcast shape of the inputs).
+
+        '''
+        swapAnnuity, swapAnnuityDuration = self._swapAnnuity(optionMaturity, periodLength,
+                                                             discountFactor, optionEnd)
+
+        return self.blackScholesCallGeneralForm(forward, optionStrike, volatility,
+                    optionMaturity, discountFactor = swapAnnuity, nominal = nominal)
+
+
+    def SwaptionCube(self, discountCurve, optionMaturities, tenors, optionStrikes, volatility = 0.05,
+    periodLength = 1, model = 'black', relativeStrikes = False, nominal = 1):
+        '''
+        The function calculates the prices of a swaption cube (payer swaptions
+        for all expiries x tenors x strikes) in one call. All annuities come
+        from cumulative sums of the discount factors on one grid of payment
+        dates (multiples of the period length), see swapAnnuityCube.
+
+        Parameters
+        ----------
+        discountCurve : TYPE callable.
+            DESCRIPTION. Maps an array of dates to discount factors, e.g. the
+            getDiscountFactor method of a ZeroCurve.
+        optionMaturities : TYPE np.array.
+            DESCRIPTION. Expiries, multiples of the period length.
+        tenors : TYPE np.array.
+            DESCRIPTION. Lengths of the swaps, multiples of the period length.
+        optionStrikes : TYPE np.array.
+            DESCRIPTION. Strikes (or offsets to the swap rates).
+        volatility : TYPE, float>0 or np.array.
+            DESCRIPTION. The default is 0.05. Broadcast against the cube
+            (expiries, tenors, strikes).
+        periodLength : TYPE, float.
+            DESCRIPTION. The default is 1.
+        model : TYPE, str.
+            DESCRIPTION. The default is 'black'. 'black' (lognormal) or
+            'bachelier' (normal).
+        relativeStrikes : TYPE, bool.
+            DESCRIPTION. The default is False. The strikes are offsets to the
+            at the money swap rates.
+        nominal : Type, float or np.array.
+            DESCRIPTION. The default is 1.
+
+        Returns
+        -------
+        TYPE np.array.
+            DESCRIPTION. Swaption prices (expiries, tenors, strikes).
+
+        '''
+        if model not in ('black', 'bachelier'):
+            raise ValueError("model must be 'black' or 'bachelier', not {}".format(model))
+
+        swapAnnuity, forward = self.swapAnnuityCube(discountCurve, optionMaturities, tenors, periodLength)
+        optionStrike = np.asarray(optionStrikes, dtype = float)[None, None, :]
+        if relativeStrikes:
+            optionStrike = forward[..., None] + optionStrike
+        optionMaturity = np.asarray(optionMaturities, dtype = float)[:, None, None]
+
+        formula = self.blackScholesCallGeneralForm if model == 'black' else self.bachelierCall
+
+        return formula(forward[..., None], optionStrike, volatility, optionMaturity,
+                       discountFactor = swapAnnuity[..., None], nominal = nominal)
+
+
+    def swapAnnuityCube(self, discountCurve, optionMaturities, tenors, periodLength = 1):
+        '''
+        Annuities sum_i periodLength * P(T_i) and swap rates of all swaps
+        (expiry, tenor). The discount curve is evaluated once on the grid
+        k * periodLength up to the last payment date, the annuity of the
+        payments T_e+1, ..., T_e+n is the difference of two cumulative sums.
+
+        Returns
+        -------
+        TYPE tuple.
+            DESCRIPTION. Annuities and swap rates (expiries, tenors).
+
+        '''
+        startIndex = self._periodIndex(optionMaturities, periodLength)
+        numberOfPeriods = self._periodIndex(tenors, periodLength)
+        if np.any(startIndex < 0) or np.any(numberOfPeriods <= 0):
+            raise ValueError("expiries must be non negative and tenors positive")
+
+        grid = periodLength * np.arange(startIndex.max() + numberOfPeriods.max() + 1)
+        discountFactors = np.asarray(discountCurve(grid), dtype = float)
+        cumulativeDiscountFactors = np.concatenate(([0.], np.cumsum(discountFactors)))
+
+        # sum_{k=e+1}^{e+n} P(k periodLength) = C[e+n+1] - C[e+1]
+        endIndex = startIndex[:, None] + numberOfPeriods[None, :]
+        swapAnnuity = periodLength * (cumulativeDiscountFactors[endIndex + 1] \
+                                      - cumulativeDiscountFactors[startIndex + 1][:, None])
+        forward = (discountFactors[startIndex][:, None] - discountFactors[endIndex]) / swapAnnuity
+
+        return swapAnnuity, forward
+
+
+    def _periodIndex(self, dates, periodLength):
+        # number of periods of each date, the dates must be on the grid of the period length
+        periods = np.asarray(dates, dtype = float).ravel() / periodLength
+        index = np.rint(periods).astype(int)
+        if not np.allclose(periods, index, rtol = 0, atol = 1e-9):
+            raise ValueError("the dates must be multiples of the period length {}".format(periodLength))
+
+        return index
+
+
+    def _swapAnnuity(self, optionMaturity, periodLength, discountFactor, optionEnd):
+        '''
+        Calculates the swap annuity sum_i periodLength * P(T_i) and its
+        duration sum_i periodLength * T_i * P(T_i) (minus the derivative of
+        the annuity with respect to a parallel shift of the zero rates).
+        The payment dates are T_i = optionMaturity + i * periodLength.
+
+        '''
+        numberOfPeriods = np.rint((np.asarray(optionEnd) - optionMaturity) / periodLength)
+        discountFactor = np.asarray(discountFactor, dtype = float)
+
+        # discount factors per payment date along the last axis
+        if numberOfPeriods.ndim == 0 and discountFactor.ndim > 0 \
+            and discountFactor.shape[-1] == numberOfPeriods:
+            paymentTimes = np.asarray(optionMaturity)[..., None] + \
+                periodLength * np.arange(1, int(numberOfPeriods) + 1)
+            swapAnnuity = periodLength * discountFactor.sum(axis = -1)
+            swapAnnuityDuration = periodLength * (paymentTimes * discountFactor).sum(axis = -1)
+        else:
+            swapAnnuity = periodLength * numberOfPeriods * discountFactor
+            swapAnnuityDuration = periodLength * discountFactor * (numberOfPeriods * optionMaturity \
+                + 0.5 * periodLength * numberOfPeriods * (numberOfPeriods + 1))
+
+        return swapAnnuity, swapAnnuityDuration
+
+
+    def _blackD(self, forward, optionStrike, volatility, optionMaturity):
+        '''
+        Calculates dPlus and dMinus of the Black formula. Options with zero
+        maturity (or zero volatility) get dPlus = dMinus = +-infinity,
+        so that the formula collapses to the intrinsic value.
+
+        '''
+        forward, optionStrike, volatility, optionMaturity = np.broadcast_arrays(
+            *map(np.asarray, (forward, optionStrike, volatility, optionMaturity)))
+
+        standardDeviation = volatility * np.sqrt(np.maximum(optionMaturity, 0.))
+        isAlive = (standardDeviation > 0) & (optionStrike > 0)
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            logMoneyness = np.log(forward / optionStrike)
+            dPlus = np.where(isAlive, (logMoneyness + 0.5 * standardDeviation**2) \
+                             / standardDeviation, 0.)
+        dMinus = dPlus - standardDeviation
+
+        # intrinsic value for the dead options (and for non positive strikes)
+        intrinsic = np.where(forward > optionStrike, np.inf, -np.inf)
+        dPlus = np.where(isAlive, dPlus, intrinsic)
+        dMinus = np.where(isAlive, dMinus, intrinsic)
+
+        return dPlus, dMinus, isAlive